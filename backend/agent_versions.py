@@ -0,0 +1,108 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import List, Optional
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+import models
+import schemas
+
+# Fields that define what a conversation actually ran against. Changing any of
+# them on an agent appends a new row to agent_versions; other edits (is_active,
+# tags, stats) don't.
+VERSIONED_FIELDS = (
+    "agent_config",
+    "agent_name",
+    "display_name",
+    "system_prompt_hash",
+    "instructions_hash",
+    "temperature",
+    "max_tokens",
+    "voice",
+)
+
+# Versions are immutable, so lookups by id can be cached without invalidation
+CACHE_SIZE = 4096
+
+_cache: "OrderedDict[int, schemas.AgentVersion]" = OrderedDict()
+_lock = Lock()
+
+
+def latest_version(db: Session, agent_id: str) -> Optional[models.AgentVersion]:
+    return db.query(models.AgentVersion).filter(
+        models.AgentVersion.agent_id == agent_id
+    ).order_by(models.AgentVersion.version.desc()).first()
+
+
+def latest_version_id(db: Session, agent_id: str) -> Optional[int]:
+    return db.query(func.max(models.AgentVersion.id)).filter(
+        models.AgentVersion.agent_id == agent_id
+    ).scalar()
+
+
+def record_version(db: Session, agent: models.Agent) -> models.AgentVersion:
+    """Snapshot the agent if its versioned fields differ from the latest version (flushes)"""
+    return record_versions(db, [agent])[0]
+
+
+def record_versions(db: Session, agents: List[models.Agent]) -> List[models.AgentVersion]:
+    """
+    record_version for many agents, with one query for their latest versions.
+    The agent rows stay locked until commit, so concurrent edits of an agent take
+    version numbers one after the other instead of both picking latest + 1.
+    """
+    db.flush()
+    db.query(models.Agent.id).filter(
+        models.Agent.id.in_({agent.id for agent in agents})
+    ).order_by(models.Agent.id).with_for_update().all()
+    Version = models.AgentVersion
+    newest = db.query(
+        Version.agent_id.label("agent_id"),
+        func.max(Version.version).label("version")
+    ).filter(
+        Version.agent_id.in_({agent.id for agent in agents})
+    ).group_by(Version.agent_id).subquery()
+    previous = {
+        version.agent_id: version
+        for version in db.query(Version).join(
+            newest, and_(Version.agent_id == newest.c.agent_id, Version.version == newest.c.version)
+        )
+    }
+
+    versions = []
+    for agent in agents:
+        latest = previous.get(agent.id)
+        snapshot = {field: getattr(agent, field) for field in VERSIONED_FIELDS}
+        if not latest or any(getattr(latest, field) != value for field, value in snapshot.items()):
+            latest = Version(
+                agent_id=agent.id,
+                version=(latest.version + 1) if latest else 1,
+                **snapshot
+            )
+            db.add(latest)
+            previous[agent.id] = latest
+        versions.append(latest)
+
+    db.flush()
+    return versions
+
+
+def get_version(db: Session, version_id: int) -> Optional[schemas.AgentVersion]:
+    """Look up a version by id, served from memory after the first read"""
+    with _lock:
+        cached = _cache.get(version_id)
+        if cached is not None:
+            _cache.move_to_end(version_id)
+            return cached
+
+    row = db.get(models.AgentVersion, version_id)
+    if row is None:
+        return None
+
+    version = schemas.AgentVersion.model_validate(row)
+    with _lock:
+        _cache[version_id] = version
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return version
@@ -0,0 +1,48 @@
+"""partial unique index on active agent per config and name
+
+Revision ID: 3f9c2a7d41e8
+Revises: 65ba916efcd5
+Create Date: 2026-10-19 10:12:31.482107
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a7d41e8'
+down_revision: Union[str, None] = '65ba916efcd5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Resolve any existing duplicates: keep the most recently updated active row
+    op.execute("""
+        UPDATE agents SET is_active = false
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY agent_config, agent_name
+                    ORDER BY updated_at DESC NULLS LAST, created_at DESC
+                ) AS rn
+                FROM agents
+                WHERE is_active
+            ) ranked
+            WHERE rn > 1
+        )
+    """)
+
+    op.create_index(
+        'uq_agents_active_config_name',
+        'agents',
+        ['agent_config', 'agent_name'],
+        unique=True,
+        postgresql_where=sa.text('is_active'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_agents_active_config_name', table_name='agents')
@@ -0,0 +1,73 @@
+"""store agent prompts content-addressed in prompt_contents
+
+Revision ID: 8a1d6e0b93c4
+Revises: 3f9c2a7d41e8
+Create Date: 2026-10-19 11:04:52.219634
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a1d6e0b93c4'
+down_revision: Union[str, None] = '3f9c2a7d41e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'prompt_contents',
+        sa.Column('hash', sa.String(length=64), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('hash')
+    )
+    op.add_column('agents', sa.Column('system_prompt_hash', sa.String(length=64), nullable=True))
+    op.add_column('agents', sa.Column('instructions_hash', sa.String(length=64), nullable=True))
+
+    # Backfill: sha256 of the UTF-8 text matches prompt_store.prompt_hash()
+    op.execute("""
+        INSERT INTO prompt_contents (hash, content)
+        SELECT DISTINCT encode(sha256(convert_to(body, 'UTF8')), 'hex'), body
+        FROM (
+            SELECT system_prompt AS body FROM agents
+            UNION
+            SELECT instructions FROM agents WHERE instructions IS NOT NULL
+        ) prompts
+        ON CONFLICT (hash) DO NOTHING
+    """)
+    op.execute("""
+        UPDATE agents SET
+            system_prompt_hash = encode(sha256(convert_to(system_prompt, 'UTF8')), 'hex'),
+            instructions_hash = CASE WHEN instructions IS NULL THEN NULL
+                ELSE encode(sha256(convert_to(instructions, 'UTF8')), 'hex') END
+    """)
+
+    op.alter_column('agents', 'system_prompt_hash', nullable=False)
+    op.create_index(op.f('ix_agents_system_prompt_hash'), 'agents', ['system_prompt_hash'], unique=False)
+    op.create_foreign_key('agents_system_prompt_hash_fkey', 'agents', 'prompt_contents', ['system_prompt_hash'], ['hash'])
+    op.create_foreign_key('agents_instructions_hash_fkey', 'agents', 'prompt_contents', ['instructions_hash'], ['hash'])
+    op.drop_column('agents', 'system_prompt')
+    op.drop_column('agents', 'instructions')
+
+
+def downgrade() -> None:
+    op.add_column('agents', sa.Column('system_prompt', sa.Text(), nullable=True))
+    op.add_column('agents', sa.Column('instructions', sa.Text(), nullable=True))
+    op.execute("""
+        UPDATE agents SET
+            system_prompt = (SELECT content FROM prompt_contents WHERE hash = agents.system_prompt_hash),
+            instructions = (SELECT content FROM prompt_contents WHERE hash = agents.instructions_hash)
+    """)
+    op.alter_column('agents', 'system_prompt', nullable=False)
+
+    op.drop_constraint('agents_instructions_hash_fkey', 'agents', type_='foreignkey')
+    op.drop_constraint('agents_system_prompt_hash_fkey', 'agents', type_='foreignkey')
+    op.drop_index(op.f('ix_agents_system_prompt_hash'), table_name='agents')
+    op.drop_column('agents', 'instructions_hash')
+    op.drop_column('agents', 'system_prompt_hash')
+    op.drop_table('prompt_contents')
@@ -0,0 +1,36 @@
+"""add live_sessions for shared admission control
+
+Revision ID: a4e7c2d90b18
+Revises: f1c84e2a6b30
+Create Date: 2026-10-19 15:12:48.310527
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4e7c2d90b18'
+down_revision: Union[str, None] = 'f1c84e2a6b30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'live_sessions',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('agent_config', sa.String(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_live_sessions_config_expires', 'live_sessions', ['agent_config', 'expires_at'], unique=False)
+    op.create_index('ix_live_sessions_expires_at', 'live_sessions', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_live_sessions_expires_at', table_name='live_sessions')
+    op.drop_index('ix_live_sessions_config_expires', table_name='live_sessions')
+    op.drop_table('live_sessions')
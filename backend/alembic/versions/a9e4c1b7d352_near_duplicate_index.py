@@ -0,0 +1,46 @@
+"""add MinHash signatures and LSH band index
+
+Revision ID: a9e4c1b7d352
+Revises: f5a2d8c3e617
+Create Date: 2026-10-19 19:47:33.910452
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9e4c1b7d352'
+down_revision: Union[str, None] = 'f5a2d8c3e617'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'conversation_signatures',
+        sa.Column('conversation_id', sa.String(), nullable=False),
+        sa.Column('signature', sa.LargeBinary(), nullable=False),
+        sa.Column('shingle_count', sa.Integer(), nullable=False),
+        sa.Column('signed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversation_logs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('conversation_id')
+    )
+    op.create_table(
+        'conversation_lsh_bands',
+        sa.Column('band', sa.SmallInteger(), nullable=False),
+        sa.Column('bucket', sa.BigInteger(), nullable=False),
+        sa.Column('conversation_id', sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversation_logs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('band', 'bucket', 'conversation_id')
+    )
+    op.create_index('ix_conversation_lsh_bands_conversation_id', 'conversation_lsh_bands', ['conversation_id'], unique=False)
+    # Existing conversations are signed by `python -m near_duplicates` or the sign_conversations job
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversation_lsh_bands_conversation_id', table_name='conversation_lsh_bands')
+    op.drop_table('conversation_lsh_bands')
+    op.drop_table('conversation_signatures')
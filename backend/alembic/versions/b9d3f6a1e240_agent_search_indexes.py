@@ -0,0 +1,46 @@
+"""add GIN indexes for agent tag filters and trigram search
+
+Revision ID: b9d3f6a1e240
+Revises: a4e7c2d90b18
+Create Date: 2026-10-19 15:48:06.227391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9d3f6a1e240'
+down_revision: Union[str, None] = 'a4e7c2d90b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_agents_tags_gin', 'agents', ['tags'], unique=False, postgresql_using='gin')
+    op.create_index(
+        'ix_agents_display_name_trgm',
+        'agents',
+        ['display_name'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'display_name': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_agents_description_trgm',
+        'agents',
+        ['description'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'description': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_agents_description_trgm', table_name='agents')
+    op.drop_index('ix_agents_display_name_trgm', table_name='agents')
+    op.drop_index('ix_agents_tags_gin', table_name='agents')
+    # pg_trgm is left installed; other objects may depend on it
@@ -0,0 +1,75 @@
+"""add append-only agent_versions and link conversation logs to them
+
+Revision ID: c52e7f18a0d9
+Revises: 8a1d6e0b93c4
+Create Date: 2026-10-19 11:47:05.660318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c52e7f18a0d9'
+down_revision: Union[str, None] = '8a1d6e0b93c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'agent_versions',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('agent_id', sa.String(), nullable=True),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('agent_config', sa.String(), nullable=False),
+        sa.Column('agent_name', sa.String(), nullable=False),
+        sa.Column('display_name', sa.String(), nullable=False),
+        sa.Column('system_prompt_hash', sa.String(length=64), nullable=False),
+        sa.Column('instructions_hash', sa.String(length=64), nullable=True),
+        sa.Column('temperature', sa.Float(), nullable=True),
+        sa.Column('max_tokens', sa.Integer(), nullable=True),
+        sa.Column('voice', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['agent_id'], ['agents.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['system_prompt_hash'], ['prompt_contents.hash']),
+        sa.ForeignKeyConstraint(['instructions_hash'], ['prompt_contents.hash']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_agent_versions_agent_id'), 'agent_versions', ['agent_id'], unique=False)
+    op.create_index('uq_agent_versions_agent_version', 'agent_versions', ['agent_id', 'version'], unique=True)
+
+    op.add_column('conversation_logs', sa.Column('agent_version_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'conversation_logs_agent_version_id_fkey', 'conversation_logs', 'agent_versions',
+        ['agent_version_id'], ['id']
+    )
+
+    # Seed version 1 from each agent's current state. Earlier prompt edits weren't recorded,
+    # so existing conversations are linked to this best-known version.
+    op.execute("""
+        INSERT INTO agent_versions (
+            agent_id, version, agent_config, agent_name, display_name,
+            system_prompt_hash, instructions_hash, temperature, max_tokens, voice
+        )
+        SELECT id, 1, agent_config, agent_name, display_name,
+               system_prompt_hash, instructions_hash, temperature, max_tokens, voice
+        FROM agents
+    """)
+    op.execute("""
+        UPDATE conversation_logs c SET agent_version_id = v.id
+        FROM agent_versions v
+        WHERE v.agent_id = c.agent_id
+    """)
+    op.create_index(op.f('ix_conversation_logs_agent_version_id'), 'conversation_logs', ['agent_version_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_conversation_logs_agent_version_id'), table_name='conversation_logs')
+    op.drop_constraint('conversation_logs_agent_version_id_fkey', 'conversation_logs', type_='foreignkey')
+    op.drop_column('conversation_logs', 'agent_version_id')
+    op.drop_index('uq_agent_versions_agent_version', table_name='agent_versions')
+    op.drop_index(op.f('ix_agent_versions_agent_id'), table_name='agent_versions')
+    op.drop_table('agent_versions')
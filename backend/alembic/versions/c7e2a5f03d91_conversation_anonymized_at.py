@@ -0,0 +1,26 @@
+"""add anonymized_at to conversation_logs
+
+Revision ID: c7e2a5f03d91
+Revises: b9d3f6a1e240
+Create Date: 2026-10-19 16:21:54.604183
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e2a5f03d91'
+down_revision: Union[str, None] = 'b9d3f6a1e240'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('conversation_logs', sa.Column('anonymized_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('conversation_logs', 'anonymized_at')
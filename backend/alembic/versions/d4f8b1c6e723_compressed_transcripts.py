@@ -0,0 +1,56 @@
+"""add compressed transcript storage and summary columns
+
+Revision ID: d4f8b1c6e723
+Revises: c7e2a5f03d91
+Create Date: 2026-10-19 17:03:12.845306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f8b1c6e723'
+down_revision: Union[str, None] = 'c7e2a5f03d91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'transcript_dictionaries',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('sample_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.add_column('conversation_logs', sa.Column('transcript_blob', sa.LargeBinary(), nullable=True))
+    op.add_column('conversation_logs', sa.Column('transcript_dict_id', sa.Integer(), nullable=True))
+    op.add_column('conversation_logs', sa.Column('message_count', sa.Integer(), nullable=True))
+    op.add_column('conversation_logs', sa.Column('transcript_size', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'conversation_logs_transcript_dict_id_fkey',
+        'conversation_logs', 'transcript_dictionaries',
+        ['transcript_dict_id'], ['id']
+    )
+    # Compressed rows keep the transcript only in transcript_blob
+    op.alter_column('conversation_logs', 'transcript', existing_type=sa.JSON(), nullable=True)
+
+    # message_count / transcript_size of existing rows are filled in batches afterwards with
+    # `python -m transcripts backfill` (or the backfill_transcript_summaries job), using the
+    # same computation as the write path; a single UPDATE would lock and rewrite the whole table
+
+
+def downgrade() -> None:
+    # Compressed transcripts must be decompressed before downgrading (transcript becomes NOT NULL again)
+    op.alter_column('conversation_logs', 'transcript', existing_type=sa.JSON(), nullable=False)
+    op.drop_constraint('conversation_logs_transcript_dict_id_fkey', 'conversation_logs', type_='foreignkey')
+    op.drop_column('conversation_logs', 'transcript_size')
+    op.drop_column('conversation_logs', 'message_count')
+    op.drop_column('conversation_logs', 'transcript_dict_id')
+    op.drop_column('conversation_logs', 'transcript_blob')
+    op.drop_table('transcript_dictionaries')
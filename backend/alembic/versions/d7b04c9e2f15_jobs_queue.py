@@ -0,0 +1,50 @@
+"""add jobs table for background maintenance work
+
+Revision ID: d7b04c9e2f15
+Revises: c52e7f18a0d9
+Create Date: 2026-10-19 12:30:44.018275
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7b04c9e2f15'
+down_revision: Union[str, None] = 'c52e7f18a0d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('params', sa.JSON(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('progress', sa.Float(), nullable=False),
+        sa.Column('progress_message', sa.Text(), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+        sa.Column('run_after', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('locked_by', sa.String(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_jobs_kind'), 'jobs', ['kind'], unique=False)
+    op.create_index('ix_jobs_status_run_after', 'jobs', ['status', 'run_after'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_status_run_after', table_name='jobs')
+    op.drop_index(op.f('ix_jobs_kind'), table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,45 @@
+"""add conversation_features for derived transcript metrics
+
+Revision ID: e3a9b5d1c7f2
+Revises: d7b04c9e2f15
+Create Date: 2026-10-19 13:22:09.571843
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a9b5d1c7f2'
+down_revision: Union[str, None] = 'd7b04c9e2f15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'conversation_features',
+        sa.Column('conversation_id', sa.String(), nullable=False),
+        sa.Column('feature_version', sa.Integer(), nullable=False),
+        sa.Column('message_count', sa.Integer(), nullable=False),
+        sa.Column('user_turns', sa.Integer(), nullable=False),
+        sa.Column('assistant_turns', sa.Integer(), nullable=False),
+        sa.Column('user_words', sa.Integer(), nullable=False),
+        sa.Column('assistant_words', sa.Integer(), nullable=False),
+        sa.Column('mean_user_turn_words', sa.Float(), nullable=True),
+        sa.Column('mean_assistant_turn_words', sa.Float(), nullable=True),
+        sa.Column('mean_response_gap', sa.Float(), nullable=True),
+        sa.Column('median_response_gap', sa.Float(), nullable=True),
+        sa.Column('max_response_gap', sa.Float(), nullable=True),
+        sa.Column('interruptions', sa.Integer(), nullable=False),
+        sa.Column('tool_call_count', sa.Integer(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversation_logs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('conversation_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('conversation_features')
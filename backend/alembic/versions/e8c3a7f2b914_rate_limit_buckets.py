@@ -0,0 +1,37 @@
+"""add rate_limit_buckets table
+
+Revision ID: e8c3a7f2b914
+Revises: d4f8b1c6e723
+Create Date: 2026-10-19 18:21:47.203918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8c3a7f2b914'
+down_revision: Union[str, None] = 'd4f8b1c6e723'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # UNLOGGED: buckets are disposable, so skip WAL for this write-per-request table
+    op.create_table(
+        'rate_limit_buckets',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.Float(), nullable=False),
+        sa.Column('allowed', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+        prefixes=['UNLOGGED']
+    )
+    op.create_index(op.f('ix_rate_limit_buckets_updated_at'), 'rate_limit_buckets', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_rate_limit_buckets_updated_at'), table_name='rate_limit_buckets')
+    op.drop_table('rate_limit_buckets')
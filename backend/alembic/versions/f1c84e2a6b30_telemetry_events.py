@@ -0,0 +1,43 @@
+"""add telemetry_events for client latency samples
+
+Revision ID: f1c84e2a6b30
+Revises: e3a9b5d1c7f2
+Create Date: 2026-10-19 14:05:37.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c84e2a6b30'
+down_revision: Union[str, None] = 'e3a9b5d1c7f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'telemetry_events',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('ts', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('session_id', sa.String(), nullable=False),
+        sa.Column('metric', sa.String(), nullable=False),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.Column('agent_id', sa.String(), nullable=True),
+        sa.Column('agent_config', sa.String(), nullable=True),
+        sa.Column('voice', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_telemetry_events_ts', 'telemetry_events', ['ts'], unique=False)
+    op.create_index('ix_telemetry_events_metric_config_ts', 'telemetry_events', ['metric', 'agent_config', 'ts'], unique=False)
+    op.create_index('ix_telemetry_events_session_id', 'telemetry_events', ['session_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_telemetry_events_session_id', table_name='telemetry_events')
+    op.drop_index('ix_telemetry_events_metric_config_ts', table_name='telemetry_events')
+    op.drop_index('ix_telemetry_events_ts', table_name='telemetry_events')
+    op.drop_table('telemetry_events')
@@ -0,0 +1,60 @@
+"""add annotation_items rating queue
+
+Revision ID: f5a2d8c3e617
+Revises: e8c3a7f2b914
+Create Date: 2026-10-19 19:04:12.586301
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5a2d8c3e617'
+down_revision: Union[str, None] = 'e8c3a7f2b914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'annotation_items',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('conversation_id', sa.String(), nullable=False),
+        sa.Column('agent_id', sa.String(), nullable=True),
+        sa.Column('agent_config', sa.String(), nullable=False),
+        sa.Column('sample_key', sa.Float(), nullable=False),
+        sa.Column('leased_by', sa.String(), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('rated_by', sa.String(), nullable=True),
+        sa.Column('rated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('labels', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversation_logs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('conversation_id')
+    )
+    op.create_index(op.f('ix_annotation_items_rated_by'), 'annotation_items', ['rated_by'], unique=False)
+    # Partial: only unrated items are scanned by claims
+    op.create_index(
+        'ix_annotation_items_open_sample', 'annotation_items', ['sample_key'],
+        postgresql_where=sa.text('rated_at IS NULL')
+    )
+    op.create_index(
+        'ix_annotation_items_open_config_sample', 'annotation_items', ['agent_config', 'sample_key'],
+        postgresql_where=sa.text('rated_at IS NULL')
+    )
+    op.create_index(
+        'ix_annotation_items_open_agent_sample', 'annotation_items', ['agent_id', 'sample_key'],
+        postgresql_where=sa.text('rated_at IS NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_annotation_items_open_agent_sample', table_name='annotation_items')
+    op.drop_index('ix_annotation_items_open_config_sample', table_name='annotation_items')
+    op.drop_index('ix_annotation_items_open_sample', table_name='annotation_items')
+    op.drop_index(op.f('ix_annotation_items_rated_by'), table_name='annotation_items')
+    op.drop_table('annotation_items')
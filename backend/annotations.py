@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import os
+import random
+
+from sqlalchemy import exists, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from db_types import random_fraction
+import models
+
+# Rating queue over conversation logs. Each conversation to rate gets an
+# annotation_items row with a random sample_key; raters claim batches by
+# scanning the open-items index from a random key (wrapping around at 1.0) with
+# FOR UPDATE SKIP LOCKED and stamping a lease on what they got. Concurrent
+# claims never wait on each other: rows another claim is stamping are skipped.
+#
+# With stratify_by, a claim splits its batch evenly across the agents (or
+# configs) that still have open items, each sampled from its own
+# (stratum, sample_key) index. Ratings are accepted from the rater holding the
+# item, and an expired lease is only lost once someone else claims the item.
+
+Item = models.AnnotationItem
+
+ANNOTATION_LEASE_SECONDS = int(os.getenv("ANNOTATION_LEASE_SECONDS", "1800"))
+
+STRATA = {"agent": Item.agent_id, "agent_config": Item.agent_config}
+
+# Written through to the conversation log; labels stay on the item
+RATING_FIELDS = ("user_satisfaction", "task_completed")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue_conversations(
+    db: Session,
+    agent_config: Optional[str] = None,
+    agent_ids: Optional[List[str]] = None,
+    include_rated: bool = False
+) -> int:
+    """Queue conversations that aren't queued yet with one INSERT ... SELECT (caller commits)"""
+    Log = models.ConversationLog
+    filters = [~exists().where(Item.conversation_id == Log.id)]
+    if agent_config:
+        filters.append(Log.agent_config == agent_config)
+    if agent_ids:
+        filters.append(Log.agent_id.in_(agent_ids))
+    if not include_rated:
+        filters.extend([Log.user_satisfaction.is_(None), Log.task_completed.is_(None)])
+
+    return db.execute(insert(Item.__table__).from_select(
+        ["conversation_id", "agent_id", "agent_config", "sample_key"],
+        select(Log.id, Log.agent_id, Log.agent_config, random_fraction(db)).where(*filters)
+    )).rowcount
+
+
+def _matches(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def _sample(db: Session, filters: List[Any], limit: int, exclude: Iterable[int] = ()) -> List[int]:
+    """Up to `limit` open item ids in sample_key order from a random start, locked, skipping locked rows"""
+    exclude = list(exclude)
+    if exclude:
+        filters = [*filters, Item.id.not_in(exclude)]
+    start = random.random()
+    ids: List[int] = []
+    for window in (Item.sample_key >= start, Item.sample_key < start):
+        ids += db.scalars(
+            select(Item.id).where(*filters, window).order_by(Item.sample_key)
+            .limit(limit - len(ids)).with_for_update(skip_locked=True)
+        ).all()
+        if len(ids) >= limit:
+            break
+    return ids
+
+
+def claim_items(
+    db: Session,
+    rater: str,
+    limit: int,
+    agent_config: Optional[str] = None,
+    stratify_by: Optional[str] = None,
+    lease_seconds: Optional[int] = None
+) -> Tuple[List[int], datetime]:
+    """Lease up to `limit` unrated items to `rater`; returns their ids and the lease expiry (caller commits)"""
+    now = _now()
+    expires_at = now + timedelta(seconds=lease_seconds or ANNOTATION_LEASE_SECONDS)
+    filters = [Item.rated_at.is_(None), or_(Item.lease_expires_at.is_(None), Item.lease_expires_at < now)]
+    if agent_config:
+        filters.append(Item.agent_config == agent_config)
+
+    if stratify_by is None:
+        ids = _sample(db, filters, limit)
+    else:
+        column = STRATA[stratify_by]
+        strata = db.scalars(select(column).where(*filters).distinct()).all()
+        random.shuffle(strata)
+        taken: Dict[Any, List[int]] = {}
+        # Even split first, then top up from strata that filled their share
+        for n, value in enumerate(strata):
+            share = limit // len(strata) + (1 if n < limit % len(strata) else 0)
+            if share:
+                taken[value] = _sample(db, [*filters, _matches(column, value)], share)
+        for value in strata:
+            missing = limit - sum(len(ids) for ids in taken.values())
+            if missing <= 0:
+                break
+            if value in taken:
+                taken[value] += _sample(db, [*filters, _matches(column, value)], missing, exclude=taken[value])
+        ids = [item_id for stratum in taken.values() for item_id in stratum]
+
+    if ids:
+        db.execute(
+            update(Item).where(Item.id.in_(ids)).values(leased_by=rater, lease_expires_at=expires_at),
+            execution_options={"synchronize_session": False}
+        )
+    return ids, expires_at
+
+
+def release_items(db: Session, rater: str, item_ids: List[int]) -> int:
+    """Hand unrated items held by `rater` back to the queue (caller commits)"""
+    return db.execute(
+        update(Item).where(Item.id.in_(item_ids), Item.leased_by == rater, Item.rated_at.is_(None))
+        .values(leased_by=None, lease_expires_at=None),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+
+
+def save_ratings(db: Session, rater: str, ratings: List[Dict[str, Any]]) -> Tuple[int, List[int]]:
+    """
+    Record a batch of ratings (dicts with item_id and any of user_satisfaction,
+    task_completed, labels) for items leased to `rater`, in two bulk UPDATEs;
+    returns (saved, rejected item ids). Caller commits.
+    """
+    by_item = {rating["item_id"]: rating for rating in ratings}
+    held = dict(db.execute(
+        select(Item.id, Item.conversation_id).where(
+            Item.id.in_(by_item), Item.leased_by == rater, Item.rated_at.is_(None)
+        ).with_for_update()
+    ).all())
+    rejected = [item_id for item_id in by_item if item_id not in held]
+    if not held:
+        return 0, rejected
+
+    now = _now()
+    db.execute(update(Item), [
+        {"id": item_id, "rated_by": rater, "rated_at": now, "lease_expires_at": None, "labels": by_item[item_id].get("labels")}
+        for item_id in held
+    ])
+    log_rows = []
+    for item_id, conversation_id in held.items():
+        values = {field: by_item[item_id][field] for field in RATING_FIELDS if field in by_item[item_id]}
+        if values:
+            log_rows.append({"id": conversation_id, **values})
+    if log_rows:
+        db.execute(update(models.ConversationLog), log_rows)
+    return len(held), rejected
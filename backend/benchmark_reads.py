@@ -0,0 +1,171 @@
+"""
+Microbenchmark: ORM + response-model hydration vs the records.py read path.
+
+    DATABASE_URL=sqlite:// python -m benchmark_reads [--agents N] [--assignments N] [--conversations N] [--repeat N]
+
+Each case produces the same JSON both ways and reports rows/sec (best of
+--repeat runs). On the in-memory SQLite database synthetic rows are inserted
+first; against any other database the existing rows are read and nothing is
+written.
+"""
+from typing import Callable, List
+import argparse
+import random
+import time
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+import pydantic_core
+
+from database import IN_MEMORY_SQLITE, Base, SessionLocal, engine
+from prompt_store import PROMPT_LOAD_OPTIONS, prompt_hash
+import models
+import records
+import schemas
+
+
+def seed(db: Session, agents: int, assignments: int, conversations: int) -> None:
+    prompts = {f"You are agent {i}. " * 40: None for i in range(min(agents, 50))}
+    db.execute(insert(models.PromptContent.__table__), [
+        {"hash": prompt_hash(text), "content": text} for text in prompts
+    ])
+    hashes = [prompt_hash(text) for text in prompts]
+
+    agent_rows = [
+        {
+            "id": models.generate_uuid(),
+            "agent_name": f"agent{i}",
+            "display_name": f"Agent {i}",
+            "agent_config": f"config{i % 10}",
+            "system_prompt_hash": hashes[i % len(hashes)],
+            "instructions_hash": hashes[(i + 1) % len(hashes)],
+            "temperature": 0.8,
+            "voice": "alloy",
+            "description": "Synthetic agent",
+            "tags": ["bench", f"t{i % 5}"],
+            "is_active": False,
+            "total_runs": i,
+        }
+        for i in range(agents)
+    ]
+    db.execute(insert(models.Agent.__table__), agent_rows)
+
+    participant_ids = [models.generate_uuid() for _ in range(max(assignments // 4, 1))]
+    db.execute(insert(models.Participant.__table__), [
+        {"id": pid, "participant_id": f"B{n}"} for n, pid in enumerate(participant_ids)
+    ])
+
+    rng = random.Random(0)
+    db.execute(insert(models.ParticipantAgentAssignment.__table__), [
+        {
+            "id": models.generate_uuid(),
+            "participant_id": participant_ids[i % len(participant_ids)],
+            "agent_id": agent["id"],
+            "agent_config": agent["agent_config"],
+            "agent_name": agent["agent_name"],
+            "order": i % 4,
+        }
+        for i in range(assignments)
+        for agent in [agent_rows[rng.randrange(agents)]]
+    ])
+    db.execute(insert(models.ConversationLog.__table__), [
+        {
+            "id": models.generate_uuid(),
+            "session_id": f"s{i}",
+            "agent_id": agent["id"],
+            "agent_config": agent["agent_config"],
+            "agent_name": agent["agent_name"],
+            "transcript": {"messages": []},
+            "message_count": 0,
+            "duration": rng.uniform(10, 600),
+            "turn_count": rng.randrange(1, 40),
+            "user_satisfaction": rng.randrange(1, 6),
+            "extra_metadata": {"browser": "bench"},
+        }
+        for i in range(conversations)
+        for agent in [agent_rows[rng.randrange(agents)]]
+    ])
+    db.commit()
+
+
+def best_of(repeat: int, run: Callable[[], bytes]) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def orm_path(db: Session, schema, query) -> Callable[[], bytes]:
+    """What the endpoints did before: ORM instances validated through the response model"""
+    adapter = TypeAdapter(List[schema])
+
+    def run():
+        db.expunge_all()
+        return adapter.dump_json(adapter.validate_python(query().all(), from_attributes=True))
+    return run
+
+
+def records_path(db: Session, statement) -> Callable[[], bytes]:
+    return lambda: pydantic_core.to_json(records.fetch(db, statement).dicts())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ORM and records.py read paths")
+    parser.add_argument("--agents", type=int, default=2000)
+    parser.add_argument("--assignments", type=int, default=50000)
+    parser.add_argument("--conversations", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    Agent = models.Agent
+    Assignment = models.ParticipantAgentAssignment
+    Log = models.ConversationLog
+
+    if IN_MEMORY_SQLITE:
+        Base.metadata.create_all(bind=engine)
+
+    with SessionLocal() as db:
+        if IN_MEMORY_SQLITE:
+            seed(db, args.agents, args.assignments, args.conversations)
+
+        cases = [
+            (
+                "agents (with prompts)",
+                orm_path(db, schemas.Agent, lambda: db.query(Agent).options(*PROMPT_LOAD_OPTIONS).order_by(Agent.updated_at.desc())),
+                records_path(db, records.AGENTS.order_by(Agent.updated_at.desc())),
+            ),
+            (
+                "agent summaries",
+                orm_path(db, schemas.AgentSummary, lambda: db.query(Agent).order_by(Agent.updated_at.desc())),
+                records_path(db, records.AGENT_SUMMARIES.order_by(Agent.updated_at.desc())),
+            ),
+            (
+                "assignments",
+                orm_path(db, schemas.Assignment, lambda: db.query(Assignment).order_by(Assignment.order, Assignment.created_at)),
+                records_path(db, records.ASSIGNMENTS.order_by(Assignment.order, Assignment.created_at)),
+            ),
+            (
+                "conversation summaries",
+                orm_path(db, schemas.ConversationLogSummary, lambda: db.query(Log).order_by(Log.created_at.desc())),
+                records_path(db, records.CONVERSATION_SUMMARIES.order_by(Log.created_at.desc())),
+            ),
+        ]
+
+        print(f"{'case':<24}{'rows':>8}{'orm rows/s':>14}{'records rows/s':>16}{'speedup':>9}")
+        for name, orm_run, records_run in cases:
+            if orm_run() != records_run():
+                raise SystemExit(f"{name}: outputs differ")
+            rows = len(pydantic_core.from_json(records_run()))
+            orm_time = best_of(args.repeat, orm_run)
+            records_time = best_of(args.repeat, records_run)
+            print(
+                f"{name:<24}{rows:>8}{rows / orm_time:>14,.0f}{rows / records_time:>16,.0f}"
+                f"{orm_time / records_time:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Dict, Optional, Tuple
+import asyncio
+import heapq
+import json
+import os
+import sys
+import time
+
+from sqlalchemy import delete, func
+
+from database import SessionLocal
+import models
+
+# Live voice-session registry and admission control. A participant's session is
+# registered when it fetches its participant-config, kept alive by heartbeats
+# and expires after SESSION_TTL_SECONDS without one. When a cap is reached, new
+# sessions are rejected with a Retry-After hint (optionally after waiting up to
+# SESSION_ADMISSION_WAIT_SECONDS for a slot).
+#
+# SESSION_REGISTRY=memory (default) tracks sessions per process; use
+# SESSION_REGISTRY=database to share counts across workers and replicas.
+
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "90"))
+SESSION_CAP_TOTAL = int(os.getenv("SESSION_CAP_TOTAL", "0"))  # 0 = unlimited
+SESSION_CAP_PER_CONFIG = int(os.getenv("SESSION_CAP_PER_CONFIG", "0"))
+SESSION_CAPS: Dict[str, int] = json.loads(os.getenv("SESSION_CAPS", "{}"))  # Per-config overrides
+SESSION_ADMISSION_WAIT_SECONDS = float(os.getenv("SESSION_ADMISSION_WAIT_SECONDS", "0"))
+SESSION_REGISTRY = os.getenv("SESSION_REGISTRY", "memory")
+
+UNASSIGNED = "_unassigned"
+
+
+def cap_for(agent_config: str) -> int:
+    return SESSION_CAPS.get(agent_config, SESSION_CAP_PER_CONFIG)
+
+
+class MemorySessionRegistry:
+    """Sessions keyed by participant; each entry is a (config, expiry) tuple with interned config"""
+
+    def __init__(self):
+        self._sessions: Dict[str, Tuple[str, float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._expiries: list = []  # heap of (expiry, key); stale entries skipped on pop
+        self._lock = Lock()
+
+    def _expire(self, now: float) -> None:
+        while self._expiries and self._expiries[0][0] <= now:
+            expiry, key = heapq.heappop(self._expiries)
+            entry = self._sessions.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._sessions[key]
+                self._counts[entry[0]] -= 1
+
+    def _set(self, key: str, agent_config: str, now: float) -> None:
+        previous = self._sessions.get(key)
+        if previous is not None:
+            self._counts[previous[0]] -= 1
+        expiry = now + SESSION_TTL_SECONDS
+        self._sessions[key] = (agent_config, expiry)
+        self._counts[agent_config] = self._counts.get(agent_config, 0) + 1
+        heapq.heappush(self._expiries, (expiry, key))
+
+    def _retry_after(self, now: float) -> int:
+        next_expiry = self._expiries[0][0] if self._expiries else now + SESSION_TTL_SECONDS
+        return max(1, min(SESSION_TTL_SECONDS, int(next_expiry - now) + 1))
+
+    def admit(self, key: str, agent_config: Optional[str]) -> Tuple[bool, int]:
+        agent_config = sys.intern(agent_config or UNASSIGNED)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            existing = self._sessions.get(key)
+            if existing is None or existing[0] != agent_config:
+                cap = cap_for(agent_config)
+                if SESSION_CAP_TOTAL and existing is None and len(self._sessions) >= SESSION_CAP_TOTAL:
+                    return False, self._retry_after(now)
+                if cap and self._counts.get(agent_config, 0) >= cap:
+                    return False, self._retry_after(now)
+            self._set(key, agent_config, now)
+            return True, 0
+
+    def heartbeat(self, key: str, agent_config: Optional[str] = None) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            existing = self._sessions.get(key)
+            if existing is None:
+                return False
+            self._set(key, sys.intern(agent_config) if agent_config else existing[0], now)
+            return True
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            entry = self._sessions.pop(key, None)
+            if entry is not None:
+                self._counts[entry[0]] -= 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {config: count for config, count in self._counts.items() if count > 0}
+
+
+class DatabaseSessionRegistry:
+    """Shared registry in the live_sessions table; caps are soft under concurrent admission"""
+
+    def _now(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+    def _retry_after(self, db, now: datetime) -> int:
+        next_expiry = db.query(func.min(models.LiveSession.expires_at)).filter(
+            models.LiveSession.expires_at > now
+        ).scalar()
+        if next_expiry is None:
+            return SESSION_TTL_SECONDS
+        if next_expiry.tzinfo is None:
+            next_expiry = next_expiry.replace(tzinfo=timezone.utc)
+        return max(1, min(SESSION_TTL_SECONDS, int((next_expiry - now).total_seconds()) + 1))
+
+    def admit(self, key: str, agent_config: Optional[str]) -> Tuple[bool, int]:
+        agent_config = agent_config or UNASSIGNED
+        now = self._now()
+        with SessionLocal() as db:
+            db.execute(delete(models.LiveSession).where(models.LiveSession.expires_at <= now))
+            existing = db.get(models.LiveSession, key)
+            if existing is None or existing.agent_config != agent_config:
+                live = db.query(func.count(models.LiveSession.key)).filter(models.LiveSession.expires_at > now)
+                cap = cap_for(agent_config)
+                if SESSION_CAP_TOTAL and existing is None and live.scalar() >= SESSION_CAP_TOTAL:
+                    retry_after = self._retry_after(db, now)
+                    db.commit()
+                    return False, retry_after
+                if cap and live.filter(models.LiveSession.agent_config == agent_config).scalar() >= cap:
+                    retry_after = self._retry_after(db, now)
+                    db.commit()
+                    return False, retry_after
+            if existing is None:
+                db.add(models.LiveSession(key=key, agent_config=agent_config, expires_at=now + timedelta(seconds=SESSION_TTL_SECONDS)))
+            else:
+                existing.agent_config = agent_config
+                existing.expires_at = now + timedelta(seconds=SESSION_TTL_SECONDS)
+            db.commit()
+            return True, 0
+
+    def heartbeat(self, key: str, agent_config: Optional[str] = None) -> bool:
+        now = self._now()
+        with SessionLocal() as db:
+            session = db.get(models.LiveSession, key)
+            if session is None or _aware(session.expires_at) <= now:
+                return False
+            session.expires_at = now + timedelta(seconds=SESSION_TTL_SECONDS)
+            if agent_config:
+                session.agent_config = agent_config
+            db.commit()
+            return True
+
+    def release(self, key: str) -> None:
+        with SessionLocal() as db:
+            db.execute(delete(models.LiveSession).where(models.LiveSession.key == key))
+            db.commit()
+
+    def snapshot(self) -> Dict[str, int]:
+        with SessionLocal() as db:
+            rows = db.query(models.LiveSession.agent_config, func.count()).filter(
+                models.LiveSession.expires_at > self._now()
+            ).group_by(models.LiveSession.agent_config).all()
+            return dict(rows)
+
+
+def _aware(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+registry = DatabaseSessionRegistry() if SESSION_REGISTRY == "database" else MemorySessionRegistry()
+
+
+async def admit(key: str, agent_config: Optional[str]) -> Tuple[bool, int]:
+    """Admit a session, polling for a free slot for up to SESSION_ADMISSION_WAIT_SECONDS"""
+    deadline = time.monotonic() + SESSION_ADMISSION_WAIT_SECONDS
+    while True:
+        admitted, retry_after = registry.admit(key, agent_config)
+        remaining = deadline - time.monotonic()
+        if admitted or remaining <= 0:
+            return admitted, retry_after
+        await asyncio.sleep(min(1.0, remaining))
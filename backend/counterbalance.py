@@ -0,0 +1,55 @@
+from itertools import permutations
+from typing import List, Optional, Sequence
+import random
+
+# Condition orderings for within-subjects designs. Each design yields a small
+# table of sequences (indices into the condition list); participant i gets
+# row i % len(rows), so generating assignments for a whole cohort is a lookup
+# rather than per-participant work.
+
+DESIGNS = ("latin_square", "permutation", "random")
+
+# k! rows; beyond this, full permutation balance needs more participants than any study has
+MAX_PERMUTATION_CONDITIONS = 8
+
+
+def williams_rows(k: int) -> List[List[int]]:
+    """
+    Balanced Latin square (Williams design): every condition appears once per position
+    and follows every other condition equally often. k rows for even k, 2k for odd k.
+    """
+    first = []
+    low, high = 0, k - 1
+    for position in range(k):
+        if position % 2 == 0:
+            first.append(low)
+            low += 1
+        else:
+            first.append(high)
+            high -= 1
+
+    rows = [[(c + shift) % k for c in first] for shift in range(k)]
+    if k % 2:
+        rows += [list(reversed(row)) for row in rows]
+    return rows
+
+
+def permutation_rows(k: int) -> List[List[int]]:
+    """Every ordering once, for full counterbalancing"""
+    if k > MAX_PERMUTATION_CONDITIONS:
+        raise ValueError(f"permutation design supports at most {MAX_PERMUTATION_CONDITIONS} conditions")
+    return [list(p) for p in permutations(range(k))]
+
+
+def sequences_for(design: str, k: int, n: int, seed: Optional[int] = None) -> List[Sequence[int]]:
+    """One sequence per participant, in participant order"""
+    if design == "random":
+        rng = random.Random(seed)
+        base = list(range(k))
+        return [rng.sample(base, k) for _ in range(n)]
+
+    rows = williams_rows(k) if design == "latin_square" else permutation_rows(k)
+    if seed is not None:
+        # Decouple which participants share a row from their position in the list
+        random.Random(seed).shuffle(rows)
+    return [rows[i % len(rows)] for i in range(n)]
@@ -1,6 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pathlib import Path
+from typing import Optional
 import os
 
 DATABASE_URL = os.getenv(
@@ -8,7 +11,26 @@ DATABASE_URL = os.getenv(
     "postgresql://postgres:postgres@db:5432/realtime_agents"
 )
 
-engine = create_engine(DATABASE_URL)
+# Per-process pool; with N workers the total is N * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+# DATABASE_URL=sqlite:// runs the whole app on an in-memory database (tables created at startup)
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+IN_MEMORY_SQLITE = DATABASE_URL in ("sqlite://", "sqlite:///:memory:")
+
+if IS_SQLITE:
+    engine_options = {"connect_args": {"check_same_thread": False}}
+    if IN_MEMORY_SQLITE:
+        # One shared connection, otherwise every connection gets its own empty database
+        engine_options["poolclass"] = StaticPool
+    engine = create_engine(DATABASE_URL, **engine_options)
+
+    @event.listens_for(engine, "connect")
+    def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+else:
+    engine = create_engine(DATABASE_URL, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -20,3 +42,35 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def check_schema_revision() -> Optional[str]:
+    """
+    Compare the database's Alembic revision with the head of the migration scripts.
+    Returns None when up to date, otherwise a description of the mismatch.
+    """
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    config = Config(str(Path(__file__).resolve().parent / "alembic.ini"))
+    config.set_main_option("script_location", str(Path(__file__).resolve().parent / "alembic"))
+    expected = set(ScriptDirectory.from_config(config).get_heads())
+
+    with engine.connect() as conn:
+        current = set(MigrationContext.configure(conn).get_current_heads())
+
+    if current != expected:
+        return f"database at {sorted(current) or 'no revision'}, expected {sorted(expected)}; run 'alembic upgrade head'"
+    return None
+
+def warm_pool(size: int = DB_POOL_SIZE) -> None:
+    """Open `size` connections up front so the first requests don't pay connect latency"""
+    connections = []
+    try:
+        for _ in range(size):
+            conn = engine.connect()
+            conn.execute(text("SELECT 1"))
+            connections.append(conn)
+    finally:
+        for conn in connections:
+            conn.close()
@@ -0,0 +1,50 @@
+from typing import Iterable
+
+from sqlalchemy import JSON, String, cast, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+# Column types and predicates that keep Postgres-native storage and operators
+# but fall back to JSON on SQLite, so the app also runs on an in-memory SQLite
+# database for tests and benchmarks (DATABASE_URL=sqlite://).
+
+# text[] on Postgres, a JSON array on SQLite. The Postgres ARRAY type provides .overlap()
+StringList = ARRAY(String).with_variant(JSON(), "sqlite")
+
+
+def array_overlap(db: Session, column, values: Iterable[str]) -> ColumnElement:
+    """Rows whose array column shares any element with `values` (column && ARRAY[...] on Postgres)"""
+    values = list(values)
+    if db.bind.dialect.name == "postgresql":
+        return column.overlap(values)
+    elements = func.json_each(column).table_valued("value")
+    return select(elements.c.value).where(elements.c.value.in_(values)).exists()
+
+
+def array_elements(db: Session, column):
+    """Table-valued function yielding one row per array element, as column `value`"""
+    if db.bind.dialect.name == "postgresql":
+        return func.unnest(column).table_valued("value").render_derived()
+    return func.json_each(column).table_valued("value")
+
+
+def new_uuid(db: Session) -> ColumnElement:
+    """A random (v4) UUID string generated in SQL, for ids of rows copied with INSERT ... SELECT"""
+    if db.bind.dialect.name == "postgresql":
+        return cast(func.gen_random_uuid(), String)
+
+    def hex_bytes(n):
+        return func.lower(func.hex(func.randomblob(n)))
+    return (
+        hex_bytes(4) + "-" + hex_bytes(2) + "-4" + func.substr(hex_bytes(2), 2) + "-"
+        + func.substr("89ab", 1 + func.abs(func.random()) % 4, 1) + func.substr(hex_bytes(2), 2) + "-"
+        + hex_bytes(6)
+    )
+
+
+def random_fraction(db: Session) -> ColumnElement:
+    """A uniform random float in [0, 1) generated in SQL (SQLite's random() is a 64-bit integer)"""
+    if db.bind.dialect.name == "postgresql":
+        return func.random()
+    return (func.abs(func.random()) % 1000000000) / 1e9
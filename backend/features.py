@@ -0,0 +1,248 @@
+"""
+Derived per-conversation metrics over ConversationLog transcripts.
+
+Transcripts are streamed from the database in id-ordered chunks as raw JSON
+text (or compressed blobs) and fanned out to a process pool, where parsing and feature extraction
+(the CPU-bound part) happen. Results are upserted into conversation_features
+in one multi-row statement per chunk. Only conversations without features, or
+with features from an older FEATURE_VERSION, are processed, so reruns are
+incremental.
+
+    python -m features [--workers N] [--chunk-size N]
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from statistics import median
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import json
+import multiprocessing
+import os
+
+from sqlalchemy import Text, cast, func, or_
+from sqlalchemy.orm import Session
+
+import models
+import transcript_codec
+
+# Bump when extraction logic changes; older rows are then recomputed
+FEATURE_VERSION = 1
+
+# Average speaking rate used to estimate how long an assistant turn lasts
+WORDS_PER_SECOND = 2.5
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def _parse_timestamp(value: Any) -> Optional[float]:
+    """Client timestamps are local 'HH:MM:SS.mmm'; return seconds since midnight"""
+    if not isinstance(value, str):
+        return None
+    try:
+        hours, minutes, seconds = value.split(":")
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except ValueError:
+        return None
+
+
+def extract_features(transcript: Dict[str, Any]) -> Dict[str, Any]:
+    """Compute speaking-turn, timing and tool-call metrics for one transcript"""
+    messages = [m for m in (transcript.get("messages") or []) if isinstance(m, dict)]
+    tool_call_count = len(transcript.get("tool_calls") or [])
+
+    # Collapse consecutive messages from the same speaker into turns
+    turns: List[Tuple[str, int, Optional[float]]] = []  # (role, words, start seconds)
+    previous_time = None
+    day_offset = 0.0
+    for message in messages:
+        role = message.get("role")
+        if role not in ("user", "assistant"):
+            tool_call_count += 1
+            continue
+
+        words = len(str(message.get("content") or "").split())
+        timestamp = _parse_timestamp(message.get("timestamp"))
+        if timestamp is not None:
+            # Timestamps have no date; a large backwards jump means we crossed midnight
+            if previous_time is not None and timestamp + day_offset < previous_time - SECONDS_PER_DAY / 2:
+                day_offset += SECONDS_PER_DAY
+            timestamp += day_offset
+            previous_time = timestamp
+
+        if turns and turns[-1][0] == role:
+            last_role, last_words, last_start = turns[-1]
+            turns[-1] = (last_role, last_words + words, last_start if last_start is not None else timestamp)
+        else:
+            turns.append((role, words, timestamp))
+
+    user_turn_words = [words for role, words, _ in turns if role == "user"]
+    assistant_turn_words = [words for role, words, _ in turns if role == "assistant"]
+
+    response_gaps = []
+    interruptions = 0
+    for (role, words, start), (next_role, _, next_start) in zip(turns, turns[1:]):
+        if start is None or next_start is None:
+            continue
+        gap = next_start - start
+        if role == "user" and next_role == "assistant":
+            response_gaps.append(max(gap, 0.0))
+        elif role == "assistant" and next_role == "user" and gap < words / WORDS_PER_SECOND:
+            # User started speaking before the assistant could have finished
+            interruptions += 1
+
+    return {
+        "feature_version": FEATURE_VERSION,
+        "message_count": len(messages),
+        "user_turns": len(user_turn_words),
+        "assistant_turns": len(assistant_turn_words),
+        "user_words": sum(user_turn_words),
+        "assistant_words": sum(assistant_turn_words),
+        "mean_user_turn_words": sum(user_turn_words) / len(user_turn_words) if user_turn_words else None,
+        "mean_assistant_turn_words": (
+            sum(assistant_turn_words) / len(assistant_turn_words) if assistant_turn_words else None
+        ),
+        "mean_response_gap": sum(response_gaps) / len(response_gaps) if response_gaps else None,
+        "median_response_gap": median(response_gaps) if response_gaps else None,
+        "max_response_gap": max(response_gaps) if response_gaps else None,
+        "interruptions": interruptions,
+        "tool_call_count": tool_call_count,
+    }
+
+
+# Compressed-transcript dictionaries, handed to each pool process once by _init_worker
+_dictionaries: Dict[int, bytes] = {}
+
+
+def _init_worker(dictionaries: Dict[int, bytes]) -> None:
+    _dictionaries.update(dictionaries)
+
+
+Row = Tuple[str, Optional[str], Optional[bytes], Optional[int]]  # (id, JSON text, zstd blob, dictionary id)
+
+
+def _extract_chunk(rows: List[Row]) -> List[Dict[str, Any]]:
+    """Process-pool entry point: parse (or decompress) raw transcripts and extract features"""
+    results = []
+    for conversation_id, raw, blob, dict_id in rows:
+        try:
+            if blob is not None:
+                transcript = transcript_codec.decompress(blob, dict_id, _dictionaries.__getitem__)
+            else:
+                transcript = json.loads(raw) if raw else {}
+        except ValueError:
+            transcript = {}
+        features = extract_features(transcript if isinstance(transcript, dict) else {})
+        features["conversation_id"] = conversation_id
+        results.append(features)
+    return results
+
+
+def _pending_chunk(db: Session, after_id: str, chunk_size: int) -> List[Row]:
+    """Next chunk of conversations whose features are missing or stale, with their raw transcripts"""
+    return db.query(
+        models.ConversationLog.id,
+        cast(models.ConversationLog.transcript_json, Text),
+        models.ConversationLog.transcript_blob,
+        models.ConversationLog.transcript_dict_id,
+    ).outerjoin(
+        models.ConversationFeatures,
+        models.ConversationFeatures.conversation_id == models.ConversationLog.id
+    ).filter(
+        models.ConversationLog.id > after_id,
+        or_(
+            models.ConversationFeatures.conversation_id.is_(None),
+            models.ConversationFeatures.feature_version < FEATURE_VERSION
+        )
+    ).order_by(models.ConversationLog.id).limit(chunk_size).all()
+
+
+def count_pending(db: Session) -> int:
+    return db.query(models.ConversationLog.id).outerjoin(
+        models.ConversationFeatures,
+        models.ConversationFeatures.conversation_id == models.ConversationLog.id
+    ).filter(
+        or_(
+            models.ConversationFeatures.conversation_id.is_(None),
+            models.ConversationFeatures.feature_version < FEATURE_VERSION
+        )
+    ).count()
+
+
+def _upsert(db: Session, rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        return
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    statement = insert(models.ConversationFeatures).values(rows)
+    columns = {key: statement.excluded[key] for key in rows[0] if key != "conversation_id"}
+    columns["computed_at"] = func.now()  # server_default only applies to the insert
+    db.execute(statement.on_conflict_do_update(index_elements=["conversation_id"], set_=columns))
+    db.commit()
+
+
+def run_pipeline(
+    db: Session,
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Compute features for all pending conversations; returns the number processed"""
+    workers = workers or os.cpu_count() or 1
+    processed = 0
+    last_id = ""
+    in_flight = set()
+
+    dictionaries = dict(db.query(models.TranscriptDictionary.id, models.TranscriptDictionary.data).all())
+    db.rollback()
+
+    # spawn: the caller may be a threaded server process holding DB connections
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(dictionaries,)
+    ) as pool:
+        while True:
+            # Keep the pool busy while bounding memory to a couple of chunks per worker
+            while len(in_flight) < workers * 2:
+                rows = _pending_chunk(db, last_id, chunk_size)
+                db.rollback()  # Don't hold a snapshot open between chunks
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                in_flight.add(pool.submit(_extract_chunk, rows))
+
+            if not in_flight:
+                break
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                results = future.result()
+                _upsert(db, results)
+                processed += len(results)
+                if on_progress:
+                    on_progress(processed)
+
+    return processed
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Compute conversation_features for new or stale conversations")
+    parser.add_argument("--workers", type=int, default=None, help="Process count (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        total = count_pending(session)
+        print(f"{total} conversation(s) pending")
+        count = run_pipeline(
+            session,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            on_progress=lambda n: print(f"\r{n}/{total}", end="", flush=True),
+        )
+        print(f"\nComputed features for {count} conversation(s)")
@@ -0,0 +1,192 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+import asyncio
+import logging
+import os
+import socket
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+import models
+
+# Lightweight Postgres-backed job queue. Jobs are rows in `jobs`; workers claim
+# them with SELECT ... FOR UPDATE SKIP LOCKED so any number of workers (in the
+# API process or `python -m worker`) can poll without blocking each other.
+#
+# Handlers are registered with @job_handler("kind") and called as
+# handler(db, params, ctx). They should work in chunks, commit per chunk and
+# call ctx.report() after each one: that persists progress, renews the lease
+# and raises JobCancelled if cancellation was requested.
+
+logger = logging.getLogger("jobs")
+
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+JOB_RETRY_BACKOFF_SECONDS = int(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "30"))
+
+HANDLERS: Dict[str, Callable[..., Optional[Dict[str, Any]]]] = {}
+
+
+def job_handler(kind: str):
+    """Register a function as the handler for jobs of this kind"""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobContext:
+    def __init__(self, job_id: str, worker_id: str):
+        self.job_id = job_id
+        self.worker_id = worker_id
+
+    def report(self, progress: float, message: Optional[str] = None) -> None:
+        """Persist progress (0.0-1.0) and renew the lease; raises JobCancelled when asked to stop"""
+        with SessionLocal() as db:
+            row = db.execute(
+                update(models.Job)
+                .where(models.Job.id == self.job_id, models.Job.locked_by == self.worker_id)
+                .values(
+                    progress=max(0.0, min(1.0, progress)),
+                    progress_message=message,
+                    heartbeat_at=_now()
+                )
+                .returning(models.Job.cancel_requested)
+            ).first()
+            db.commit()
+
+        if row is None:
+            raise JobCancelled("Lease lost to another worker")
+        if row.cancel_requested:
+            raise JobCancelled("Cancelled by request")
+
+
+def enqueue(db: Session, kind: str, params: Optional[Dict[str, Any]] = None, max_attempts: int = 3) -> models.Job:
+    """Add a job to the queue (caller commits)"""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind '{kind}'")
+    job = models.Job(kind=kind, params=params or {}, max_attempts=max_attempts, run_after=_now())
+    db.add(job)
+    return job
+
+
+def claim_job(worker_id: str) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """Claim the next runnable job (queued, or running with an expired lease)"""
+    now = _now()
+    with SessionLocal() as db:
+        job = db.query(models.Job).filter(
+            or_(
+                and_(models.Job.status == "queued", models.Job.run_after <= now),
+                and_(
+                    models.Job.status == "running",
+                    models.Job.heartbeat_at < now - timedelta(seconds=JOB_LEASE_SECONDS)
+                )
+            )
+        ).order_by(models.Job.run_after).with_for_update(skip_locked=True).limit(1).first()
+
+        if job is None:
+            return None
+
+        if job.status == "running" and job.attempts >= job.max_attempts:
+            # Its worker died on the last allowed attempt
+            job.status = "failed"
+            job.error = "Worker lease expired"
+            job.finished_at = now
+            job.locked_by = None
+            db.commit()
+            return None
+
+        job.status = "running"
+        job.attempts += 1
+        job.locked_by = worker_id
+        job.heartbeat_at = now
+        job.started_at = job.started_at or now
+        claimed = (job.id, job.kind, dict(job.params or {}))
+        db.commit()
+        return claimed
+
+
+def _finish(job_id: str, worker_id: str, **values) -> None:
+    with SessionLocal() as db:
+        db.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, models.Job.locked_by == worker_id)
+            .values(locked_by=None, heartbeat_at=None, **values)
+        )
+        db.commit()
+
+
+def run_job(job_id: str, kind: str, params: Dict[str, Any], worker_id: str) -> None:
+    """Run a claimed job to completion and record the outcome"""
+    ctx = JobContext(job_id, worker_id)
+    with SessionLocal() as db:
+        try:
+            handler = HANDLERS.get(kind)
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind '{kind}'")
+            result = handler(db, params, ctx)
+        except JobCancelled as e:
+            db.rollback()
+            logger.info("Job %s (%s) stopped: %s", job_id, kind, e)
+            _finish(job_id, worker_id, status="cancelled", finished_at=_now())
+            return
+        except Exception as e:
+            db.rollback()
+            logger.exception("Job %s (%s) failed", job_id, kind)
+            job = db.get(models.Job, job_id)
+            if job is not None and job.attempts < job.max_attempts:
+                _finish(
+                    job_id, worker_id,
+                    status="queued",
+                    error=str(e),
+                    run_after=_now() + timedelta(seconds=JOB_RETRY_BACKOFF_SECONDS * job.attempts)
+                )
+            else:
+                _finish(job_id, worker_id, status="failed", error=str(e), finished_at=_now())
+            return
+
+    _finish(
+        job_id, worker_id,
+        status="succeeded",
+        progress=1.0,
+        result=result,
+        error=None,
+        finished_at=_now()
+    )
+
+
+async def run_worker(stop: asyncio.Event, concurrency: int = JOB_WORKER_CONCURRENCY) -> None:
+    """Poll for jobs with `concurrency` slots until `stop` is set; handlers run in threads"""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    async def slot(n: int):
+        slot_id = f"{worker_id}:{n}"
+        while not stop.is_set():
+            try:
+                claimed = await asyncio.to_thread(claim_job, slot_id)
+            except Exception:
+                logger.exception("Failed to claim job")
+                claimed = None
+
+            if claimed is None:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await asyncio.to_thread(run_job, *claimed, slot_id)
+
+    logger.info("Job worker %s started with %d slot(s)", worker_id, concurrency)
+    await asyncio.gather(*(slot(n) for n in range(concurrency)))
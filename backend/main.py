@@ -1,19 +1,74 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
+import logging
+import os
+import time
 import uvicorn
+from sqlalchemy.exc import OperationalError
 
-from database import engine, Base
-from routers import conversations, participants, assignments, session, agents
+from database import engine, Base, IN_MEMORY_SQLITE, check_schema_revision, warm_pool
+from routers import conversations, participants, assignments, session, agents, jobs, telemetry, profiler, batch, annotations
+from jobs import run_worker
+from telemetry import run_flusher
+from profiler import ProfilerMiddleware
+from rate_limit import RateLimitMiddleware
+import statement_timeouts
+
+logger = logging.getLogger("uvicorn.error")
+
+# Set DB_CREATE_ALL=1 to create tables directly (local development without migrations)
+DB_CREATE_ALL = os.getenv("DB_CREATE_ALL", "1" if IN_MEMORY_SQLITE else "0") == "1"
+
+if IN_MEMORY_SQLITE:
+    # Create tables before the first request, even when the app is used without its lifespan
+    Base.metadata.create_all(bind=engine)
+
+# Set JOB_WORKER_IN_PROCESS=1 to run background jobs inside each API worker instead of `python -m worker`
+JOB_WORKER_IN_PROCESS = os.getenv("JOB_WORKER_IN_PROCESS", "0") == "1"
+
+async def _prepare(app: FastAPI, started: float):
+    """Verify the schema and warm the pool in the background; /ready reports the outcome"""
+    try:
+        if DB_CREATE_ALL:
+            await asyncio.to_thread(Base.metadata.create_all, bind=engine)
+        else:
+            problem = await asyncio.to_thread(check_schema_revision)
+            if problem:
+                app.state.not_ready_reason = f"Schema out of date: {problem}"
+                logger.warning(app.state.not_ready_reason)
+                return
+        await asyncio.to_thread(warm_pool)
+    except Exception as e:
+        app.state.not_ready_reason = f"Startup failed: {e}"
+        logger.exception("Backend startup failed")
+        return
+
+    app.state.ready = True
+    app.state.not_ready_reason = None
+    logger.info("Worker %s ready in %.0f ms", os.getpid(), (time.perf_counter() - started) * 1000)
 
-# Create tables on startup
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    Base.metadata.create_all(bind=engine)
+    app.state.ready = False
+    app.state.not_ready_reason = "Starting up"
+    prepare = asyncio.create_task(_prepare(app, time.perf_counter()))
+    stop_jobs = asyncio.Event()
+    job_worker = asyncio.create_task(run_worker(stop_jobs)) if JOB_WORKER_IN_PROCESS else None
+    stop_telemetry = asyncio.Event()
+    telemetry_flusher = asyncio.create_task(run_flusher(stop_telemetry))
     yield
     # Shutdown
-    pass
+    prepare.cancel()
+    if job_worker:
+        stop_jobs.set()
+        await job_worker
+    stop_telemetry.set()
+    await telemetry_flusher
+    engine.dispose()
 
 app = FastAPI(
     title="Realtime Agents Backend",
@@ -22,6 +77,13 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Per-route statement timeouts and query cancellation when the client disconnects
+app.add_middleware(statement_timeouts.StatementTimeoutMiddleware)
+app.add_exception_handler(OperationalError, statement_timeouts.query_timeout_handler)
+
+# Token-bucket limits on the routes clients can flood (added first so it sits inside CORS)
+app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware - must be added before routes
 app.add_middleware(
     CORSMiddleware,
@@ -38,12 +100,20 @@ app.add_middleware(
     max_age=3600,
 )
 
+# Idle unless a run is started through /api/profiler
+app.add_middleware(ProfilerMiddleware)
+
 # Include routers
 app.include_router(agents.router, prefix="/api/agents", tags=["agents"])
 app.include_router(conversations.router, prefix="/api/conversations", tags=["conversations"])
 app.include_router(participants.router, prefix="/api/participants", tags=["participants"])
 app.include_router(assignments.router, prefix="/api/assignments", tags=["assignments"])
+app.include_router(batch.router, prefix="/api/batch", tags=["batch"])
+app.include_router(annotations.router, prefix="/api/annotations", tags=["annotations"])
 app.include_router(session.router, prefix="/api/session", tags=["session"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
+app.include_router(telemetry.router, prefix="/api/telemetry", tags=["telemetry"])
+app.include_router(profiler.router, prefix="/api/profiler", tags=["profiler"])
 
 @app.get("/")
 async def root():
@@ -53,5 +123,17 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Ready once the schema is at the Alembic head and this worker's DB pool is warm"""
+    if not app.state.ready:
+        return JSONResponse(status_code=503, content={"status": "not_ready", "detail": app.state.not_ready_reason})
+    return {"status": "ready"}
+
+@app.get("/metrics/db")
+async def database_metrics():
+    """This worker's pool usage and statements stopped by timeouts or client disconnects, per route budget"""
+    return statement_timeouts.snapshot()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
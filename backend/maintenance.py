@@ -0,0 +1,120 @@
+from typing import Any, Dict
+
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.orm import Session
+
+from features import count_pending, run_pipeline
+from jobs import JobContext, job_handler
+import models
+
+# Maintenance job handlers. Each works in bounded chunks with a commit and a
+# progress report per chunk, so it can be cancelled between chunks and never
+# holds locks for long.
+
+DEFAULT_BATCH_SIZE = 500
+
+
+@job_handler("recompute_agent_stats")
+def recompute_agent_stats(db: Session, params: Dict[str, Any], ctx: JobContext):
+    """Recompute total_runs, avg_duration and success_rate for every agent from conversation logs"""
+    batch_size = int(params.get("batch_size", DEFAULT_BATCH_SIZE))
+    total = db.query(func.count(models.Agent.id)).scalar() or 0
+    done = 0
+    last_id = ""
+
+    while True:
+        agent_ids = [row[0] for row in db.query(models.Agent.id).filter(
+            models.Agent.id > last_id
+        ).order_by(models.Agent.id).limit(batch_size).all()]
+        if not agent_ids:
+            break
+
+        stats = {
+            agent_id: (runs, avg_duration, rated, completed)
+            for agent_id, runs, avg_duration, rated, completed in db.query(
+                models.ConversationLog.agent_id,
+                func.count(models.ConversationLog.id),
+                func.avg(models.ConversationLog.duration),
+                func.count(models.ConversationLog.task_completed),
+                func.sum(case((models.ConversationLog.task_completed == True, 1), else_=0)),
+            ).filter(
+                models.ConversationLog.agent_id.in_(agent_ids)
+            ).group_by(models.ConversationLog.agent_id).all()
+        }
+
+        for agent in db.query(models.Agent).filter(models.Agent.id.in_(agent_ids)):
+            runs, avg_duration, rated, completed = stats.get(agent.id, (0, None, 0, 0))
+            agent.total_runs = runs
+            agent.avg_duration = float(avg_duration) if avg_duration is not None else None
+            agent.success_rate = (completed / rated) * 100 if rated else None
+        db.commit()
+
+        done += len(agent_ids)
+        last_id = agent_ids[-1]
+        ctx.report(done / total if total else 1.0, f"{done}/{total} agents")
+
+    return {"agents_updated": done}
+
+
+@job_handler("compact_autosaves")
+def compact_autosaves(db: Session, params: Dict[str, Any], ctx: JobContext):
+    """
+    Auto-save posts a new conversation log with the full transcript so far on every save.
+    Keep the most complete log per session_id (highest turn_count, then newest) and delete the rest.
+    Pass {"dry_run": true} to only count.
+    """
+    batch_size = int(params.get("batch_size", DEFAULT_BATCH_SIZE))
+    dry_run = bool(params.get("dry_run", False))
+
+    duplicated_sessions = db.query(models.ConversationLog.session_id).group_by(
+        models.ConversationLog.session_id
+    ).having(func.count(models.ConversationLog.id) > 1)
+    total = duplicated_sessions.count()
+    sessions_done = 0
+    removed = 0
+    last_session = ""
+
+    while True:
+        session_ids = [row[0] for row in duplicated_sessions.filter(
+            models.ConversationLog.session_id > last_session
+        ).order_by(models.ConversationLog.session_id).limit(batch_size).all()]
+        if not session_ids:
+            break
+
+        ranked = select(
+            models.ConversationLog.id,
+            func.row_number().over(
+                partition_by=models.ConversationLog.session_id,
+                order_by=(models.ConversationLog.turn_count.desc(), models.ConversationLog.created_at.desc())
+            ).label("rank")
+        ).where(models.ConversationLog.session_id.in_(session_ids)).subquery()
+        superseded = select(ranked.c.id).where(ranked.c.rank > 1)
+
+        if dry_run:
+            removed += db.query(func.count()).select_from(superseded.subquery()).scalar()
+        else:
+            removed += db.execute(
+                delete(models.ConversationLog).where(models.ConversationLog.id.in_(superseded))
+            ).rowcount
+            db.commit()
+
+        sessions_done += len(session_ids)
+        last_session = session_ids[-1]
+        ctx.report(sessions_done / total if total else 1.0, f"{sessions_done}/{total} sessions")
+
+    return {"sessions": sessions_done, "logs_removed": removed, "dry_run": dry_run}
+
+
+@job_handler("extract_conversation_features")
+def extract_conversation_features(db: Session, params: Dict[str, Any], ctx: JobContext):
+    """Compute conversation_features for new or stale conversations on a process pool"""
+    total = count_pending(db)
+    db.rollback()
+
+    processed = run_pipeline(
+        db,
+        workers=params.get("workers"),
+        chunk_size=int(params.get("chunk_size", DEFAULT_BATCH_SIZE)),
+        on_progress=lambda done: ctx.report(done / total if total else 1.0, f"{done}/{total} conversations"),
+    )
+    return {"conversations": processed}
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, String, Float, Integer, Boolean, DateTime, Text, ARRAY, JSON, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Float, Integer, SmallInteger, BigInteger, Boolean, DateTime, Text, JSON, LargeBinary, ForeignKey, Index, DDL, event, select, text
+from sqlalchemy.orm import attributes, deferred, object_session, relationship
 from sqlalchemy.sql import func
 from database import Base
+from db_types import StringList
+import transcript_codec
 import uuid
 
 def generate_uuid():
@@ -15,9 +17,9 @@ class Agent(Base):
     display_name = Column(String, nullable=False, index=True)  # Human-readable label (e.g., "Sales Assistant")
     agent_config = Column(String, nullable=False, index=True)  # Logical grouping / scenario (e.g., "chatSupervisor")
     
-    # Prompt content
-    system_prompt = Column(Text, nullable=False)
-    instructions = Column(Text, nullable=True)
+    # Prompt content, stored once per distinct text in prompt_contents
+    system_prompt_hash = Column(String(64), ForeignKey("prompt_contents.hash"), nullable=False, index=True)
+    instructions_hash = Column(String(64), ForeignKey("prompt_contents.hash"), nullable=True)
     
     # Agent parameters
     temperature = Column(Float, default=0.8)
@@ -26,7 +28,7 @@ class Agent(Base):
     
     # Metadata
     description = Column(Text, nullable=True)
-    tags = Column(ARRAY(String), default=list)
+    tags = Column(StringList, default=list)
     is_active = Column(Boolean, default=False, index=True)
     
     # Performance tracking
@@ -39,6 +41,80 @@ class Agent(Base):
     
     # Relationship
     conversations = relationship("ConversationLog", back_populates="agent")
+    system_prompt_content = relationship("PromptContent", foreign_keys=[system_prompt_hash])
+    instructions_content = relationship("PromptContent", foreign_keys=[instructions_hash])
+
+    @property
+    def system_prompt(self):
+        return self.system_prompt_content.content if self.system_prompt_content else None
+
+    @property
+    def instructions(self):
+        return self.instructions_content.content if self.instructions_content else None
+
+    __table_args__ = (
+        # At most one active version per (config, name); also serves the by-name lookup
+        Index(
+            "uq_agents_active_config_name",
+            "agent_config",
+            "agent_name",
+            unique=True,
+            postgresql_where=text("is_active"),
+            sqlite_where=text("is_active"),
+        ),
+        # Tag overlap filters and substring/fuzzy search (pg_trgm); Postgres only
+        Index("ix_agents_tags_gin", "tags", postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index(
+            "ix_agents_display_name_trgm",
+            "display_name",
+            postgresql_using="gin",
+            postgresql_ops={"display_name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_agents_description_trgm",
+            "description",
+            postgresql_using="gin",
+            postgresql_ops={"description": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+# The trigram indexes need pg_trgm when tables are created without migrations (DB_CREATE_ALL=1)
+event.listen(
+    Agent.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+class PromptContent(Base):
+    __tablename__ = "prompt_contents"
+
+    hash = Column(String(64), primary_key=True)  # sha256 hex digest of content
+    content = Column(Text, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class AgentVersion(Base):
+    """Append-only snapshot of an agent's runtime configuration, written on create/update"""
+    __tablename__ = "agent_versions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    agent_id = Column(String, ForeignKey("agents.id", ondelete="SET NULL"), nullable=True, index=True)
+    version = Column(Integer, nullable=False)  # 1, 2, ... per agent
+
+    agent_config = Column(String, nullable=False)
+    agent_name = Column(String, nullable=False)
+    display_name = Column(String, nullable=False)
+    system_prompt_hash = Column(String(64), ForeignKey("prompt_contents.hash"), nullable=False)
+    instructions_hash = Column(String(64), ForeignKey("prompt_contents.hash"), nullable=True)
+    temperature = Column(Float, nullable=True)
+    max_tokens = Column(Integer, nullable=True)
+    voice = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("uq_agent_versions_agent_version", "agent_id", "version", unique=True),
+    )
 
 class ConversationLog(Base):
     __tablename__ = "conversation_logs"
@@ -46,13 +122,20 @@ class ConversationLog(Base):
     id = Column(String, primary_key=True, default=generate_uuid)
     agent_id = Column(String, ForeignKey("agents.id", ondelete="SET NULL"), nullable=True, index=True)
     participant_id = Column(String, ForeignKey("participants.id", ondelete="SET NULL"), nullable=True, index=True)
+    agent_version_id = Column(Integer, ForeignKey("agent_versions.id"), nullable=True, index=True)
     
     session_id = Column(String, nullable=False, index=True)
     agent_config = Column(String, nullable=False, index=True)
     agent_name = Column(String, nullable=False)
     
-    # Conversation data
-    transcript = Column(JSON, nullable=False)
+    # Conversation data. The transcript is stored either as JSON or, with
+    # TRANSCRIPT_COMPRESSION=zstd, as a compressed blob (see transcript_codec.py).
+    # Both are deferred so list and analytics queries never read them; use .transcript.
+    transcript_json = deferred(Column("transcript", JSON(none_as_null=True), nullable=True), group="transcript")
+    transcript_blob = deferred(Column(LargeBinary, nullable=True), group="transcript")
+    transcript_dict_id = Column(Integer, ForeignKey("transcript_dictionaries.id"), nullable=True)
+    message_count = Column(Integer, nullable=True)
+    transcript_size = Column(Integer, nullable=True)  # Uncompressed JSON bytes
     duration = Column(Float, nullable=False)
     turn_count = Column(Integer, nullable=False)
     
@@ -63,11 +146,105 @@ class ConversationLog(Base):
     extra_metadata = Column(JSON, nullable=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    anonymized_at = Column(DateTime(timezone=True), nullable=True)  # Set by retention.py when PII is cleared
     
     # Relationships
     agent = relationship("Agent", back_populates="conversations")
     participant = relationship("Participant")
 
+    @property
+    def transcript(self):
+        """The transcript as a dict; loads (and decompresses) it on first access"""
+        if self.transcript_blob is not None:
+            session = object_session(self)
+            return transcript_codec.decompress(
+                self.transcript_blob,
+                self.transcript_dict_id,
+                lambda dict_id: session.scalar(select(TranscriptDictionary.data).where(TranscriptDictionary.id == dict_id))
+            )
+        return self.transcript_json
+
+    @transcript.setter
+    def transcript(self, value):
+        # Stored as JSON here; compressed on flush when enabled
+        self.transcript_json = value
+        self.transcript_blob = None
+        self.transcript_dict_id = None
+        self.message_count, self.transcript_size = transcript_codec.summarize(value)
+
+@event.listens_for(ConversationLog, "before_insert")
+@event.listens_for(ConversationLog, "before_update")
+def _compress_transcript(mapper, connection, target):
+    if not transcript_codec.compression_enabled():
+        return
+    if not attributes.get_history(target, "transcript_json").added or target.transcript_json is None:
+        return  # Unchanged (or not loaded) since it was read
+
+    dict_id = transcript_codec.active_dictionary_id(
+        lambda: connection.scalar(select(func.max(TranscriptDictionary.id)))
+    )
+    target.transcript_blob = transcript_codec.compress(
+        target.transcript_json,
+        dict_id,
+        lambda dict_id: connection.scalar(select(TranscriptDictionary.data).where(TranscriptDictionary.id == dict_id))
+    )
+    target.transcript_dict_id = dict_id
+    target.transcript_json = None
+
+class TranscriptDictionary(Base):
+    """Trained zstd dictionary shared by compressed transcripts; newest one is used for new rows"""
+    __tablename__ = "transcript_dictionaries"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    data = Column(LargeBinary, nullable=False)
+    sample_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ConversationFeatures(Base):
+    """Derived per-conversation metrics, computed offline by features.py"""
+    __tablename__ = "conversation_features"
+
+    conversation_id = Column(String, ForeignKey("conversation_logs.id", ondelete="CASCADE"), primary_key=True)
+    feature_version = Column(Integer, nullable=False)  # Extractor version that produced this row
+
+    message_count = Column(Integer, nullable=False)
+    user_turns = Column(Integer, nullable=False)
+    assistant_turns = Column(Integer, nullable=False)
+    user_words = Column(Integer, nullable=False)
+    assistant_words = Column(Integer, nullable=False)
+    mean_user_turn_words = Column(Float, nullable=True)
+    mean_assistant_turn_words = Column(Float, nullable=True)
+
+    # Seconds from a user turn to the next assistant turn (from message timestamps)
+    mean_response_gap = Column(Float, nullable=True)
+    median_response_gap = Column(Float, nullable=True)
+    max_response_gap = Column(Float, nullable=True)
+    interruptions = Column(Integer, nullable=False, default=0)
+    tool_call_count = Column(Integer, nullable=False, default=0)
+
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ConversationSignature(Base):
+    """MinHash signature of a conversation's transcript text (see near_duplicates.py)"""
+    __tablename__ = "conversation_signatures"
+
+    conversation_id = Column(String, ForeignKey("conversation_logs.id", ondelete="CASCADE"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)  # NUM_PERM little-endian uint32 values
+    shingle_count = Column(Integer, nullable=False)  # 0: no text, so not in the LSH index
+    signed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ConversationLshBand(Base):
+    """LSH index: the bucket each signature band hashes to; conversations sharing a bucket are candidates"""
+    __tablename__ = "conversation_lsh_bands"
+
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    conversation_id = Column(String, ForeignKey("conversation_logs.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_conversation_lsh_bands_conversation_id", "conversation_id"),
+    )
+
 class Participant(Base):
     __tablename__ = "participants"
     
@@ -135,3 +312,122 @@ class User(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     last_login = Column(DateTime(timezone=True), nullable=True)
+
+class Job(Base):
+    """Background maintenance job, claimed by workers with FOR UPDATE SKIP LOCKED"""
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    kind = Column(String, nullable=False, index=True)  # Registered handler name (see jobs.py)
+    params = Column(JSON, nullable=True)
+
+    # queued -> running -> succeeded | failed | cancelled
+    status = Column(String, nullable=False, default="queued")
+    progress = Column(Float, nullable=False, default=0.0)  # 0.0 - 1.0
+    progress_message = Column(Text, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+
+    run_after = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_by = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
+class TelemetryEvent(Base):
+    """One client-reported latency/counter sample; written in bulk by telemetry.py"""
+    __tablename__ = "telemetry_events"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    ts = Column(DateTime(timezone=True), nullable=False)
+    session_id = Column(String, nullable=False)
+    metric = Column(String, nullable=False)  # e.g. "first_audio_ms", "tool_call_ms", "reconnect"
+    value = Column(Float, nullable=False)
+
+    # Denormalized so aggregates don't need joins
+    agent_id = Column(String, nullable=True)
+    agent_config = Column(String, nullable=True)
+    voice = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_telemetry_events_ts", "ts"),
+        Index("ix_telemetry_events_metric_config_ts", "metric", "agent_config", "ts"),
+        Index("ix_telemetry_events_session_id", "session_id"),
+    )
+
+class LiveSession(Base):
+    """Shared live-session registry used when SESSION_REGISTRY=database (see capacity.py)"""
+    __tablename__ = "live_sessions"
+
+    key = Column(String, primary_key=True)  # participant_id
+    agent_config = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_live_sessions_config_expires", "agent_config", "expires_at"),
+        Index("ix_live_sessions_expires_at", "expires_at"),
+    )
+
+class RateLimitBucket(Base):
+    """Shared token bucket used when RATE_LIMIT_BACKEND=database (see rate_limit.py)"""
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)  # rule index + client identity
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False, index=True)  # Epoch seconds of the last refill
+    allowed = Column(Boolean, nullable=False)  # Outcome of the last request, read back with RETURNING
+
+class AnnotationItem(Base):
+    """A conversation in the rating queue; raters lease batches with FOR UPDATE SKIP LOCKED (see annotations.py)"""
+    __tablename__ = "annotation_items"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    conversation_id = Column(String, ForeignKey("conversation_logs.id", ondelete="CASCADE"), nullable=False, unique=True)
+
+    # Denormalized strata so claims are answered from the partial indexes below
+    agent_id = Column(String, nullable=True)
+    agent_config = Column(String, nullable=False)
+    sample_key = Column(Float, nullable=False)  # Uniform in [0, 1); scanning from a random point samples without ORDER BY random()
+
+    leased_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+
+    rated_by = Column(String, nullable=True, index=True)
+    rated_at = Column(DateTime(timezone=True), nullable=True)
+    labels = Column(JSON, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Only unrated items are indexed, so the indexes shrink as rating progresses
+    __table_args__ = (
+        Index(
+            "ix_annotation_items_open_sample",
+            "sample_key",
+            postgresql_where=text("rated_at IS NULL"),
+            sqlite_where=text("rated_at IS NULL"),
+        ),
+        Index(
+            "ix_annotation_items_open_config_sample",
+            "agent_config",
+            "sample_key",
+            postgresql_where=text("rated_at IS NULL"),
+            sqlite_where=text("rated_at IS NULL"),
+        ),
+        Index(
+            "ix_annotation_items_open_agent_sample",
+            "agent_id",
+            "sample_key",
+            postgresql_where=text("rated_at IS NULL"),
+            sqlite_where=text("rated_at IS NULL"),
+        ),
+    )
@@ -0,0 +1,344 @@
+"""
+Near-duplicate conversation detection with MinHash signatures and LSH banding.
+
+    python -m near_duplicates [--batch-size N]
+
+Each transcript's text is reduced to a set of word 3-gram shingles and a
+NUM_PERM-value MinHash signature, stored as packed uint32s in
+conversation_signatures. The signature is cut into BANDS bands of ROWS values;
+each band is hashed to a bucket in conversation_lsh_bands, so conversations
+sharing any bucket are candidates (likely when Jaccard similarity is above
+~(1/BANDS)^(1/ROWS) = 0.71) and only candidates' signatures are compared.
+
+New conversations are signed when they are created. The command above (or the
+sign_conversations job) signs the rest in id-ordered batches; with the optional
+numpy package a whole batch is hashed in a few array operations.
+"""
+from hashlib import blake2b
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import argparse
+import json
+import random
+import re
+import struct
+import zlib
+
+from sqlalchemy import Text, cast, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from jobs import JobContext, job_handler
+import models
+import transcript_codec
+
+try:
+    import numpy
+except ImportError:  # Optional dependency: pip install numpy (faster batch signing)
+    numpy = None
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+DEFAULT_BATCH_SIZE = 500
+NUMPY_BLOCK_SHINGLES = 32768
+
+# Hash family h(x) = (a * x + b) mod P over 32-bit shingle hashes; a * x stays below 2**63,
+# so numpy can evaluate it in uint64 without overflow. Fixed seed: signatures must be stable.
+PRIME = (1 << 31) - 1
+_rng = random.Random(0x5EED)
+PERMUTATIONS = [(_rng.randrange(1, PRIME), _rng.randrange(0, PRIME)) for _ in range(NUM_PERM)]
+EMPTY = (PRIME,) * NUM_PERM  # Signature of a transcript without text; never indexed
+
+_SIGNATURE = struct.Struct(f"<{NUM_PERM}I")
+_BAND = struct.Struct(f"<{ROWS}I")
+_WORD = re.compile(r"\w+")
+
+Signature = Sequence[int]
+
+
+def shingles(transcript: Any) -> List[int]:
+    """Distinct CRC32 hashes of the word 3-grams in the transcript's messages"""
+    messages = transcript.get("messages") if isinstance(transcript, dict) else None
+    words = []
+    for message in messages or []:
+        if isinstance(message, dict):
+            words += _WORD.findall(str(message.get("content") or "").lower())
+    if len(words) < SHINGLE_WORDS:
+        return [zlib.crc32(" ".join(words).encode())] if words else []
+    return list({
+        zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode())
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    })
+
+
+def minhash(hashes: List[int]) -> Signature:
+    if not hashes:
+        return EMPTY
+    return [min((a * x + b) % PRIME for x in hashes) for a, b in PERMUTATIONS]
+
+
+def minhash_many(hash_lists: List[List[int]]) -> List[Signature]:
+    """Signatures for many shingle sets; with numpy, one matrix operation per block of transcripts"""
+    if numpy is None:
+        return [minhash(hashes) for hashes in hash_lists]
+
+    signatures: List[Signature] = [EMPTY] * len(hash_lists)
+    a = numpy.array([a for a, _ in PERMUTATIONS], dtype=numpy.uint64)[:, None]
+    b = numpy.array([b for _, b in PERMUTATIONS], dtype=numpy.uint64)[:, None]
+
+    def flush(block: List[int]) -> None:
+        flat = numpy.fromiter((x for i in block for x in hash_lists[i]), dtype=numpy.uint64)
+        starts = numpy.cumsum([0] + [len(hash_lists[i]) for i in block[:-1]])
+        # (NUM_PERM, shingles in block) hashed values, then the minimum over each transcript's columns
+        mins = numpy.minimum.reduceat((a * flat + b) % PRIME, starts, axis=1)
+        for column, i in enumerate(block):
+            signatures[i] = mins[:, column].tolist()
+
+    # Blocks of about NUMPY_BLOCK_SHINGLES columns bound memory (128 x 32768 x 8 bytes = 32 MiB)
+    block: List[int] = []
+    width = 0
+    for i, hashes in enumerate(hash_lists):
+        if not hashes:
+            continue
+        if block and width + len(hashes) > NUMPY_BLOCK_SHINGLES:
+            flush(block)
+            block, width = [], 0
+        block.append(i)
+        width += len(hashes)
+    if block:
+        flush(block)
+    return signatures
+
+
+def pack(signature: Signature) -> bytes:
+    return _SIGNATURE.pack(*signature)
+
+
+def unpack(data: bytes) -> Tuple[int, ...]:
+    return _SIGNATURE.unpack(data)
+
+
+def band_buckets(signature: Signature) -> List[int]:
+    """Signed 64-bit bucket id for each band of the signature"""
+    buckets = []
+    for band in range(BANDS):
+        digest = blake2b(_BAND.pack(*signature[band * ROWS:(band + 1) * ROWS]), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, "little", signed=True))
+    return buckets
+
+
+def similarity(first: Signature, second: Signature) -> float:
+    """Estimated Jaccard similarity: the fraction of matching MinHash values"""
+    return sum(x == y for x, y in zip(first, second)) / NUM_PERM
+
+
+def store_signatures(db: Session, signed: Iterable[Tuple[str, List[int], Signature]]) -> int:
+    """Write (conversation id, shingles, signature) rows and their LSH buckets, replacing old ones (caller commits)"""
+    signature_rows, band_rows = [], []
+    for conversation_id, hashes, signature in signed:
+        signature_rows.append({"conversation_id": conversation_id, "signature": pack(signature), "shingle_count": len(hashes)})
+        if hashes:
+            band_rows += [
+                {"band": band, "bucket": bucket, "conversation_id": conversation_id}
+                for band, bucket in enumerate(band_buckets(signature))
+            ]
+    if not signature_rows:
+        return 0
+
+    ids = [row["conversation_id"] for row in signature_rows]
+    db.execute(delete(models.ConversationLshBand).where(models.ConversationLshBand.conversation_id.in_(ids)))
+    db.execute(delete(models.ConversationSignature).where(models.ConversationSignature.conversation_id.in_(ids)))
+    db.execute(insert(models.ConversationSignature.__table__), signature_rows)
+    if band_rows:
+        db.execute(insert(models.ConversationLshBand.__table__), band_rows)
+    return len(signature_rows)
+
+
+def sign_conversation(db: Session, conversation_id: str, transcript: Any) -> None:
+    """Sign one conversation as it is saved (caller commits)"""
+    hashes = shingles(transcript)
+    store_signatures(db, [(conversation_id, hashes, minhash_many([hashes])[0])])
+
+
+def _load_signatures(db: Session, conversation_ids: Iterable[str]) -> Dict[str, Tuple[int, ...]]:
+    Stored = models.ConversationSignature
+    return {
+        conversation_id: unpack(data)
+        for conversation_id, data in db.query(Stored.conversation_id, Stored.signature).filter(
+            Stored.conversation_id.in_(list(conversation_ids))
+        )
+    }
+
+
+def find_similar(db: Session, conversation_id: str, threshold: float) -> Optional[List[Tuple[str, float]]]:
+    """Conversations sharing an LSH bucket with this one and at least `threshold` similar, most similar first"""
+    Band = models.ConversationLshBand
+    own = _load_signatures(db, [conversation_id]).get(conversation_id)
+    if own is None:
+        return None
+
+    Other = Band.__table__.alias("other")
+    candidates = db.scalars(
+        select(Other.c.conversation_id).distinct().join(
+            Band, (Band.band == Other.c.band) & (Band.bucket == Other.c.bucket)
+        ).where(Band.conversation_id == conversation_id, Other.c.conversation_id != conversation_id)
+    ).all()
+
+    matches = []
+    for candidate, signature in _load_signatures(db, candidates).items():
+        score = similarity(own, signature)
+        if score >= threshold:
+            matches.append((candidate, score))
+    return sorted(matches, key=lambda match: -match[1])
+
+
+def find_clusters(
+    db: Session,
+    threshold: float,
+    agent_config: Optional[str] = None,
+    agent_id: Optional[str] = None
+) -> List[Tuple[List[str], float]]:
+    """
+    Groups of conversations linked by pairs at least `threshold` similar (single linkage),
+    largest first, with the lowest similarity among the linking pairs. Only conversations
+    sharing a bucket are compared, so the cost follows the number of candidates, not rows².
+    """
+    Band = models.ConversationLshBand
+    Log = models.ConversationLog
+    filters = []
+    if agent_config:
+        filters.append(Log.agent_config == agent_config)
+    if agent_id:
+        filters.append(Log.agent_id == agent_id)
+    # Narrow to the matching conversations before grouping, so only their buckets are counted
+    in_scope = [Band.conversation_id.in_(select(Log.id).where(*filters))] if filters else []
+    shared = select(Band.band, Band.bucket).where(*in_scope).group_by(
+        Band.band, Band.bucket
+    ).having(func.count() > 1).subquery()
+
+    buckets: Dict[Tuple[int, int], List[str]] = {}
+    for band, bucket, conversation_id in db.execute(
+        select(Band.band, Band.bucket, Band.conversation_id).join(
+            shared, (shared.c.band == Band.band) & (shared.c.bucket == Band.bucket)
+        ).where(*in_scope)
+    ):
+        buckets.setdefault((band, bucket), []).append(conversation_id)
+
+    signatures = _load_signatures(db, {cid for ids in buckets.values() for cid in ids})
+    parent = {cid: cid for cid in signatures}
+    weakest: Dict[str, float] = {}
+
+    def root(cid: str) -> str:
+        while parent[cid] != cid:
+            parent[cid] = parent[parent[cid]]
+            cid = parent[cid]
+        return cid
+
+    # Within a bucket, compare each member to the bucket's anchors (members that matched no
+    # earlier anchor) rather than to every other member: linear for big groups of copies
+    for ids in buckets.values():
+        anchors: List[str] = []
+        for cid in ids:
+            for anchor in anchors:
+                anchor_root, cid_root = root(anchor), root(cid)
+                if anchor_root == cid_root:
+                    break
+                score = similarity(signatures[anchor], signatures[cid])
+                if score >= threshold:
+                    parent[cid_root] = anchor_root
+                    weakest[anchor_root] = min(score, weakest.get(anchor_root, 1.0), weakest.get(cid_root, 1.0))
+                    break
+            else:
+                anchors.append(cid)
+
+    clusters: Dict[str, List[str]] = {}
+    for cid in signatures:
+        clusters.setdefault(root(cid), []).append(cid)
+    return sorted(
+        ((sorted(ids), weakest[cid]) for cid, ids in clusters.items() if len(ids) > 1),
+        key=lambda cluster: (-len(cluster[0]), cluster[0][0])
+    )
+
+
+Row = Tuple[str, Optional[str], Optional[bytes], Optional[int]]  # (id, JSON text, zstd blob, dictionary id)
+
+
+def _unsigned_batch(db: Session, after_id: str, batch_size: int) -> List[Row]:
+    Log = models.ConversationLog
+    return db.query(
+        Log.id, cast(Log.transcript_json, Text), Log.transcript_blob, Log.transcript_dict_id
+    ).outerjoin(
+        models.ConversationSignature, models.ConversationSignature.conversation_id == Log.id
+    ).filter(
+        Log.id > after_id,
+        models.ConversationSignature.conversation_id.is_(None)
+    ).order_by(Log.id).limit(batch_size).all()
+
+
+def count_unsigned(db: Session) -> int:
+    return db.query(models.ConversationLog.id).outerjoin(
+        models.ConversationSignature,
+        models.ConversationSignature.conversation_id == models.ConversationLog.id
+    ).filter(models.ConversationSignature.conversation_id.is_(None)).count()
+
+
+def sign_backlog(
+    db: Session,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    on_progress: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, int]:
+    """Sign every conversation without a signature, committing per batch"""
+    total = count_unsigned(db)
+    load_dictionary = lambda dict_id: db.get(models.TranscriptDictionary, dict_id).data
+    signed = 0
+    last_id = ""
+    while True:
+        rows = _unsigned_batch(db, last_id, batch_size)
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        hash_lists = []
+        for _, raw, blob, dict_id in rows:
+            try:
+                if blob is not None:
+                    transcript = transcript_codec.decompress(blob, dict_id, load_dictionary)
+                else:
+                    transcript = json.loads(raw) if raw else None
+            except ValueError:
+                transcript = None
+            hash_lists.append(shingles(transcript))
+
+        signed += store_signatures(db, zip([row[0] for row in rows], hash_lists, minhash_many(hash_lists)))
+        db.commit()
+        if on_progress:
+            on_progress(signed, total)
+
+    return {"signed": signed, "total": total}
+
+
+@job_handler("sign_conversations")
+def sign_conversations(db: Session, params: Dict[str, Any], ctx: JobContext):
+    """Compute MinHash signatures for conversations that don't have one"""
+    return sign_backlog(
+        db,
+        int(params.get("batch_size", DEFAULT_BATCH_SIZE)),
+        lambda done, total: ctx.report(done / total if total else 1.0, f"{done}/{total} conversations")
+    )
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Sign unsigned conversations for near-duplicate detection")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    print(f"Signing with {'numpy' if numpy is not None else 'pure Python (pip install numpy for speed)'}")
+    with SessionLocal() as session:
+        result = sign_backlog(
+            session,
+            args.batch_size,
+            lambda done, total: print(f"\r{done}/{total}", end="", flush=True)
+        )
+    print(f"\nSigned {result['signed']} conversation(s)")
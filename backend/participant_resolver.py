@@ -0,0 +1,129 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, Optional
+import os
+import uuid
+
+from sqlalchemy.orm import Session
+
+import models
+
+# Participants can be addressed by internal ID (a UUID) or by the user-facing
+# participant_id. Rather than `id = x OR participant_id = x`, which Postgres
+# often can't serve from a single index, classify the identifier and probe the
+# matching unique index. participant_id -> id never changes once created, so
+# the mapping is kept in a small LRU cache.
+CACHE_SIZE = int(os.getenv("PARTICIPANT_CACHE_SIZE", "10000"))
+
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_lock = Lock()
+
+
+def _looks_like_internal_id(identifier: str) -> bool:
+    try:
+        uuid.UUID(identifier)
+    except ValueError:
+        return False
+    return True
+
+
+def _cache_get(participant_id: str) -> Optional[str]:
+    with _lock:
+        internal_id = _cache.get(participant_id)
+        if internal_id is not None:
+            _cache.move_to_end(participant_id)
+        return internal_id
+
+
+def _cache_put(participant_id: str, internal_id: str) -> None:
+    with _lock:
+        _cache[participant_id] = internal_id
+        _cache.move_to_end(participant_id)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def forget_participant(participant_id: str) -> None:
+    """Drop a user-facing participant_id from the cache (call on delete)"""
+    with _lock:
+        _cache.pop(participant_id, None)
+
+
+def clear_cache() -> None:
+    with _lock:
+        _cache.clear()
+
+
+def get_participant(db: Session, identifier: str) -> Optional[models.Participant]:
+    """Load a participant by internal ID or user-facing participant_id"""
+    participant = None
+    if _looks_like_internal_id(identifier):
+        participant = db.query(models.Participant).filter(
+            models.Participant.id == identifier
+        ).first()
+
+    if not participant:
+        internal_id = _cache_get(identifier)
+        if internal_id:
+            participant = db.query(models.Participant).filter(
+                models.Participant.id == internal_id
+            ).first()
+            if not participant:
+                forget_participant(identifier)
+        else:
+            participant = db.query(models.Participant).filter(
+                models.Participant.participant_id == identifier
+            ).first()
+
+    if participant:
+        _cache_put(participant.participant_id, participant.id)
+    return participant
+
+
+def resolve_participant_id(db: Session, identifier: str) -> Optional[str]:
+    """Resolve an internal ID or user-facing participant_id to the internal ID"""
+    return resolve_participant_ids(db, [identifier]).get(identifier)
+
+
+def resolve_participant_ids(db: Session, identifiers: Iterable[str]) -> Dict[str, str]:
+    """
+    Resolve many identifiers at once.
+    Returns a mapping of identifier -> internal ID; unknown identifiers are omitted.
+    Uses at most two indexed IN queries regardless of how many identifiers are given.
+    Cached mappings are confirmed in the first query, since another worker may have
+    deleted (or deleted and recreated) the participant since they were cached.
+    """
+    identifiers = list(dict.fromkeys(identifiers))
+    cached: Dict[str, str] = {}
+    for identifier in identifiers:
+        internal_id = _cache_get(identifier)
+        if internal_id:
+            cached[identifier] = internal_id
+
+    resolved: Dict[str, str] = {}
+    probe_ids = set(cached.values()) | {i for i in identifiers if i not in cached and _looks_like_internal_id(i)}
+    if probe_ids:
+        rows = db.query(models.Participant.id, models.Participant.participant_id).filter(
+            models.Participant.id.in_(probe_ids)
+        ).all()
+        existing = dict(rows)
+        for identifier in identifiers:
+            if identifier in cached:
+                if existing.get(cached[identifier]) == identifier:
+                    resolved[identifier] = cached[identifier]
+                else:
+                    forget_participant(identifier)
+            elif identifier in existing:
+                resolved[identifier] = identifier
+                _cache_put(existing[identifier], identifier)
+
+    remaining = [i for i in identifiers if i not in resolved]
+    if remaining:
+        rows = db.query(models.Participant.id, models.Participant.participant_id).filter(
+            models.Participant.participant_id.in_(remaining)
+        ).all()
+        for internal_id, participant_id in rows:
+            resolved[participant_id] = internal_id
+            _cache_put(participant_id, internal_id)
+
+    return resolved
@@ -0,0 +1,178 @@
+from collections import Counter
+from threading import Event, Lock, Thread, get_ident
+from typing import List, Optional
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import time
+
+# On-demand in-process profiling, controlled through /api/profiler.
+#
+#   sample   - a background thread snapshots every thread's Python stack at a
+#              fixed interval while a matching request is in flight. Captures
+#              the event loop and threadpool workers; output is collapsed
+#              stacks for flamegraph.pl / speedscope.
+#   cprofile - deterministic cProfile around matching requests, one at a time.
+#              It only sees the event-loop thread, and other coroutines that
+#              run while the request awaits are attributed to it too.
+#
+# When no run is active the middleware costs one attribute lookup per request.
+# State is per process; with several workers each one profiles independently.
+
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN")  # Unset: profiler endpoints are disabled
+
+# Never profile the profiler's own endpoints
+EXCLUDED_PREFIX = "/api/profiler"
+
+# Leaf frames in these files are threads parked waiting for work
+IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+
+
+class ProfileRun:
+    def __init__(
+        self,
+        mode: str,
+        routes: List[str],
+        max_requests: Optional[int],
+        duration_seconds: Optional[float],
+        interval_ms: float,
+    ):
+        self.mode = mode
+        self.routes = routes
+        self.max_requests = max_requests
+        self.duration_seconds = duration_seconds
+        self.interval = interval_ms / 1000
+        self.started_at = time.time()
+        self.deadline = time.monotonic() + duration_seconds if duration_seconds else None
+
+        self.remaining = max_requests
+        self.requests_profiled = 0
+        self.in_flight = 0
+        self.finished = False
+        self.sample_count = 0
+
+        self.samples: Counter = Counter()  # collapsed stack -> hits
+        self.profile = cProfile.Profile() if mode == "cprofile" else None
+        self._lock = Lock()
+        self._stop = Event()
+        self._sampler = Thread(target=self._sample_loop, name="profiler-sampler", daemon=True) if mode == "sample" else None
+
+    def start(self) -> None:
+        if self._sampler:
+            self._sampler.start()
+
+    def matches(self, path: str) -> bool:
+        if path.startswith(EXCLUDED_PREFIX):
+            return False
+        return not self.routes or any(path.startswith(route) for route in self.routes)
+
+    def acquire(self, path: str) -> bool:
+        """Claim a profiling slot for this request; False means run it unprofiled"""
+        if not self.matches(path):
+            return False
+        with self._lock:
+            if self.finished:
+                return False
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                self._finish_locked()
+                return False
+            if self.profile is not None and self.in_flight:
+                return False  # One cProfile instance can only follow one request
+            if self.remaining is not None:
+                if self.remaining <= 0:
+                    return False
+                self.remaining -= 1
+            self.in_flight += 1
+            self.requests_profiled += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if self.remaining == 0 and self.in_flight == 0:
+                self._finish_locked()
+
+    def stop(self) -> None:
+        with self._lock:
+            self._finish_locked()
+
+    def _finish_locked(self) -> None:
+        self.finished = True
+        self._stop.set()
+
+    def _sample_loop(self) -> None:
+        own_id = get_ident()
+        while not self._stop.wait(self.interval):
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                self.stop()
+                break
+            if not self.in_flight:
+                continue
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or frame.f_code.co_filename.endswith(IDLE_FILES):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def status(self) -> dict:
+        return {
+            "mode": self.mode,
+            "routes": self.routes,
+            "max_requests": self.max_requests,
+            "duration_seconds": self.duration_seconds,
+            "started_at": self.started_at,
+            "requests_profiled": self.requests_profiled,
+            "in_flight": self.in_flight,
+            "samples": self.sample_count,
+            "finished": self.finished,
+        }
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def pstats_text(self, sort: str, limit: int) -> str:
+        self.profile.create_stats()
+        if not self.profile.stats:
+            # pstats.Stats refuses a profile with no calls in it
+            return "No calls were profiled\n"
+        out = io.StringIO()
+        pstats.Stats(self.profile, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def pstats_raw(self) -> bytes:
+        """Same format as Profile.dump_stats, loadable by pstats/snakeviz"""
+        self.profile.create_stats()
+        return marshal.dumps(self.profile.stats)
+
+
+current: Optional[ProfileRun] = None
+
+
+class ProfilerMiddleware:
+    """Pure ASGI middleware so it adds nothing to the request path while idle"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        run = current
+        if run is None or run.finished or scope["type"] != "http" or not run.acquire(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        if run.profile is not None:
+            run.profile.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if run.profile is not None:
+                run.profile.disable()
+            run.release()
@@ -0,0 +1,73 @@
+from typing import Dict, Iterable, Optional
+import hashlib
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+
+import models
+
+# Prompt texts are content-addressed: each distinct text is stored once in
+# prompt_contents and agents reference it by sha256 hash. Rows are never
+# modified, so a hash always identifies the same text.
+PROMPT_FIELDS = {
+    "system_prompt": "system_prompt_hash",
+    "instructions": "instructions_hash",
+}
+
+# Eager-load options for queries whose results are serialized with prompt bodies
+PROMPT_LOAD_OPTIONS = (
+    selectinload(models.Agent.system_prompt_content),
+    selectinload(models.Agent.instructions_content),
+)
+
+
+def prompt_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def store_prompt(db: Session, content: Optional[str]) -> Optional[str]:
+    """Store a prompt text if it isn't already present and return its hash"""
+    if content is None:
+        return None
+
+    digest = prompt_hash(content)
+    if db.get(models.PromptContent, digest) is None:
+        try:
+            with db.begin_nested():
+                db.add(models.PromptContent(hash=digest, content=content))
+        except IntegrityError:
+            # Stored concurrently by another request; same hash means same content
+            pass
+    return digest
+
+
+def store_prompts(db: Session, contents: Iterable[Optional[str]]) -> Dict[str, str]:
+    """Store many prompt texts with one lookup and one insert; returns text -> hash"""
+    digests = {content: prompt_hash(content) for content in contents if content is not None}
+    if not digests:
+        return {}
+
+    existing = {row[0] for row in db.query(models.PromptContent.hash).filter(
+        models.PromptContent.hash.in_(set(digests.values()))
+    )}
+    missing = {digest: content for content, digest in digests.items() if digest not in existing}
+    if missing:
+        try:
+            with db.begin_nested():
+                db.execute(insert(models.PromptContent.__table__), [
+                    {"hash": digest, "content": content} for digest, content in missing.items()
+                ])
+        except IntegrityError:
+            # Some were stored concurrently; fall back to one savepoint each
+            for content in missing.values():
+                store_prompt(db, content)
+    return digests
+
+
+def apply_prompts(db: Session, values: dict) -> dict:
+    """Replace system_prompt/instructions in a create/update payload with their hashes"""
+    for field, hash_field in PROMPT_FIELDS.items():
+        if field in values:
+            values[hash_field] = store_prompt(db, values.pop(field))
+    return values
@@ -0,0 +1,194 @@
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import json
+import math
+import os
+import re
+import time
+
+from sqlalchemy import case, delete
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import SessionLocal
+import models
+
+# Token-bucket rate limiting for the endpoints a misbehaving client can hammer
+# (auto-save loops, scripted participants). Each rule matches a method and path
+# pattern and keys its buckets by the first available identity: the {key} path
+# segment, the X-Session-Id / X-Participant-Id headers (set by the Next.js
+# proxy), or the client IP. A request over the limit gets 429 with Retry-After
+# before it reaches the database.
+#
+# RATE_LIMIT_BACKEND=memory (default) keeps buckets per process; use
+# RATE_LIMIT_BACKEND=database to share them across workers and replicas.
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# Use the first X-Forwarded-For hop as the client IP (only behind a trusted proxy)
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1"
+RATE_LIMIT_IDLE_SECONDS = 3600  # Shared buckets untouched this long are deleted
+
+# rate: tokens added per second; burst: bucket size (requests allowed back to back)
+DEFAULT_RULES = [
+    {"method": "POST", "path": "/api/conversations", "rate": 0.5, "burst": 30, "key": ["session", "ip"]},
+    {"method": "GET", "path": "/api/session/participant-config/{key}", "rate": 0.2, "burst": 10, "key": ["path", "ip"]},
+    {"method": "POST", "path": "/api/session/heartbeat/{key}", "rate": 1.0, "burst": 10, "key": ["path", "ip"]},
+]
+RATE_LIMITS: List[dict] = json.loads(os.getenv("RATE_LIMITS", "null")) or DEFAULT_RULES
+
+KEY_HEADERS = {"session": b"x-session-id", "participant": b"x-participant-id"}
+
+
+def path_pattern(path: str) -> "re.Pattern[str]":
+    """Regex for a route path, with an optional trailing slash and {key} matching one segment"""
+    return re.compile("^" + re.escape(path.rstrip("/")).replace(re.escape("{key}"), "(?P<key>[^/]+)") + "/?$")
+
+
+class Rule:
+    __slots__ = ("name", "method", "pattern", "rate", "burst", "key")
+
+    def __init__(self, method: str, path: str, rate: float, burst: int, key: List[str]):
+        self.name = f"{method} {path}"
+        self.method = method
+        self.pattern = path_pattern(path)
+        self.rate = float(rate)
+        self.burst = int(burst)
+        self.key = key
+
+    def identity(self, scope, match) -> Optional[str]:
+        for source in self.key:
+            if source == "path" and match.groupdict().get("key"):
+                return f"path:{match['key']}"
+            if source in KEY_HEADERS:
+                for name, value in scope["headers"]:
+                    if name == KEY_HEADERS[source] and value:
+                        return f"{source}:{value.decode('latin-1')}"
+            if source == "ip":
+                return f"ip:{client_ip(scope)}"
+        return None
+
+
+def client_ip(scope) -> str:
+    if RATE_LIMIT_TRUST_PROXY:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for" and value:
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _retry_after(tokens: float, rate: float) -> int:
+    return max(1, math.ceil((1 - tokens) / rate))
+
+
+class MemoryBuckets:
+    """Buckets as [tokens, last refill] lists; only touched from the event loop, so no lock"""
+
+    SWEEP_INTERVAL = 60.0
+
+    def __init__(self):
+        self._buckets: Dict[str, list] = {}
+        self._next_sweep = time.monotonic() + self.SWEEP_INTERVAL
+
+    def _sweep(self, now: float) -> None:
+        # A bucket idle long enough to have refilled completely is the same as no bucket
+        stale = [key for key, (tokens, last, full_after) in self._buckets.items() if now - last >= full_after]
+        for key in stale:
+            del self._buckets[key]
+        self._next_sweep = now + self.SWEEP_INTERVAL
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, int]:
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = [burst - 1.0, now, burst / rate]
+            return True, 0
+
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return True, 0
+        bucket[0] = tokens
+        return False, _retry_after(tokens, rate)
+
+
+class DatabaseBuckets:
+    """Shared buckets in rate_limit_buckets, refilled and spent in one upsert per request"""
+
+    def __init__(self):
+        self._next_cleanup = 0.0
+
+    def _take(self, key: str, rate: float, burst: int) -> Tuple[bool, int]:
+        table = models.RateLimitBucket.__table__
+        now = time.time()
+        with SessionLocal() as db:
+            dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+            refilled = table.c.tokens + (now - table.c.updated_at) * rate
+            refilled = case((refilled > burst, float(burst)), else_=refilled)
+            statement = dialect.insert(table).values(key=key, tokens=burst - 1.0, updated_at=now, allowed=True)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.key],
+                set_={
+                    "tokens": case((refilled >= 1, refilled - 1), else_=refilled),
+                    "updated_at": now,
+                    "allowed": refilled >= 1,
+                }
+            ).returning(table.c.allowed, table.c.tokens)
+            allowed, tokens = db.execute(statement).one()
+
+            if now >= self._next_cleanup:
+                db.execute(delete(table).where(table.c.updated_at < now - RATE_LIMIT_IDLE_SECONDS))
+                self._next_cleanup = now + 300
+            db.commit()
+        return (True, 0) if allowed else (False, _retry_after(tokens, rate))
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, int]:
+        return await asyncio.to_thread(self._take, key, rate, burst)
+
+
+rules = [Rule(**rule) for rule in RATE_LIMITS]
+buckets = DatabaseBuckets() if RATE_LIMIT_BACKEND == "database" else MemoryBuckets()
+
+_TOO_MANY = json.dumps({"detail": "Too many requests, please retry later"}).encode()
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware; requests that match no rule only pay for the rule scan"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not RATE_LIMIT_ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        for index, rule in enumerate(rules):
+            if rule.method != scope["method"]:
+                continue
+            match = rule.pattern.match(scope["path"])
+            if match is None:
+                continue
+            identity = rule.identity(scope, match)
+            if identity is None:
+                continue
+
+            allowed, retry_after = await buckets.take(f"{index}:{identity}", rule.rate, rule.burst)
+            if not allowed:
+                await send({
+                    "type": "http.response.start",
+                    "status": 429,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(_TOO_MANY)).encode()),
+                        (b"retry-after", str(retry_after).encode()),
+                    ],
+                })
+                await send({"type": "http.response.body", "body": _TOO_MANY})
+                return
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,139 @@
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+from fastapi import Response
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session, aliased
+import pydantic_core
+
+import models
+import schemas
+
+# ORM-free read path for the hottest endpoints. Statements are built once at
+# import (filters that vary per request are appended with .where(), which keeps
+# SQLAlchemy's compiled-statement cache key stable) and executed on the
+# session's connection, so no ORM instances or identity-map entries are made.
+# Rows stay tuples until serialization, which goes straight to JSON bytes with
+# pydantic_core: same output as the response models, without validating each
+# row through them.
+
+Agent = models.Agent
+Assignment = models.ParticipantAgentAssignment
+Log = models.ConversationLog
+SystemPrompt = aliased(models.PromptContent, name="system_prompt_content")
+Instructions = aliased(models.PromptContent, name="instructions_content")
+
+
+class Records:
+    """Column names plus tuple rows, as returned by the database"""
+    __slots__ = ("fields", "rows")
+
+    def __init__(self, fields: Sequence[str], rows: List[Sequence[Any]]):
+        self.fields = tuple(fields)
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def dicts(self) -> List[Dict[str, Any]]:
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in self.rows]
+
+    def first(self) -> Optional[Dict[str, Any]]:
+        return dict(zip(self.fields, self.rows[0])) if self.rows else None
+
+
+def fetch(db: Session, statement, params: Optional[Mapping[str, Any]] = None) -> Records:
+    result = db.connection().execute(statement, params or {})
+    return Records(result.keys(), result.all())
+
+
+def json_response(content: Any, status_code: int = 200) -> Response:
+    """Serialize plain dicts/lists (datetimes included) the way the response models would"""
+    return Response(pydantic_core.to_json(content), status_code=status_code, media_type="application/json")
+
+
+def _columns(schema, available: Mapping[str, Any]) -> List[Any]:
+    """Select list in the schema's field order, labelled with the field names"""
+    return [available[name].label(name) for name in schema.model_fields]
+
+
+def _mapped(model, *extra: Iterable[Any]) -> Dict[str, Any]:
+    """Mapped columns by attribute name, plus extra (name, expression) pairs"""
+    columns = {attr.key: getattr(model, attr.key) for attr in model.__mapper__.column_attrs}
+    columns.update(extra)
+    return columns
+
+
+_agent_columns = _mapped(
+    Agent,
+    ("system_prompt", SystemPrompt.content),
+    ("instructions", Instructions.content),
+)
+
+AGENT_SUMMARIES = select(*_columns(schemas.AgentSummary, _agent_columns))
+
+AGENTS = select(*_columns(schemas.Agent, _agent_columns)).join(
+    SystemPrompt, SystemPrompt.hash == Agent.system_prompt_hash
+).outerjoin(
+    Instructions, Instructions.hash == Agent.instructions_hash
+)
+
+# Served by the partial unique index on (agent_config, agent_name) WHERE is_active
+ACTIVE_AGENT_BY_NAME = AGENTS.where(
+    Agent.agent_config == bindparam("agent_config"),
+    Agent.agent_name == bindparam("agent_name"),
+    Agent.is_active == True
+)
+
+ASSIGNMENTS = select(*_columns(schemas.Assignment, _mapped(Assignment)))
+
+CONVERSATION_SUMMARIES = select(*_columns(schemas.ConversationLogSummary, _mapped(Log)))
+
+PARTICIPANT_BY_PARTICIPANT_ID = select(
+    models.Participant.id,
+    models.Participant.participant_id,
+    models.Participant.is_guest
+).where(models.Participant.participant_id == bindparam("participant_id"))
+
+# Whether a config has an agent a session can be moved to
+ACTIVE_AGENT_CONFIG = select(Agent.id).where(
+    Agent.agent_config == bindparam("agent_config"),
+    Agent.is_active == True
+).limit(1)
+
+GUEST_AGENTS = select(
+    Agent.id.label("experiment_id"),
+    Agent.display_name,
+    Agent.agent_config,
+    Agent.agent_name,
+    Agent.system_prompt_hash,
+    Agent.description
+).where(Agent.is_active == True)
+
+# Next open assignment with its agent and prompt bodies in one round trip
+# (agent columns are NULL if the agent row is gone)
+NEXT_ASSIGNMENT_CONFIG = select(
+    Assignment.id.label("assignment_id"),
+    Agent.id.label("experiment_id"),
+    Assignment.agent_config,
+    Assignment.agent_name,
+    Agent.display_name.label("experiment_name"),
+    SystemPrompt.content.label("system_prompt"),
+    Agent.system_prompt_hash,
+    Instructions.content.label("instructions"),
+    Agent.instructions_hash,
+    Agent.temperature,
+    Agent.max_tokens,
+    Agent.voice,
+    Assignment.order
+).outerjoin(
+    Agent, Agent.id == Assignment.agent_id
+).outerjoin(
+    SystemPrompt, SystemPrompt.hash == Agent.system_prompt_hash
+).outerjoin(
+    Instructions, Instructions.hash == Agent.instructions_hash
+).where(
+    Assignment.participant_id == bindparam("participant_id"),
+    Assignment.is_active == True,
+    Assignment.completed == False
+).order_by(Assignment.order).limit(1)
@@ -0,0 +1,201 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+import os
+import time
+
+from sqlalchemy import delete, func, update
+from sqlalchemy.orm import Session
+
+from jobs import JobContext, job_handler
+from participant_resolver import forget_participant, resolve_participant_ids
+import models
+import transcript_codec
+
+# Retention purge and participant erasure. Rows are processed in primary-key
+# order, one short transaction per batch with a pause in between, so large
+# purges never hold long locks or produce one huge WAL burst during live
+# sessions. Conversations can be deleted outright or anonymized (participant
+# link, transcript and metadata cleared; timing and rating columns kept).
+
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "0"))  # Default window for purge_conversations; 0 = none
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+RETENTION_BATCH_PAUSE = float(os.getenv("RETENTION_BATCH_PAUSE", "0.05"))  # Seconds between batches
+
+CONVERSATION_MODES = ("keep", "anonymize", "delete")
+
+REDACTED_TRANSCRIPT = {"messages": [], "redacted": True}
+
+
+def _in_batches(
+    db: Session,
+    id_column,
+    criteria: List[Any],
+    apply: Callable[[List[str]], None],
+    batch_size: int = RETENTION_BATCH_SIZE,
+    pause: float = RETENTION_BATCH_PAUSE,
+    on_batch: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Walk matching ids in primary-key order, calling apply(ids) and committing per batch"""
+    done = 0
+    last_id = ""
+    while True:
+        ids = [row[0] for row in db.query(id_column).filter(
+            *criteria, id_column > last_id
+        ).order_by(id_column).limit(batch_size).all()]
+        if not ids:
+            break
+
+        apply(ids)
+        db.commit()
+
+        done += len(ids)
+        last_id = ids[-1]
+        if on_batch:
+            on_batch(done)
+        if pause:
+            time.sleep(pause)
+    return done
+
+
+def _conversation_action(db: Session, mode: str) -> Callable[[List[str]], None]:
+    Log = models.ConversationLog
+    if mode == "delete":
+        # conversation_features rows go with them (ON DELETE CASCADE)
+        return lambda ids: db.execute(delete(Log).where(Log.id.in_(ids)))
+    if mode == "anonymize":
+        return lambda ids: db.execute(update(Log).where(Log.id.in_(ids)).values(
+            participant_id=None,
+            transcript_json=REDACTED_TRANSCRIPT,
+            transcript_blob=None,
+            transcript_dict_id=None,
+            message_count=0,
+            transcript_size=len(transcript_codec.encode_json(REDACTED_TRANSCRIPT)),
+            extra_metadata=None,
+            anonymized_at=datetime.now(timezone.utc)
+        ))
+    return lambda ids: db.execute(update(Log).where(Log.id.in_(ids)).values(participant_id=None))
+
+
+def _count(db: Session, id_column, criteria: List[Any]) -> int:
+    return db.query(func.count(id_column)).filter(*criteria).scalar() or 0
+
+
+def erase_participant(
+    db: Session,
+    participant_id: str,
+    conversations: str = "keep",
+    batch_size: int = RETENTION_BATCH_SIZE,
+    pause: float = RETENTION_BATCH_PAUSE,
+) -> Dict[str, int]:
+    """
+    Delete a participant (internal id) and their assignments in batches.
+    Their conversations are unlinked ("keep"), anonymized or deleted.
+    """
+    Log = models.ConversationLog
+    log_criteria = [Log.participant_id == participant_id]
+    if conversations == "anonymize":
+        log_criteria.append(Log.anonymized_at.is_(None))
+    conversation_count = _in_batches(
+        db, Log.id, log_criteria, _conversation_action(db, conversations), batch_size, pause
+    )
+
+    Assignment = models.ParticipantAgentAssignment
+    assignment_count = _in_batches(
+        db,
+        Assignment.id,
+        [Assignment.participant_id == participant_id],
+        lambda ids: db.execute(delete(Assignment).where(Assignment.id.in_(ids))),
+        batch_size,
+        pause
+    )
+
+    # Nothing references the row any more, so this is a single-row delete
+    deleted = db.execute(delete(models.Participant).where(models.Participant.id == participant_id)).rowcount
+    db.commit()
+
+    return {"participants": deleted, "assignments": assignment_count, "conversations": conversation_count}
+
+
+@job_handler("purge_conversations")
+def purge_conversations(db: Session, params: Dict[str, Any], ctx: JobContext):
+    """
+    Delete or anonymize conversations older than the retention window.
+    Params: older_than_days (default RETENTION_DAYS), mode ("delete" | "anonymize"),
+    batch_size, pause_seconds, dry_run.
+    """
+    days = int(params.get("older_than_days", RETENTION_DAYS))
+    if days <= 0:
+        raise ValueError("older_than_days must be positive (or set RETENTION_DAYS)")
+    mode = params.get("mode", "delete")
+    if mode not in ("delete", "anonymize"):
+        raise ValueError("mode must be 'delete' or 'anonymize'")
+
+    Log = models.ConversationLog
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    criteria = [Log.created_at < cutoff]
+    if mode == "anonymize":
+        criteria.append(Log.anonymized_at.is_(None))
+
+    total = _count(db, Log.id, criteria)
+    if params.get("dry_run"):
+        return {"mode": mode, "cutoff": cutoff.isoformat(), "conversations": total, "dry_run": True}
+
+    processed = _in_batches(
+        db,
+        Log.id,
+        criteria,
+        _conversation_action(db, mode),
+        int(params.get("batch_size", RETENTION_BATCH_SIZE)),
+        float(params.get("pause_seconds", RETENTION_BATCH_PAUSE)),
+        lambda done: ctx.report(done / total if total else 1.0, f"{done}/{total} conversations")
+    )
+    return {"mode": mode, "cutoff": cutoff.isoformat(), "conversations": processed, "dry_run": False}
+
+
+@job_handler("erase_participants")
+def erase_participants(db: Session, params: Dict[str, Any], ctx: JobContext):
+    """
+    Erase participants by internal or user-facing id.
+    Params: participant_ids, conversations ("keep" | "anonymize" | "delete"),
+    batch_size, pause_seconds, dry_run.
+    """
+    conversations = params.get("conversations", "anonymize")
+    if conversations not in CONVERSATION_MODES:
+        raise ValueError(f"conversations must be one of {', '.join(CONVERSATION_MODES)}")
+
+    identifiers = list(params.get("participant_ids") or [])
+    resolved = resolve_participant_ids(db, identifiers)
+    internal_ids = sorted(set(resolved.values()))
+    unknown = sorted(set(identifiers) - set(resolved))
+
+    if params.get("dry_run"):
+        Log = models.ConversationLog
+        Assignment = models.ParticipantAgentAssignment
+        return {
+            "participants": len(internal_ids),
+            "assignments": _count(db, Assignment.id, [Assignment.participant_id.in_(internal_ids)]),
+            "conversations": _count(db, Log.id, [Log.participant_id.in_(internal_ids)]),
+            "unknown": unknown,
+            "dry_run": True
+        }
+
+    user_facing = dict(db.query(models.Participant.id, models.Participant.participant_id).filter(
+        models.Participant.id.in_(internal_ids)
+    ).all())
+    db.rollback()
+
+    totals = {"participants": 0, "assignments": 0, "conversations": 0}
+    for n, participant_id in enumerate(internal_ids, start=1):
+        counts = erase_participant(
+            db,
+            participant_id,
+            conversations,
+            int(params.get("batch_size", RETENTION_BATCH_SIZE)),
+            float(params.get("pause_seconds", RETENTION_BATCH_PAUSE))
+        )
+        forget_participant(user_facing.get(participant_id))
+        for key, value in counts.items():
+            totals[key] += value
+        ctx.report(n / len(internal_ids), f"{n}/{len(internal_ids)} participants")
+
+    return {**totals, "unknown": unknown, "dry_run": False}
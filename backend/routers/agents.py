@@ -1,40 +1,184 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import DateTime, case, func, insert, literal, or_, select, true, union_all
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import datetime, timezone
 
 import sys
 sys.path.append('..')
 from database import get_db
 import models
+import records
 import schemas
+from prompt_store import PROMPT_LOAD_OPTIONS, apply_prompts
+from agent_versions import VERSIONED_FIELDS, get_version, record_version
+from db_types import array_elements, array_overlap, new_uuid
+from statement_timeouts import is_query_canceled
 
 router = APIRouter()
 
-@router.get("/", response_model=List[schemas.Agent])
+def deactivate_config(db: Session, agent_config: str, except_id: Optional[str] = None):
+    """
+    Lock every agent in a config and deactivate the active ones (except `except_id`).
+    Holding the row locks until commit serializes concurrent activations in the same config;
+    the partial unique index rejects anything that still slips through.
+    """
+    db.query(models.Agent.id).filter(
+        models.Agent.agent_config == agent_config
+    ).order_by(models.Agent.id).with_for_update().all()
+
+    query = db.query(models.Agent).filter(
+        models.Agent.agent_config == agent_config,
+        models.Agent.is_active == True
+    )
+    if except_id:
+        query = query.filter(models.Agent.id != except_id)
+    query.update({"is_active": False}, synchronize_session=False)
+
+def _commit_activation(db: Session, versioned: Optional[models.Agent] = None):
+    """Commit (recording a version of `versioned` first); a concurrent activation conflict is a 409"""
+    try:
+        if versioned is not None:
+            record_version(db, versioned)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="Another version of this agent was activated concurrently. Please retry."
+        )
+
+@router.get("/", response_model=List[Union[schemas.Agent, schemas.AgentSummary]])
 async def get_agents(
     agent_config: Optional[str] = Query(None),
     agent_name: Optional[str] = Query(None),
     is_active: Optional[bool] = Query(None),
     tags: Optional[str] = Query(None),  # Comma-separated
+    include_prompts: bool = Query(True),
     db: Session = Depends(get_db)
 ):
-    """Get all agents with optional filters"""
-    query = db.query(models.Agent)
+    """
+    Get all agents with optional filters.
+    With include_prompts=false only prompt hashes are returned; clients fetch each body once
+    from /api/agents/prompts/{hash} and cache it. Served from records.py (no ORM instances).
+    """
+    statement = records.AGENTS if include_prompts else records.AGENT_SUMMARIES
     
     if agent_config:
-        query = query.filter(models.Agent.agent_config == agent_config)
+        statement = statement.where(models.Agent.agent_config == agent_config)
     if agent_name:
-        query = query.filter(models.Agent.agent_name == agent_name)
+        statement = statement.where(models.Agent.agent_name == agent_name)
     if is_active is not None:
-        query = query.filter(models.Agent.is_active == is_active)
+        statement = statement.where(models.Agent.is_active == is_active)
     if tags:
         tag_list = tags.split(',')
         # Filter agents that have any of the specified tags
-        query = query.filter(models.Agent.tags.overlap(tag_list))
+        statement = statement.where(array_overlap(db, models.Agent.tags, tag_list))
+    
+    agents = records.fetch(db, statement.order_by(models.Agent.updated_at.desc()))
+    return records.json_response(agents.dicts())
+
+def _search_filters(db: Session, q, tags, agent_config, is_active):
+    filters = []
+    if q:
+        pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        matches = [
+            models.Agent.display_name.ilike(pattern, escape="\\"),
+            models.Agent.description.ilike(pattern, escape="\\"),
+        ]
+        if db.bind.dialect.name == "postgresql":
+            # Fuzzy match on names (pg_trgm similarity); the trigram indexes serve both
+            matches.append(models.Agent.display_name.op("%")(q))
+        filters.append(or_(*matches))
+    if tags:
+        filters.append(array_overlap(db, models.Agent.tags, tags))
+    if agent_config:
+        filters.append(models.Agent.agent_config.in_(agent_config))
+    if is_active is not None:
+        filters.append(models.Agent.is_active == is_active)
+    return filters
+
+@router.get("/search", response_model=schemas.AgentSearchResult)
+async def search_agents(
+    q: Optional[str] = Query(None, max_length=200),
+    tags: Optional[str] = Query(None),  # Comma-separated, any-of
+    agent_config: Optional[str] = Query(None),  # Comma-separated, any-of
+    is_active: Optional[bool] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """
+    Search agents by name/description with tag, config and active filters.
+    Returns one page of summaries plus the total and facet counts over all matches;
+    the total and every facet come from a single aggregate query.
+    """
+    filters = _search_filters(
+        db,
+        q,
+        tags.split(',') if tags else None,
+        agent_config.split(',') if agent_config else None,
+        is_active
+    )
+
+    matched = select(
+        models.Agent.tags, models.Agent.agent_config, models.Agent.is_active
+    ).where(*filters).cte("matched")
+    tag = array_elements(db, matched.c.tags)
+    facet_rows = db.execute(union_all(
+        select(literal("total"), literal(""), func.count()).select_from(matched),
+        select(literal("tags"), tag.c.value, func.count()).select_from(matched).join(tag, true()).group_by(tag.c.value),
+        select(literal("agent_config"), matched.c.agent_config, func.count()).group_by(matched.c.agent_config),
+        select(
+            literal("is_active"),
+            case((matched.c.is_active == True, "true"), else_="false"),
+            func.count()
+        ).group_by(matched.c.is_active)
+    )).all()
+
+    total = 0
+    facets = {"tags": [], "agent_config": [], "is_active": []}
+    for facet, value, count in facet_rows:
+        if facet == "total":
+            total = count
+        else:
+            facets[facet].append({"value": value, "count": count})
+    for counts in facets.values():
+        counts.sort(key=lambda c: (-c["count"], c["value"]))
+
+    order = [models.Agent.updated_at.desc(), models.Agent.id]
+    if q and db.bind.dialect.name == "postgresql":
+        order.insert(0, func.similarity(models.Agent.display_name, q).desc())
+    items = db.query(models.Agent).filter(*filters).order_by(*order).offset(offset).limit(limit).all()
+
+    return {
+        "total": total,
+        "items": [schemas.AgentSummary.model_validate(agent) for agent in items],
+        "facets": facets
+    }
+
+@router.get("/prompts/{prompt_hash}", response_model=schemas.PromptContent)
+async def get_prompt_content(
+    prompt_hash: str,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+):
+    """Get a prompt body by its content hash. Bodies never change, so responses are cacheable forever."""
+    etag = f'"{prompt_hash}"'
+    cache_control = "public, max-age=31536000, immutable"
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+    
+    prompt = db.get(models.PromptContent, prompt_hash)
     
-    agents = query.order_by(models.Agent.updated_at.desc()).all()
-    return agents
+    if not prompt:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return prompt
 
 @router.get("/by-name/{agent_name}", response_model=schemas.Agent)
 async def get_active_agent_by_name(
@@ -43,16 +187,151 @@ async def get_active_agent_by_name(
     db: Session = Depends(get_db)
 ):
     """Get the active agent configuration by agent name and config"""
-    agent = db.query(models.Agent).filter(
-        models.Agent.agent_name == agent_name,
-        models.Agent.agent_config == agent_config,
-        models.Agent.is_active == True
+    # Matches the partial unique index exactly, so this is a single index probe
+    agent = records.fetch(
+        db, records.ACTIVE_AGENT_BY_NAME, {"agent_config": agent_config, "agent_name": agent_name}
     ).first()
     
     if not agent:
         raise HTTPException(status_code=404, detail=f"No active agent found with name '{agent_name}' in config '{agent_config}'")
     
-    return agent
+    return records.json_response(agent)
+
+@router.post("/batch", response_model=List[schemas.Agent])
+async def get_agents_batch(request: schemas.BatchGetRequest, db: Session = Depends(get_db)):
+    """Get many agents by ID in one query, in request order (unknown IDs are skipped)"""
+    agents = db.query(models.Agent).options(*PROMPT_LOAD_OPTIONS).filter(
+        models.Agent.id.in_(request.ids)
+    ).all()
+    by_id = {agent.id: agent for agent in agents}
+    return [by_id[agent_id] for agent_id in dict.fromkeys(request.ids) if agent_id in by_id]
+
+@router.post("/clone", response_model=schemas.AgentCloneResult, status_code=201)
+async def clone_agents(request: schemas.AgentCloneRequest, db: Session = Depends(get_db)):
+    """
+    Copy every agent in a config (optionally only those with any of `tags`) server-side.
+    Rows are copied with INSERT ... SELECT and source ids remapped in SQL, so the number of
+    statements doesn't depend on how many agents or assignments are cloned. Clones start
+    with their own version history and zeroed run statistics.
+    """
+    Agent = models.Agent
+    filters = [Agent.agent_config == request.agent_config]
+    if request.tags:
+        filters.append(array_overlap(db, Agent.tags, request.tags))
+    sources = db.query(Agent.id, Agent.is_active).filter(*filters).order_by(Agent.id).all()
+    if not sources:
+        raise HTTPException(status_code=404, detail="No agents found to clone")
+
+    if request.is_active and len(sources) > 1:
+        # Only one agent per config can be active
+        raise HTTPException(
+            status_code=400,
+            detail=f"is_active=true would activate {len(sources)} clones in one config; "
+                   "clone them inactive and activate one with POST /api/agents/{id}/activate"
+        )
+
+    target_config = request.new_agent_config or request.agent_config
+    id_map = {source.id: models.generate_uuid() for source in sources}
+    if request.is_active is None:
+        active_ids = [source.id for source in sources if source.is_active]
+        is_active = Agent.id.in_(active_ids) if active_ids else literal(False)
+    else:
+        active_ids = list(id_map) if request.is_active else []
+        is_active = literal(request.is_active)
+
+    # Same rule as creating an active agent: it replaces whatever is active in the config
+    if active_ids:
+        deactivate_config(db, target_config)
+
+    copied = {
+        "id": case(id_map, value=Agent.id),
+        "agent_name": Agent.agent_name,
+        "display_name": Agent.display_name + request.display_name_suffix if request.display_name_suffix else Agent.display_name,
+        "agent_config": literal(target_config),
+        "system_prompt_hash": Agent.system_prompt_hash,
+        "instructions_hash": Agent.instructions_hash,
+        "temperature": Agent.temperature,
+        "max_tokens": Agent.max_tokens,
+        "voice": Agent.voice,
+        "description": Agent.description,
+        "tags": Agent.tags,
+        "is_active": is_active,
+        "total_runs": literal(0),
+        "updated_at": literal(datetime.now(timezone.utc), DateTime(timezone=True)),
+    }
+    clone_agents_stmt = insert(Agent.__table__).from_select(
+        list(copied), select(*copied.values()).where(Agent.id.in_(id_map))
+    ).returning(*Agent.__table__.c)
+
+    clone_versions = insert(models.AgentVersion.__table__).from_select(
+        ["agent_id", "version", *VERSIONED_FIELDS],
+        select(Agent.id, literal(1), *[getattr(Agent, field) for field in VERSIONED_FIELDS]).where(
+            Agent.id.in_(id_map.values())
+        )
+    )
+
+    try:
+        clones = db.execute(clone_agents_stmt).all()
+        db.execute(clone_versions)
+
+        assignments_created = 0
+        if request.include_assignments:
+            Assignment = models.ParticipantAgentAssignment
+            copied = {
+                "id": new_uuid(db),
+                "participant_id": Assignment.participant_id,
+                "agent_id": case(id_map, value=Assignment.agent_id),
+                "agent_config": literal(target_config),
+                "agent_name": Assignment.agent_name,
+                "is_active": Assignment.is_active,
+                "completed": literal(False),
+                "order": Assignment.order,
+                "notes": Assignment.notes,
+            }
+            assignments_created = db.execute(insert(Assignment.__table__).from_select(
+                list(copied), select(*copied.values()).where(Assignment.agent_id.in_(id_map))
+            )).rowcount
+
+        if request.dry_run:
+            db.rollback()
+        else:
+            db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="Clones conflict with agents activated concurrently in the target config. Please retry."
+        )
+    except Exception as e:
+        db.rollback()
+        if is_query_canceled(e):
+            raise  # 503 from query_timeout_handler
+        raise HTTPException(status_code=500, detail=f"Failed to clone agents: {str(e)}")
+
+    return {
+        "agent_config": target_config,
+        "agents": sorted(clones, key=lambda clone: clone.agent_name),
+        "id_map": id_map,
+        "assignments_created": assignments_created,
+        "dry_run": request.dry_run
+    }
+
+@router.get("/versions/{version_id}", response_model=schemas.AgentVersion)
+async def get_agent_version(version_id: int, db: Session = Depends(get_db)):
+    """Get an immutable agent version snapshot (as referenced by ConversationLog.agent_version_id)"""
+    version = get_version(db, version_id)
+    
+    if not version:
+        raise HTTPException(status_code=404, detail="Agent version not found")
+    
+    return version
+
+@router.get("/{agent_id}/versions", response_model=List[schemas.AgentVersion])
+async def get_agent_versions(agent_id: str, db: Session = Depends(get_db)):
+    """Get the version history of an agent, newest first"""
+    return db.query(models.AgentVersion).filter(
+        models.AgentVersion.agent_id == agent_id
+    ).order_by(models.AgentVersion.version.desc()).all()
 
 @router.get("/{agent_id}", response_model=schemas.Agent)
 async def get_agent(agent_id: str, db: Session = Depends(get_db)):
@@ -75,18 +354,15 @@ async def create_agent(
     
     # If setting as active, deactivate other agents in the same config.
     if agent_data.is_active:
-        db.query(models.Agent).filter(
-            models.Agent.agent_config == agent_data.agent_config,
-            models.Agent.is_active == True
-        ).update({"is_active": False})
+        deactivate_config(db, agent_data.agent_config)
 
-    payload = agent_data.model_dump()
+    payload = apply_prompts(db, agent_data.model_dump())
     now = datetime.now(timezone.utc)
     payload["updated_at"] = now
 
     agent = models.Agent(**payload)
     db.add(agent)
-    db.commit()
+    _commit_activation(db, versioned=agent)
     db.refresh(agent)
     
     return agent
@@ -107,21 +383,36 @@ async def update_agent(
     
     # If setting as active, deactivate other agents in the same config.
     if agent_data.is_active:
-        db.query(models.Agent).filter(
-            models.Agent.agent_config == agent.agent_config,
-            models.Agent.is_active == True,
-            models.Agent.id != agent_id
-        ).update({"is_active": False})
+        deactivate_config(db, agent.agent_config, except_id=agent_id)
     
     # Update fields
-    update_data = agent_data.model_dump(exclude_unset=True)
+    update_data = apply_prompts(db, agent_data.model_dump(exclude_unset=True))
     for key, value in update_data.items():
         setattr(agent, key, value)
 
     # Keep updated_at deterministic across DB engines.
     agent.updated_at = datetime.now(timezone.utc)
     
-    db.commit()
+    _commit_activation(db, versioned=agent)
+    db.refresh(agent)
+    
+    return agent
+
+@router.post("/{agent_id}/activate", response_model=schemas.Agent)
+async def activate_agent(agent_id: str, db: Session = Depends(get_db)):
+    """Make this agent the active version of its config, atomically deactivating the current one"""
+    agent = db.query(models.Agent).filter(
+        models.Agent.id == agent_id
+    ).first()
+    
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    
+    deactivate_config(db, agent.agent_config, except_id=agent_id)
+    agent.is_active = True
+    agent.updated_at = datetime.now(timezone.utc)
+    
+    _commit_activation(db)
     db.refresh(agent)
     
     return agent
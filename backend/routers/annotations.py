@@ -0,0 +1,119 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session, undefer_group
+from sqlalchemy import case, func
+from typing import List, Optional
+from datetime import datetime, timezone
+
+import sys
+sys.path.append('..')
+from database import get_db
+import models
+import schemas
+from annotations import claim_items, enqueue_conversations, release_items, save_ratings
+from statement_timeouts import is_query_canceled
+
+router = APIRouter()
+
+@router.post("/items", response_model=schemas.AnnotationEnqueueResult)
+async def enqueue_items(request: schemas.AnnotationEnqueueRequest, db: Session = Depends(get_db)):
+    """Add conversations (by default only unrated ones) to the rating queue; already queued ones are skipped"""
+    try:
+        queued = enqueue_conversations(db, request.agent_config, request.agent_ids, request.include_rated)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        if is_query_canceled(e):
+            raise  # 503 from query_timeout_handler
+        raise HTTPException(status_code=500, detail=f"Failed to queue conversations: {str(e)}")
+
+    return {"queued": queued}
+
+@router.post("/claim", response_model=List[schemas.AnnotationClaim])
+async def claim(request: schemas.AnnotationClaimRequest, db: Session = Depends(get_db)):
+    """
+    Lease a random batch of unrated conversations to a rater. Concurrent claims skip each
+    other's rows instead of waiting, so no two raters get the same item while its lease runs.
+    """
+    try:
+        item_ids, expires_at = claim_items(
+            db, request.rater, request.limit, request.agent_config, request.stratify_by, request.lease_seconds
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        if is_query_canceled(e):
+            raise  # 503 from query_timeout_handler
+        raise HTTPException(status_code=500, detail=f"Failed to claim items: {str(e)}")
+
+    if not item_ids:
+        return []
+
+    Log = models.ConversationLog
+    query = db.query(models.AnnotationItem.id, Log).join(Log, Log.id == models.AnnotationItem.conversation_id)
+    if request.include_transcript:
+        query = query.options(undefer_group("transcript"))
+    schema = schemas.ConversationLog if request.include_transcript else schemas.ConversationLogSummary
+    logs = dict(query.filter(models.AnnotationItem.id.in_(item_ids)).all())
+
+    return [
+        {"item_id": item_id, "lease_expires_at": expires_at, "conversation": schema.model_validate(logs[item_id])}
+        for item_id in item_ids if item_id in logs
+    ]
+
+@router.post("/release", response_model=schemas.MessageResponse)
+async def release(request: schemas.AnnotationRelease, db: Session = Depends(get_db)):
+    """Return unrated items a rater holds to the queue"""
+    released = release_items(db, request.rater, request.item_ids)
+    db.commit()
+
+    return {"message": f"Released {released} item(s)"}
+
+@router.post("/ratings", response_model=schemas.AnnotationRatingResult)
+async def submit_ratings(batch: schemas.AnnotationRatingBatch, db: Session = Depends(get_db)):
+    """
+    Save a batch of ratings in one transaction. Satisfaction and completion are written to
+    the conversation logs; items no longer leased to the rater are reported back, not saved.
+    """
+    try:
+        saved, rejected = save_ratings(db, batch.rater, [rating.model_dump(exclude_unset=True) for rating in batch.ratings])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        if is_query_canceled(e):
+            raise  # 503 from query_timeout_handler
+        raise HTTPException(status_code=500, detail=f"Failed to save ratings: {str(e)}")
+
+    return {"saved": saved, "rejected": rejected}
+
+@router.get("/progress", response_model=List[schemas.AnnotationProgress])
+async def get_progress(
+    agent_config: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Queued, rated and currently leased counts per agent"""
+    Item = models.AnnotationItem
+    now = datetime.now(timezone.utc)
+    query = db.query(
+        Item.agent_config,
+        Item.agent_id,
+        func.count(Item.id),
+        func.count(Item.rated_at),
+        func.count(case((Item.rated_at.is_(None) & (Item.lease_expires_at >= now), 1))),
+    )
+
+    if agent_config:
+        query = query.filter(Item.agent_config == agent_config)
+
+    rows = query.group_by(Item.agent_config, Item.agent_id).order_by(Item.agent_config, Item.agent_id).all()
+
+    return [
+        {
+            "agent_config": config,
+            "agent_id": agent_id,
+            "total": total,
+            "rated": rated,
+            "leased": leased,
+            "open": total - rated - leased,
+        }
+        for config, agent_id, total, rated, leased in rows
+    ]
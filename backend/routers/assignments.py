@@ -1,15 +1,35 @@
+from collections import Counter
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import exists, insert
+from sqlalchemy.orm import Session, selectinload
 from typing import Optional, List
 
 import sys
 sys.path.append('..')
 from database import get_db
 import models
+import records
 import schemas as schemas
+from prompt_store import PROMPT_LOAD_OPTIONS
+from participant_resolver import resolve_participant_id, resolve_participant_ids
+from counterbalance import sequences_for
+from statement_timeouts import is_query_canceled
 
 router = APIRouter()
 
+# Keeps IN lists under SQLite's bound-parameter limit
+ID_CHUNK_SIZE = 10000
+
+# Distinct sequences reported back (random designs can produce thousands)
+MAX_REPORTED_SEQUENCES = 1000
+
+def assignment_with_agent(assignment, include_agent: bool) -> dict:
+    """Serialize an assignment, attaching its agent only when it was eager-loaded"""
+    data = schemas.Assignment.model_validate(assignment).model_dump()
+    if include_agent:
+        data["agent"] = assignment.agent
+    return data
+
 @router.get("/", response_model=List[schemas.Assignment])
 async def get_assignments(
     participant_id: Optional[str] = Query(None),
@@ -18,29 +38,44 @@ async def get_assignments(
     db: Session = Depends(get_db)
 ):
     """Get all participant-agent assignments with optional filters"""
-    query = db.query(models.ParticipantAgentAssignment)
+    Assignment = models.ParticipantAgentAssignment
+    statement = records.ASSIGNMENTS
     
     if participant_id:
         # Support both internal ID and participant_id
-        participant = db.query(models.Participant).filter(
-            (models.Participant.id == participant_id) |
-            (models.Participant.participant_id == participant_id)
-        ).first()
-        if participant:
-            query = query.filter(models.ParticipantAgentAssignment.participant_id == participant.id)
+        internal_id = resolve_participant_id(db, participant_id)
+        if internal_id:
+            statement = statement.where(Assignment.participant_id == internal_id)
     
     if agent_id:
-        query = query.filter(models.ParticipantAgentAssignment.agent_id == agent_id)
+        statement = statement.where(Assignment.agent_id == agent_id)
     
     if is_active is not None:
-        query = query.filter(models.ParticipantAgentAssignment.is_active == is_active)
+        statement = statement.where(Assignment.is_active == is_active)
     
-    assignments = query.order_by(
-        models.ParticipantAgentAssignment.order,
-        models.ParticipantAgentAssignment.created_at
-    ).all()
+    assignments = records.fetch(db, statement.order_by(Assignment.order, Assignment.created_at))
+    return records.json_response(assignments.dicts())
+
+@router.post("/batch", response_model=List[schemas.AssignmentWithAgent])
+async def get_assignments_batch(
+    request: schemas.AssignmentBatchRequest,
+    db: Session = Depends(get_db)
+):
+    """Get many assignments by ID, optionally with their agents, in a constant number of queries"""
+    query = db.query(models.ParticipantAgentAssignment).filter(
+        models.ParticipantAgentAssignment.id.in_(request.ids)
+    )
+    if request.include_agent:
+        query = query.options(
+            selectinload(models.ParticipantAgentAssignment.agent).options(*PROMPT_LOAD_OPTIONS)
+        )
     
-    return assignments
+    by_id = {assignment.id: assignment for assignment in query.all()}
+    return [
+        assignment_with_agent(by_id[assignment_id], request.include_agent)
+        for assignment_id in dict.fromkeys(request.ids)
+        if assignment_id in by_id
+    ]
 
 @router.get("/{assignment_id}", response_model=schemas.Assignment)
 async def get_assignment(assignment_id: str, db: Session = Depends(get_db)):
@@ -62,12 +97,9 @@ async def create_assignment(
     """Create a new participant-agent assignment"""
     
     # Verify participant exists
-    participant = db.query(models.Participant).filter(
-        (models.Participant.id == assignment_data.participant_id) |
-        (models.Participant.participant_id == assignment_data.participant_id)
-    ).first()
+    internal_id = resolve_participant_id(db, assignment_data.participant_id)
     
-    if not participant:
+    if not internal_id:
         raise HTTPException(status_code=404, detail="Participant not found")
     
     # Verify experiment prompt exists
@@ -80,7 +112,7 @@ async def create_assignment(
     
     # Create assignment with internal participant ID
     assignment_dict = assignment_data.model_dump()
-    assignment_dict['participant_id'] = participant.id  # Use internal ID
+    assignment_dict['participant_id'] = internal_id  # Use internal ID
     
     assignment = models.ParticipantAgentAssignment(**assignment_dict)
     db.add(assignment)
@@ -89,6 +121,8 @@ async def create_assignment(
         db.refresh(assignment)
     except Exception as e:
         db.rollback()
+        if is_query_canceled(e):
+            raise  # 503 from query_timeout_handler
         raise HTTPException(status_code=500, detail=f"Failed to create assignment: {str(e)}")
     
     return assignment
@@ -131,6 +165,8 @@ async def delete_assignment(assignment_id: str, db: Session = Depends(get_db)):
         db.commit()
     except Exception as e:
         db.rollback()
+        if is_query_canceled(e):
+            raise  # 503 from query_timeout_handler
         raise HTTPException(status_code=500, detail=f"Failed to delete assignment: {str(e)}")
     
     return {"message": "Assignment deleted successfully", "success": True}
@@ -145,14 +181,14 @@ async def create_bulk_assignments(
     created = []
     failed = []
     
+    # Resolve every participant up front instead of one query per item
+    internal_ids = resolve_participant_ids(db, [a.participant_id for a in assignments])
+    
     for assignment_data in assignments:
         # Verify participant exists
-        participant = db.query(models.Participant).filter(
-            (models.Participant.id == assignment_data.participant_id) |
-            (models.Participant.participant_id == assignment_data.participant_id)
-        ).first()
+        internal_id = internal_ids.get(assignment_data.participant_id)
         
-        if not participant:
+        if not internal_id:
             failed.append({
                 "assignment_data": assignment_data.model_dump(),
                 "error": "Participant not found"
@@ -161,7 +197,7 @@ async def create_bulk_assignments(
         
         # Create assignment with internal participant ID
         assignment_dict = assignment_data.model_dump()
-        assignment_dict['participant_id'] = participant.id
+        assignment_dict['participant_id'] = internal_id
         
         try:
             assignment = models.ParticipantAgentAssignment(**assignment_dict)
@@ -177,9 +213,99 @@ async def create_bulk_assignments(
         db.commit()
     except Exception as e:
         db.rollback()
+        if is_query_canceled(e):
+            raise  # 503 from query_timeout_handler
         raise HTTPException(status_code=500, detail=f"Failed to create bulk assignments: {str(e)}")
     
     for assignment in created:
         db.refresh(assignment)
     
     return created
+
+@router.post("/generate", response_model=schemas.AssignmentGenerateResult, status_code=201)
+async def generate_assignments(request: schemas.AssignmentGenerateRequest, db: Session = Depends(get_db)):
+    """
+    Generate counterbalanced agent orderings for a cohort and insert them in one bulk statement.
+    Participants are taken in the order given (or by participant_id when using the filter) and
+    cycled through the design's sequences; each gets one assignment per agent with order 0..k-1.
+    """
+    Assignment = models.ParticipantAgentAssignment
+
+    if len(set(request.agent_ids)) != len(request.agent_ids):
+        raise HTTPException(status_code=400, detail="agent_ids must be distinct")
+    agents = {
+        agent.id: agent
+        for agent in db.query(models.Agent.id, models.Agent.agent_config, models.Agent.agent_name).filter(
+            models.Agent.id.in_(request.agent_ids)
+        )
+    }
+    missing = [agent_id for agent_id in request.agent_ids if agent_id not in agents]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Agents not found: {', '.join(missing)}")
+
+    unknown = []
+    skipped = 0
+    if request.participant_ids is not None:
+        resolved = resolve_participant_ids(db, request.participant_ids)
+        unknown = [i for i in dict.fromkeys(request.participant_ids) if i not in resolved]
+        participant_ids = list(dict.fromkeys(resolved[i] for i in request.participant_ids if i in resolved))
+        if request.skip_assigned:
+            assigned = set()
+            for start in range(0, len(participant_ids), ID_CHUNK_SIZE):
+                assigned.update(row[0] for row in db.query(Assignment.participant_id).filter(
+                    Assignment.participant_id.in_(participant_ids[start:start + ID_CHUNK_SIZE])
+                ).distinct())
+            skipped = len(assigned)
+            participant_ids = [pid for pid in participant_ids if pid not in assigned]
+    else:
+        query = db.query(models.Participant.id)
+        if request.is_guest is not None:
+            query = query.filter(models.Participant.is_guest == request.is_guest)
+        if request.skip_assigned:
+            has_assignments = exists().where(Assignment.participant_id == models.Participant.id)
+            skipped = query.filter(has_assignments).count()
+            query = query.filter(~has_assignments)
+        participant_ids = [row[0] for row in query.order_by(models.Participant.participant_id)]
+
+    try:
+        sequences = sequences_for(request.design, len(request.agent_ids), len(participant_ids), request.seed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    conditions = [agents[agent_id] for agent_id in request.agent_ids]
+    rows = [
+        {
+            "id": models.generate_uuid(),
+            "participant_id": participant_id,
+            "agent_id": conditions[condition].id,
+            "agent_config": conditions[condition].agent_config,
+            "agent_name": conditions[condition].agent_name,
+            "is_active": True,
+            "completed": False,
+            "order": position
+        }
+        for participant_id, sequence in zip(participant_ids, sequences)
+        for position, condition in enumerate(sequence)
+    ]
+
+    if rows and not request.dry_run:
+        try:
+            db.execute(insert(Assignment.__table__), rows)  # Core executemany; skips ORM bulk overhead
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            if is_query_canceled(e):
+                raise  # 503 from query_timeout_handler
+            raise HTTPException(status_code=500, detail=f"Failed to create assignments: {str(e)}")
+
+    counts = Counter(tuple(sequence) for sequence in sequences).most_common(MAX_REPORTED_SEQUENCES)
+    return {
+        "design": request.design,
+        "participants": len(participant_ids),
+        "assignments_created": 0 if request.dry_run else len(rows),
+        "skipped_assigned": skipped,
+        "unknown": unknown,
+        "sequences": [[request.agent_ids[c] for c in sequence] for sequence, _ in counts],
+        "sequence_counts": [count for _, count in counts],
+        "dry_run": request.dry_run
+    }
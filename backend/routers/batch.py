@@ -0,0 +1,370 @@
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException
+from itertools import groupby
+from pydantic import ValidationError
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import sys
+sys.path.append('..')
+from database import get_db
+import models
+import schemas
+from agent_versions import record_versions
+from participant_resolver import forget_participant, resolve_participant_ids
+from prompt_store import PROMPT_FIELDS, store_prompts
+from routers.agents import deactivate_config
+from statement_timeouts import is_query_canceled
+
+router = APIRouter()
+
+# Experiment setup in one request: an ordered list of create/update/delete operations
+# on agents, participants and assignments, run in a single transaction. Consecutive
+# operations of the same entity and op form a group executed with bulk statements
+# (ids are generated up front, so later operations can reference earlier rows by
+# "$alias" without a round trip). Any failure rolls the whole batch back.
+
+Operation = Tuple[int, schemas.BatchOperation]
+
+
+class _Batch:
+    def __init__(self, db: Session):
+        self.db = db
+        self.aliases: Dict[str, Tuple[str, str]] = {}  # alias -> (entity, id)
+        self.results: List[dict] = []
+        self.created_participants: Dict[str, str] = {}  # participant_id -> id
+        self.deleted_participants: Dict[str, str] = {}  # id -> participant_id
+
+    def fail(self, index: int, status_code: int, detail: str):
+        raise HTTPException(status_code=status_code, detail=f"Operation {index}: {detail}")
+
+    def ref(self, index: int, entity: str, value: Any) -> Any:
+        """Replace "$alias" with the id it names"""
+        if not isinstance(value, str) or not value.startswith("$"):
+            return value
+        target = self.aliases.get(value[1:])
+        if target is None:
+            self.fail(index, 400, f"Unknown alias '{value[1:]}' (aliases must be defined by an earlier operation)")
+        if target[0] != entity:
+            self.fail(index, 400, f"Alias '{value[1:]}' refers to a {target[0]}, expected {entity}")
+        return target[1]
+
+    def validate(self, index: int, schema, data: Dict[str, Any]):
+        try:
+            return schema.model_validate(data)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=[
+                {**error, "loc": ["body", "operations", index, "data", *error["loc"]]}
+                for error in e.errors(include_url=False, include_context=False)
+            ])
+
+    def record(self, index: int, operation: schemas.BatchOperation, row_id: str):
+        if operation.alias:
+            if operation.alias in self.aliases:
+                self.fail(index, 400, f"Alias '{operation.alias}' is already defined")
+            self.aliases[operation.alias] = (operation.entity, row_id)
+        self.results.append({
+            "index": index,
+            "op": operation.op,
+            "entity": operation.entity,
+            "alias": operation.alias,
+            "id": row_id
+        })
+
+    def participant_ids(self, items: List[Tuple[int, str]]) -> List[str]:
+        """
+        Resolve internal ids / participant_ids. Participants created earlier in the batch are
+        looked up here rather than through the resolver, whose cache must only see committed rows.
+        """
+        created_ids = set(self.created_participants.values())
+        pending = [
+            identifier for _, identifier in items
+            if identifier not in created_ids and identifier not in self.created_participants
+        ]
+        resolved = resolve_participant_ids(self.db, pending) if pending else {}
+
+        internal_ids = []
+        for index, identifier in items:
+            if identifier in created_ids:
+                internal_id = identifier
+            else:
+                internal_id = self.created_participants.get(identifier) or resolved.get(identifier)
+            if not internal_id or internal_id in self.deleted_participants:
+                self.fail(index, 404, "Participant not found")
+            internal_ids.append(internal_id)
+        return internal_ids
+
+    def existing(self, model, items: List[Tuple[int, str]], label: str) -> Set[str]:
+        ids = {row_id for _, row_id in items}
+        found = {row[0] for row in self.db.query(model.id).filter(model.id.in_(ids))}
+        for index, row_id in items:
+            if row_id not in found:
+                self.fail(index, 404, f"{label} not found")
+        return found
+
+
+def _hashed(values: Dict[str, Any], hashes: Dict[str, str]) -> Dict[str, Any]:
+    for field, hash_field in PROMPT_FIELDS.items():
+        if field in values:
+            values[hash_field] = hashes.get(values.pop(field))
+    return values
+
+
+def _prompt_texts(payloads: List[Dict[str, Any]]) -> List[Optional[str]]:
+    return [payload.get(field) for payload in payloads for field in PROMPT_FIELDS]
+
+
+def _create_agents(batch: _Batch, items: List[Operation]):
+    payloads = [batch.validate(index, schemas.AgentCreate, operation.data).model_dump() for index, operation in items]
+
+    # As with sequential creates, the last active agent per config is the one left active
+    last_active = {payload["agent_config"]: n for n, payload in enumerate(payloads) if payload["is_active"]}
+    for n, payload in enumerate(payloads):
+        if payload["is_active"] and last_active[payload["agent_config"]] != n:
+            payload["is_active"] = False
+    for agent_config in sorted(last_active):
+        deactivate_config(batch.db, agent_config)
+
+    hashes = store_prompts(batch.db, _prompt_texts(payloads))
+    now = datetime.now(timezone.utc)
+    agents = [
+        models.Agent(id=models.generate_uuid(), updated_at=now, **_hashed(payload, hashes))
+        for payload in payloads
+    ]
+    batch.db.add_all(agents)
+    record_versions(batch.db, agents)
+    for (index, operation), agent in zip(items, agents):
+        batch.record(index, operation, agent.id)
+
+
+def _update_agents(batch: _Batch, items: List[Operation]):
+    targets = [(index, batch.ref(index, "agent", operation.id)) for index, operation in items]
+    agents = {
+        agent.id: agent
+        for agent in batch.db.query(models.Agent).filter(models.Agent.id.in_({agent_id for _, agent_id in targets}))
+    }
+    for index, agent_id in targets:
+        if agent_id not in agents:
+            batch.fail(index, 404, "Agent not found")
+
+    updates = [
+        batch.validate(index, schemas.AgentUpdate, operation.data).model_dump(exclude_unset=True)
+        for index, operation in items
+    ]
+
+    # As with sequential updates, the last agent activated per config is the one left active
+    last_active = {
+        agents[agent_id].agent_config: (n, agent_id)
+        for n, ((_, agent_id), values) in enumerate(zip(targets, updates)) if values.get("is_active")
+    }
+    for n, ((_, agent_id), values) in enumerate(zip(targets, updates)):
+        if values.get("is_active") and last_active[agents[agent_id].agent_config][0] != n:
+            values["is_active"] = False
+    for agent_config in sorted(last_active):
+        deactivate_config(batch.db, agent_config, except_id=last_active[agent_config][1])
+
+    hashes = store_prompts(batch.db, _prompt_texts(updates))
+    now = datetime.now(timezone.utc)
+    for (index, agent_id), values in zip(targets, updates):
+        agent = agents[agent_id]
+        for key, value in _hashed(values, hashes).items():
+            setattr(agent, key, value)
+        agent.updated_at = now
+
+    record_versions(batch.db, list(dict.fromkeys(agents[agent_id] for _, agent_id in targets)))
+    for (index, operation), (_, agent_id) in zip(items, targets):
+        batch.record(index, operation, agent_id)
+
+
+def _delete_agents(batch: _Batch, items: List[Operation]):
+    targets = [(index, batch.ref(index, "agent", operation.id)) for index, operation in items]
+    batch.existing(models.Agent, targets, "Agent")
+
+    Assignment = models.ParticipantAgentAssignment
+    agent_ids = {agent_id for _, agent_id in targets}
+    in_use = dict(batch.db.query(Assignment.agent_id, func.count()).filter(
+        Assignment.agent_id.in_(agent_ids)
+    ).group_by(Assignment.agent_id).all())
+    for index, agent_id in targets:
+        if in_use.get(agent_id):
+            batch.fail(
+                index, 400,
+                f"Cannot delete agent. It is currently used in {in_use[agent_id]} assignment(s). Please delete or reassign those assignments first."
+            )
+
+    batch.db.execute(delete(models.Agent).where(models.Agent.id.in_(agent_ids)))
+    for (index, operation), (_, agent_id) in zip(items, targets):
+        batch.record(index, operation, agent_id)
+
+
+def _create_participants(batch: _Batch, items: List[Operation]):
+    rows = []
+    for index, operation in items:
+        row = batch.validate(index, schemas.ParticipantCreate, operation.data).model_dump()
+        if row["participant_id"] in batch.created_participants:
+            batch.fail(index, 400, "Participant ID already exists")
+        row["id"] = models.generate_uuid()
+        batch.created_participants[row["participant_id"]] = row["id"]
+        rows.append(row)
+
+    taken = {row[0] for row in batch.db.query(models.Participant.participant_id).filter(
+        models.Participant.participant_id.in_([row["participant_id"] for row in rows])
+    )}
+    for (index, _), row in zip(items, rows):
+        if row["participant_id"] in taken:
+            batch.fail(index, 400, "Participant ID already exists")
+
+    batch.db.execute(insert(models.Participant.__table__), rows)
+    for (index, operation), row in zip(items, rows):
+        batch.record(index, operation, row["id"])
+
+
+def _update_participants(batch: _Batch, items: List[Operation]):
+    participant_ids = batch.participant_ids([
+        (index, batch.ref(index, "participant", operation.id)) for index, operation in items
+    ])
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            **batch.validate(index, schemas.ParticipantUpdate, operation.data).model_dump(exclude_unset=True),
+            "id": participant_id,
+            "updated_at": now
+        }
+        for (index, operation), participant_id in zip(items, participant_ids)
+    ]
+
+    batch.db.execute(update(models.Participant), rows)  # Bulk UPDATE by primary key
+    for (index, operation), participant_id in zip(items, participant_ids):
+        batch.record(index, operation, participant_id)
+
+
+def _delete_participants(batch: _Batch, items: List[Operation]):
+    """Delete participants and their assignments; their conversations are kept, unlinked"""
+    participant_ids = batch.participant_ids([
+        (index, batch.ref(index, "participant", operation.id)) for index, operation in items
+    ])
+    ids = set(participant_ids)
+    deleted = dict(batch.db.query(models.Participant.id, models.Participant.participant_id).filter(
+        models.Participant.id.in_(ids)
+    ).all())
+    batch.deleted_participants.update(deleted)
+    for participant_id in deleted.values():
+        batch.created_participants.pop(participant_id, None)
+
+    Log = models.ConversationLog
+    Assignment = models.ParticipantAgentAssignment
+    batch.db.execute(update(Log).where(Log.participant_id.in_(ids)).values(participant_id=None))
+    batch.db.execute(delete(Assignment).where(Assignment.participant_id.in_(ids)))
+    batch.db.execute(delete(models.Participant).where(models.Participant.id.in_(ids)))
+    for (index, operation), participant_id in zip(items, participant_ids):
+        batch.record(index, operation, participant_id)
+
+
+def _create_assignments(batch: _Batch, items: List[Operation]):
+    payloads = []
+    for index, operation in items:
+        data = dict(operation.data)
+        data["participant_id"] = batch.ref(index, "participant", data.get("participant_id"))
+        data["agent_id"] = batch.ref(index, "agent", data.get("agent_id"))
+        payloads.append(data)
+
+    # agent_config / agent_name default to the agent's own
+    agents = {
+        agent.id: agent
+        for agent in batch.db.query(models.Agent.id, models.Agent.agent_config, models.Agent.agent_name).filter(
+            models.Agent.id.in_({data["agent_id"] for data in payloads if isinstance(data["agent_id"], str)})
+        )
+    }
+    rows = []
+    for (index, _), data in zip(items, payloads):
+        agent = agents.get(data["agent_id"])
+        if agent:
+            data.setdefault("agent_config", agent.agent_config)
+            data.setdefault("agent_name", agent.agent_name)
+        elif isinstance(data["agent_id"], str):
+            batch.fail(index, 404, "Agent not found")
+        rows.append(batch.validate(index, schemas.AssignmentCreate, data).model_dump())
+
+    participant_ids = batch.participant_ids([(index, row["participant_id"]) for (index, _), row in zip(items, rows)])
+    for row, participant_id in zip(rows, participant_ids):
+        row["id"] = models.generate_uuid()
+        row["participant_id"] = participant_id
+
+    batch.db.execute(insert(models.ParticipantAgentAssignment.__table__), rows)
+    for (index, operation), row in zip(items, rows):
+        batch.record(index, operation, row["id"])
+
+
+def _update_assignments(batch: _Batch, items: List[Operation]):
+    Assignment = models.ParticipantAgentAssignment
+    targets = [(index, batch.ref(index, "assignment", operation.id)) for index, operation in items]
+    batch.existing(Assignment, targets, "Assignment")
+    rows = [
+        {**batch.validate(index, schemas.AssignmentUpdate, operation.data).model_dump(exclude_unset=True), "id": assignment_id}
+        for (index, operation), (_, assignment_id) in zip(items, targets)
+    ]
+
+    batch.db.execute(update(Assignment), rows)  # Bulk UPDATE by primary key
+    for (index, operation), (_, assignment_id) in zip(items, targets):
+        batch.record(index, operation, assignment_id)
+
+
+def _delete_assignments(batch: _Batch, items: List[Operation]):
+    Assignment = models.ParticipantAgentAssignment
+    targets = [(index, batch.ref(index, "assignment", operation.id)) for index, operation in items]
+    batch.existing(Assignment, targets, "Assignment")
+
+    batch.db.execute(delete(Assignment).where(Assignment.id.in_({assignment_id for _, assignment_id in targets})))
+    for (index, operation), (_, assignment_id) in zip(items, targets):
+        batch.record(index, operation, assignment_id)
+
+
+HANDLERS = {
+    ("agent", "create"): _create_agents,
+    ("agent", "update"): _update_agents,
+    ("agent", "delete"): _delete_agents,
+    ("participant", "create"): _create_participants,
+    ("participant", "update"): _update_participants,
+    ("participant", "delete"): _delete_participants,
+    ("assignment", "create"): _create_assignments,
+    ("assignment", "update"): _update_assignments,
+    ("assignment", "delete"): _delete_assignments,
+}
+
+
+@router.post("/", response_model=schemas.BatchResult)
+async def run_batch(request: schemas.BatchRequest, db: Session = Depends(get_db)):
+    """
+    Run an ordered list of create/update/delete operations atomically.
+    Operations are applied in order; either all of them take effect or none do.
+    """
+    batch = _Batch(db)
+    groups = 0
+    try:
+        for kind, group in groupby(enumerate(request.operations), key=lambda item: (item[1].entity, item[1].op)):
+            HANDLERS[kind](batch, list(group))
+            groups += 1
+
+        if request.dry_run:
+            db.rollback()
+        else:
+            db.commit()
+    except HTTPException:
+        db.rollback()
+        raise
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"Batch conflicts with existing data: {e.orig}")
+    except Exception as e:
+        db.rollback()
+        if is_query_canceled(e):
+            raise  # 503 from query_timeout_handler
+        raise HTTPException(status_code=500, detail=f"Failed to run batch: {str(e)}")
+
+    if not request.dry_run:
+        for participant_id in batch.deleted_participants.values():
+            forget_participant(participant_id)
+
+    return {"results": batch.results, "groups": groups, "dry_run": request.dry_run}
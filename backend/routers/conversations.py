@@ -1,41 +1,125 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import Optional, List
+from sqlalchemy.orm import Session, undefer_group
+from sqlalchemy import case, func
+from sqlalchemy.exc import OperationalError
+from typing import Optional, List, Union
+import logging
 
 import sys
 sys.path.append('..')
 from database import get_db
 import models
+import records
 import schemas
+from agent_versions import latest_version_id
+from near_duplicates import find_clusters, find_similar, sign_conversation
 
 router = APIRouter()
+logger = logging.getLogger("uvicorn.error")
 
-@router.get("/", response_model=List[schemas.ConversationLog])
+@router.get("/", response_model=List[Union[schemas.ConversationLog, schemas.ConversationLogSummary]])
 async def get_conversations(
     agent_id: Optional[str] = Query(None),
     agent_config: Optional[str] = Query(None),
+    include_transcript: bool = Query(True),
     limit: int = Query(50, ge=1, le=500),
     db: Session = Depends(get_db)
 ):
-    """Get conversation logs with optional filters"""
-    query = db.query(models.ConversationLog)
-    
+    """
+    Get conversation logs with optional filters.
+    With include_transcript=false, transcript storage is never read (message_count and
+    transcript_size are still returned).
+    """
+    Log = models.ConversationLog
+    filters = []
     if agent_id:
-        query = query.filter(models.ConversationLog.agent_id == agent_id)
+        filters.append(Log.agent_id == agent_id)
+    if agent_config:
+        filters.append(Log.agent_config == agent_config)
+    order = Log.created_at.desc()
+    
+    if not include_transcript:
+        summaries = records.fetch(db, records.CONVERSATION_SUMMARIES.where(*filters).order_by(order).limit(limit))
+        return records.json_response(summaries.dicts())
+    
+    # Load transcripts with the rows rather than one deferred load per row
+    return db.query(Log).filter(*filters).order_by(order).limit(limit).options(undefer_group("transcript")).all()
+
+@router.get("/stats/by-version", response_model=List[schemas.AgentVersionStats])
+async def get_conversation_stats_by_version(
+    agent_config: Optional[str] = Query(None),
+    agent_id: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Aggregate conversation outcomes per agent version (no prompt text is read)"""
+    query = db.query(
+        models.ConversationLog.agent_version_id,
+        models.AgentVersion.agent_id,
+        models.AgentVersion.version,
+        func.count(models.ConversationLog.id),
+        func.avg(models.ConversationLog.duration),
+        func.avg(models.ConversationLog.turn_count),
+        func.avg(case((models.ConversationLog.task_completed == True, 100.0), (models.ConversationLog.task_completed == False, 0.0))),
+    ).outerjoin(
+        models.AgentVersion, models.AgentVersion.id == models.ConversationLog.agent_version_id
+    )
+    
     if agent_config:
         query = query.filter(models.ConversationLog.agent_config == agent_config)
+    if agent_id:
+        query = query.filter(models.ConversationLog.agent_id == agent_id)
     
-    conversations = query.order_by(
-        models.ConversationLog.created_at.desc()
-    ).limit(limit).all()
+    rows = query.group_by(
+        models.ConversationLog.agent_version_id,
+        models.AgentVersion.agent_id,
+        models.AgentVersion.version
+    ).order_by(models.ConversationLog.agent_version_id).all()
     
-    return conversations
+    return [
+        {
+            "agent_version_id": version_id,
+            "agent_id": version_agent_id,
+            "version": version,
+            "conversation_count": count,
+            "avg_duration": avg_duration,
+            "avg_turn_count": avg_turn_count,
+            "success_rate": success_rate,
+        }
+        for version_id, version_agent_id, version, count, avg_duration, avg_turn_count, success_rate in rows
+    ]
+
+@router.get("/near-duplicates", response_model=List[schemas.NearDuplicateCluster])
+async def get_near_duplicate_clusters(
+    agent_config: Optional[str] = Query(None),
+    agent_id: Optional[str] = Query(None),
+    threshold: float = Query(0.8, ge=0.5, le=1.0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """
+    Clusters of near-identical conversations (auto-save snapshots, retries, scripted runs),
+    largest first. Only conversations sharing an LSH bucket are compared.
+    """
+    clusters = find_clusters(db, threshold, agent_config, agent_id)[:limit]
+    members = {cid for ids, _ in clusters for cid in ids}
+    Log = models.ConversationLog
+    summaries = {
+        row["id"]: row
+        for row in records.fetch(db, records.CONVERSATION_SUMMARIES.where(Log.id.in_(members))).dicts()
+    }
+
+    return records.json_response([
+        {
+            "conversations": sorted((summaries[cid] for cid in ids if cid in summaries), key=lambda row: row["created_at"]),
+            "min_similarity": min_similarity,
+        }
+        for ids, min_similarity in clusters
+    ])
 
 @router.get("/{conversation_id}", response_model=schemas.ConversationLog)
 async def get_conversation(conversation_id: str, db: Session = Depends(get_db)):
     """Get a single conversation log by ID"""
-    conversation = db.query(models.ConversationLog).filter(
+    conversation = db.query(models.ConversationLog).options(undefer_group("transcript")).filter(
         models.ConversationLog.id == conversation_id
     ).first()
     
@@ -44,52 +128,105 @@ async def get_conversation(conversation_id: str, db: Session = Depends(get_db)):
     
     return conversation
 
+@router.get("/{conversation_id}/features", response_model=schemas.ConversationFeatures)
+async def get_conversation_features(conversation_id: str, db: Session = Depends(get_db)):
+    """Get derived metrics for a conversation (computed by the extract_conversation_features job)"""
+    features = db.get(models.ConversationFeatures, conversation_id)
+    
+    if not features:
+        raise HTTPException(status_code=404, detail="Features not computed for this conversation")
+    
+    return features
+
+@router.get("/{conversation_id}/near-duplicates", response_model=List[schemas.NearDuplicate])
+async def get_near_duplicates(
+    conversation_id: str,
+    threshold: float = Query(0.8, ge=0.5, le=1.0),
+    db: Session = Depends(get_db)
+):
+    """Conversations whose transcripts are near-identical to this one, most similar first"""
+    matches = find_similar(db, conversation_id, threshold)
+    
+    if matches is None:
+        raise HTTPException(status_code=404, detail="Conversation not found or not signed yet")
+    
+    Log = models.ConversationLog
+    summaries = {
+        row["id"]: row
+        for row in records.fetch(db, records.CONVERSATION_SUMMARIES.where(Log.id.in_([cid for cid, _ in matches]))).dicts()
+    }
+    
+    return records.json_response([
+        {"conversation": summaries[cid], "similarity": score}
+        for cid, score in matches if cid in summaries
+    ])
+
+def _update_agent_stats(db: Session, agent_id: str):
+    """Count a new run and refresh the agent's average duration and success rate"""
+    experiment = db.query(models.Agent).filter(
+        models.Agent.id == agent_id
+    ).first()
+    
+    if not experiment:
+        return
+    
+    # Update total runs
+    experiment.total_runs += 1
+    
+    # Calculate average duration
+    avg_duration = db.query(
+        func.avg(models.ConversationLog.duration)
+    ).filter(
+        models.ConversationLog.agent_id == agent_id
+    ).scalar()
+    
+    if avg_duration:
+        experiment.avg_duration = float(avg_duration)
+    
+    # Calculate success rate (based on task_completed)
+    total = db.query(models.ConversationLog).filter(
+        models.ConversationLog.agent_id == agent_id,
+        models.ConversationLog.task_completed.isnot(None)
+    ).count()
+    
+    if total > 0:
+        completed = db.query(models.ConversationLog).filter(
+            models.ConversationLog.agent_id == agent_id,
+            models.ConversationLog.task_completed == True
+        ).count()
+        experiment.success_rate = (completed / total) * 100
+
+# Plain def: runs in the threadpool, off the event loop, so a client disconnect can cancel its queries
 @router.post("/", response_model=schemas.ConversationLog, status_code=201)
-async def create_conversation(
+def create_conversation(
     conversation_data: schemas.ConversationLogCreate,
     db: Session = Depends(get_db)
 ):
     """Create a new conversation log"""
 
     conversation = models.ConversationLog(**conversation_data.model_dump(exclude_none=True))
+    if conversation.agent_id:
+        # Pin the conversation to the agent version it ran against
+        conversation.agent_version_id = latest_version_id(db, conversation.agent_id)
     db.add(conversation)
+    db.flush()
+    # MinHash signature and LSH buckets for near-duplicate detection, in the same transaction
+    sign_conversation(db, conversation.id, conversation_data.transcript)
+    conversation_id, agent_id = conversation.id, conversation.agent_id
     db.commit()
-    db.refresh(conversation)
 
-    # Update agent statistics if linked
-    if conversation.agent_id:
-        experiment = db.query(models.Agent).filter(
-            models.Agent.id == conversation.agent_id
-        ).first()
-        
-        if experiment:
-            # Update total runs
-            experiment.total_runs += 1
-            
-            # Calculate average duration
-            avg_duration = db.query(
-                func.avg(models.ConversationLog.duration)
-            ).filter(
-                models.ConversationLog.agent_id == conversation.agent_id
-            ).scalar()
-            
-            if avg_duration:
-                experiment.avg_duration = float(avg_duration)
-            
-            # Calculate success rate (based on task_completed)
-            total = db.query(models.ConversationLog).filter(
-                models.ConversationLog.agent_id == conversation.agent_id,
-                models.ConversationLog.task_completed.isnot(None)
-            ).count()
-            
-            if total > 0:
-                completed = db.query(models.ConversationLog).filter(
-                    models.ConversationLog.agent_id == conversation.agent_id,
-                    models.ConversationLog.task_completed == True
-                ).count()
-                experiment.success_rate = (completed / total) * 100
-            
+    # The conversation is saved, so a slow statistics query mustn't fail the request: the
+    # client would retry and save it twice. Skipped updates are caught up by the
+    # recompute_agent_stats job.
+    if agent_id:
+        try:
+            _update_agent_stats(db, agent_id)
             db.commit()
+        except OperationalError as e:
+            db.rollback()
+            logger.warning("Skipped agent stats update for conversation %s: %s", conversation_id, e.orig)
+
+    db.refresh(conversation)
     
     return conversation
 
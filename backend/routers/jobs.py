@@ -0,0 +1,108 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime, timezone
+
+import sys
+sys.path.append('..')
+from database import get_db
+import models
+import schemas
+from jobs import HANDLERS, enqueue
+import maintenance  # noqa: F401  (registers job handlers)
+import retention  # noqa: F401
+import transcripts  # noqa: F401
+import near_duplicates  # noqa: F401
+
+router = APIRouter()
+
+@router.get("/kinds", response_model=List[str])
+async def get_job_kinds():
+    """List the job kinds that can be enqueued"""
+    return sorted(HANDLERS)
+
+@router.get("/", response_model=List[schemas.Job])
+async def get_jobs(
+    status: Optional[str] = Query(None),
+    kind: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Get jobs with optional filters, newest first"""
+    query = db.query(models.Job)
+    
+    if status:
+        query = query.filter(models.Job.status == status)
+    if kind:
+        query = query.filter(models.Job.kind == kind)
+    
+    return query.order_by(models.Job.created_at.desc()).limit(limit).all()
+
+@router.get("/{job_id}", response_model=schemas.Job)
+async def get_job(job_id: str, db: Session = Depends(get_db)):
+    """Get a job's status and progress"""
+    job = db.get(models.Job, job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job
+
+@router.post("/", response_model=schemas.Job, status_code=201)
+async def create_job(job_data: schemas.JobCreate, db: Session = Depends(get_db)):
+    """Enqueue a background job"""
+    try:
+        job = enqueue(db, job_data.kind, job_data.params, job_data.max_attempts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    db.commit()
+    db.refresh(job)
+    
+    return job
+
+@router.post("/{job_id}/cancel", response_model=schemas.Job)
+async def cancel_job(job_id: str, db: Session = Depends(get_db)):
+    """Cancel a queued job, or ask a running job to stop at its next progress report"""
+    job = db.query(models.Job).filter(models.Job.id == job_id).with_for_update().first()
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if job.status == "queued":
+        job.status = "cancelled"
+        job.finished_at = datetime.now(timezone.utc)
+    elif job.status == "running":
+        job.cancel_requested = True
+    else:
+        raise HTTPException(status_code=400, detail=f"Cannot cancel a {job.status} job")
+    
+    db.commit()
+    db.refresh(job)
+    
+    return job
+
+@router.post("/{job_id}/retry", response_model=schemas.Job)
+async def retry_job(job_id: str, db: Session = Depends(get_db)):
+    """Re-queue a failed or cancelled job with a fresh attempt budget"""
+    job = db.query(models.Job).filter(models.Job.id == job_id).with_for_update().first()
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if job.status not in ("failed", "cancelled"):
+        raise HTTPException(status_code=400, detail=f"Cannot retry a {job.status} job")
+    
+    job.status = "queued"
+    job.attempts = 0
+    job.cancel_requested = False
+    job.progress = 0.0
+    job.progress_message = None
+    job.error = None
+    job.finished_at = None
+    job.run_after = datetime.now(timezone.utc)
+    
+    db.commit()
+    db.refresh(job)
+    
+    return job
@@ -1,42 +1,159 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import Optional, List
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload, undefer_group
+from typing import Literal, Optional, List, Union
 
 import sys
 sys.path.append('..')
 from database import get_db
 import models
 import schemas as schemas
+from participant_resolver import (
+    forget_participant,
+    get_participant as resolve_participant,
+    resolve_participant_id,
+    resolve_participant_ids,
+)
+from prompt_store import PROMPT_LOAD_OPTIONS
+from retention import erase_participant
+from routers.assignments import assignment_with_agent
+from statement_timeouts import is_query_canceled
 
 router = APIRouter()
 
-@router.get("/", response_model=List[schemas.Participant])
+@router.get("/", response_model=List[schemas.ParticipantWithProgress])
 async def get_participants(
     is_guest: Optional[bool] = Query(None),
+    include_progress: bool = Query(False),
+    status: Optional[Literal["unassigned", "not_started", "in_progress", "completed"]] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
     db: Session = Depends(get_db)
 ):
-    """Get all participants with optional filters"""
-    query = db.query(models.Participant)
+    """
+    Get all participants with optional filters.
+    With include_progress (or a status filter), each participant also carries assignment
+    and conversation counts computed in a single aggregated query.
+    """
+    if not include_progress and status is None:
+        query = db.query(models.Participant)
+        
+        if is_guest is not None:
+            query = query.filter(models.Participant.is_guest == is_guest)
+        
+        query = query.order_by(models.Participant.created_at.desc()).offset(offset)
+        if limit:
+            query = query.limit(limit)
+        return query.all()
+    
+    Assignment = models.ParticipantAgentAssignment
+    assignment_counts = db.query(
+        Assignment.participant_id.label("participant_id"),
+        func.count().label("total"),
+        func.count().filter(Assignment.completed == True).label("completed"),
+        func.count().filter(Assignment.is_active == True, Assignment.completed == False).label("active"),
+    ).group_by(Assignment.participant_id).subquery()
+    
+    conversation_counts = db.query(
+        models.ConversationLog.participant_id.label("participant_id"),
+        func.count().label("conversations"),
+        func.max(models.ConversationLog.created_at).label("last_activity_at"),
+    ).filter(
+        models.ConversationLog.participant_id.isnot(None)
+    ).group_by(models.ConversationLog.participant_id).subquery()
+    
+    total = func.coalesce(assignment_counts.c.total, 0)
+    completed = func.coalesce(assignment_counts.c.completed, 0)
+    
+    query = db.query(
+        models.Participant,
+        total,
+        completed,
+        func.coalesce(assignment_counts.c.active, 0),
+        func.coalesce(conversation_counts.c.conversations, 0),
+        conversation_counts.c.last_activity_at,
+    ).outerjoin(
+        assignment_counts, assignment_counts.c.participant_id == models.Participant.id
+    ).outerjoin(
+        conversation_counts, conversation_counts.c.participant_id == models.Participant.id
+    )
     
     if is_guest is not None:
         query = query.filter(models.Participant.is_guest == is_guest)
     
-    participants = query.order_by(models.Participant.created_at.desc()).all()
-    return participants
+    if status == "unassigned":
+        query = query.filter(total == 0)
+    elif status == "not_started":
+        query = query.filter(total > 0, completed == 0)
+    elif status == "in_progress":
+        query = query.filter(completed > 0, completed < total)
+    elif status == "completed":
+        query = query.filter(total > 0, completed == total)
+    
+    query = query.order_by(models.Participant.created_at.desc()).offset(offset)
+    if limit:
+        query = query.limit(limit)
+    
+    results = []
+    for participant, total_count, completed_count, active_count, conversation_count, last_activity_at in query.all():
+        data = schemas.Participant.model_validate(participant).model_dump()
+        if include_progress:
+            data["progress"] = {
+                "total_assignments": total_count,
+                "completed_assignments": completed_count,
+                "active_assignments": active_count,
+                "conversation_count": conversation_count,
+                "last_activity_at": last_activity_at,
+            }
+        results.append(data)
+    
+    return results
+
+@router.post("/batch", response_model=List[schemas.ParticipantWithAssignmentDetails])
+async def get_participants_batch(
+    request: schemas.ParticipantBatchRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Get many participants by internal ID or participant_id in a constant number of queries.
+    Assignments (and their agents) are eager-loaded only when requested.
+    """
+    internal_ids = resolve_participant_ids(db, request.ids)
+    
+    query = db.query(models.Participant).filter(
+        models.Participant.id.in_(set(internal_ids.values()))
+    )
+    if request.include_assignments:
+        loader = selectinload(models.Participant.assignments)
+        if request.include_agents:
+            loader = loader.selectinload(models.ParticipantAgentAssignment.agent).options(*PROMPT_LOAD_OPTIONS)
+        query = query.options(loader)
+    
+    by_id = {participant.id: participant for participant in query.all()}
+    
+    results = []
+    seen = set()
+    for identifier in request.ids:
+        participant = by_id.get(internal_ids.get(identifier))
+        if not participant or participant.id in seen:
+            continue
+        seen.add(participant.id)
+        
+        data = schemas.Participant.model_validate(participant).model_dump()
+        if request.include_assignments:
+            data["assignments"] = [
+                assignment_with_agent(assignment, request.include_agents)
+                for assignment in sorted(participant.assignments, key=lambda a: a.order or 0)
+            ]
+        results.append(data)
+    
+    return results
 
 @router.get("/{participant_id}", response_model=schemas.ParticipantWithAssignments)
 async def get_participant(participant_id: str, db: Session = Depends(get_db)):
     """Get a single participant with their agent assignments"""
-    # Try by internal ID first
-    participant = db.query(models.Participant).filter(
-        models.Participant.id == participant_id
-    ).first()
-    
-    # If not found, try by participant_id (user-facing ID)
-    if not participant:
-        participant = db.query(models.Participant).filter(
-            models.Participant.participant_id == participant_id
-        ).first()
+    # Accepts either the internal ID or the user-facing participant_id
+    participant = resolve_participant(db, participant_id)
     
     if not participant:
         raise HTTPException(status_code=404, detail="Participant not found")
@@ -65,6 +182,8 @@ async def create_participant(
         db.refresh(participant)
     except Exception as e:
         db.rollback()
+        if is_query_canceled(e):
+            raise  # 503 from query_timeout_handler
         raise HTTPException(status_code=500, detail=f"Failed to create participant: {str(e)}")
     
     return participant
@@ -97,39 +216,55 @@ async def update_participant(
     return participant
 
 @router.delete("/{participant_id}")
-async def delete_participant(participant_id: str, db: Session = Depends(get_db)):
-    """Delete a participant"""
-    participant = db.query(models.Participant).filter(
+async def delete_participant(
+    participant_id: str,
+    conversations: str = Query("keep", pattern="^(keep|anonymize|delete)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete a participant and their assignments.
+    Their conversations are kept unlinked (default), anonymized or deleted. Dependent rows are
+    removed in short batches; use the erase_participants job for many participants at once.
+    """
+    participant = db.query(models.Participant.id, models.Participant.participant_id).filter(
         models.Participant.id == participant_id
     ).first()
     
     if not participant:
         raise HTTPException(status_code=404, detail="Participant not found")
     
-    db.delete(participant)
-    db.commit()
+    try:
+        counts = erase_participant(db, participant.id, conversations, pause=0)
+    except Exception as e:
+        db.rollback()
+        if is_query_canceled(e):
+            raise  # 503 from query_timeout_handler
+        raise HTTPException(status_code=500, detail=f"Failed to delete participant: {str(e)}")
+    forget_participant(participant.participant_id)
     
-    return {"message": "Participant deleted successfully", "success": True}
+    return {"message": "Participant deleted successfully", "success": True, **counts}
 
 # Get conversations for a specific participant
-@router.get("/{participant_id}/conversations", response_model=List[schemas.ConversationLog])
-async def get_participant_conversations(
+# Plain def: runs in the threadpool, off the event loop, so a client disconnect can cancel its queries
+@router.get("/{participant_id}/conversations", response_model=List[Union[schemas.ConversationLog, schemas.ConversationLogSummary]])
+def get_participant_conversations(
     participant_id: str,
+    include_transcript: bool = Query(True),
     db: Session = Depends(get_db)
 ):
-    """Get all conversations for a specific participant"""
+    """Get all conversations for a specific participant (include_transcript=false skips transcripts)"""
     # Find participant
-    participant = db.query(models.Participant).filter(
-        (models.Participant.id == participant_id) |
-        (models.Participant.participant_id == participant_id)
-    ).first()
+    internal_id = resolve_participant_id(db, participant_id)
     
-    if not participant:
+    if not internal_id:
         raise HTTPException(status_code=404, detail="Participant not found")
     
     # Get conversations
-    conversations = db.query(models.ConversationLog).filter(
-        models.ConversationLog.participant_id == participant.id
-    ).order_by(models.ConversationLog.created_at.desc()).all()
+    query = db.query(models.ConversationLog).filter(
+        models.ConversationLog.participant_id == internal_id
+    ).order_by(models.ConversationLog.created_at.desc())
+    
+    if not include_transcript:
+        return [schemas.ConversationLogSummary.model_validate(c) for c in query.all()]
     
-    return conversations
+    return query.options(undefer_group("transcript")).all()
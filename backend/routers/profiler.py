@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+from typing import Optional
+import secrets
+
+import sys
+sys.path.append('..')
+import profiler
+import schemas
+
+router = APIRouter()
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Profiler endpoints require X-Admin-Token matching PROFILER_TOKEN; hidden entirely when unset"""
+    if not profiler.PROFILER_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, profiler.PROFILER_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@router.post("/start", dependencies=[Depends(require_admin)], status_code=201)
+async def start_profiling(request: schemas.ProfilerStart):
+    """Profile the next N matching requests and/or the next duration_seconds in this worker"""
+    if profiler.current is not None and not profiler.current.finished:
+        raise HTTPException(status_code=409, detail="A profiling run is already active")
+
+    run = profiler.ProfileRun(
+        mode=request.mode,
+        routes=request.routes,
+        max_requests=request.requests,
+        duration_seconds=request.duration_seconds,
+        interval_ms=request.interval_ms
+    )
+    run.start()
+    profiler.current = run
+    return run.status()
+
+@router.post("/stop", dependencies=[Depends(require_admin)])
+async def stop_profiling():
+    """End the active run early; its results stay available"""
+    if profiler.current is None:
+        raise HTTPException(status_code=404, detail="No profiling run")
+    profiler.current.stop()
+    return profiler.current.status()
+
+@router.get("/status", dependencies=[Depends(require_admin)])
+async def get_profiling_status():
+    if profiler.current is None:
+        return {"active": False}
+    return {"active": not profiler.current.finished, **profiler.current.status()}
+
+@router.get("/result", dependencies=[Depends(require_admin)])
+async def get_profiling_result(
+    format: str = Query("collapsed", pattern="^(collapsed|pstats|pstats-raw)$"),
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|ncalls)$"),
+    limit: int = Query(100, ge=1, le=5000)
+):
+    """
+    collapsed: flamegraph.pl/speedscope input (sample mode).
+    pstats: text report; pstats-raw: a .prof file for pstats or snakeviz (cprofile mode).
+    """
+    run = profiler.current
+    if run is None:
+        raise HTTPException(status_code=404, detail="No profiling run")
+    if run.in_flight:
+        raise HTTPException(status_code=409, detail="Profiled requests still in flight")
+
+    if format == "collapsed":
+        if run.mode != "sample":
+            raise HTTPException(status_code=400, detail="collapsed output needs mode 'sample'")
+        return PlainTextResponse(run.collapsed())
+
+    if run.mode != "cprofile":
+        raise HTTPException(status_code=400, detail=f"{format} output needs mode 'cprofile'")
+    if format == "pstats":
+        return PlainTextResponse(run.pstats_text(sort, limit))
+    return Response(
+        content=run.pstats_raw(),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": 'attachment; filename="profile.prof"'}
+    )
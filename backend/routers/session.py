@@ -1,13 +1,28 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
 import sys
 sys.path.append('..')
 from database import get_db
+import capacity
 import models
+import records
+from statement_timeouts import is_query_canceled
 
 router = APIRouter()
 
+async def _admit_or_reject(participant_id: str, agent_config: Optional[str]) -> None:
+    admitted, retry_after = await capacity.admit(participant_id, agent_config)
+    if not admitted:
+        raise HTTPException(
+            status_code=503,
+            detail="Session capacity reached, please retry later",
+            headers={"Retry-After": str(retry_after)}
+        )
+
 @router.get("/participant-config/{participant_id}")
 async def get_participant_config(participant_id: str, db: Session = Depends(get_db)):
     """
@@ -16,42 +31,32 @@ async def get_participant_config(participant_id: str, db: Session = Depends(get_
     """
     
     # Find participant by participant_id (user-facing ID)
-    participant = db.query(models.Participant).filter(
-        models.Participant.participant_id == participant_id
+    participant = records.fetch(
+        db, records.PARTICIPANT_BY_PARTICIPANT_ID, {"participant_id": participant_id}
     ).first()
     
     if not participant:
         raise HTTPException(status_code=404, detail="Participant not found")
     
     # Check if guest mode
-    if participant.is_guest:
+    if participant["is_guest"]:
+        # Guests pick an agent client-side; the choice arrives with their first heartbeat
+        await _admit_or_reject(participant["participant_id"], None)
+
         # Guest can choose any active experiment prompt
-        available_prompts = db.query(models.Agent).filter(
-            models.Agent.is_active == True
-        ).all()
+        available_agents = records.fetch(db, records.GUEST_AGENTS).dicts()
         
-        return {
-            "participant_id": participant.participant_id,
+        return records.json_response({
+            "participant_id": participant["participant_id"],
             "is_guest": True,
             "mode": "guest",
-            "available_agents": [
-                {
-                    "experiment_id": prompt.id,
-                    "display_name": prompt.display_name,
-                    "agent_config": prompt.agent_config,
-                    "agent_name": prompt.agent_name,
-                    "description": prompt.description
-                }
-                for prompt in available_prompts
-            ]
-        }
+            "available_agents": available_agents
+        })
     
-    # For non-guest, get active assignment
-    assignment = db.query(models.ParticipantAgentAssignment).filter(
-        models.ParticipantAgentAssignment.participant_id == participant.id,
-        models.ParticipantAgentAssignment.is_active == True,
-        models.ParticipantAgentAssignment.completed == False
-    ).order_by(models.ParticipantAgentAssignment.order).first()
+    # For non-guest, get the active assignment together with its agent and prompts
+    assignment = records.fetch(
+        db, records.NEXT_ASSIGNMENT_CONFIG, {"participant_id": participant["id"]}
+    ).first()
     
     if not assignment:
         raise HTTPException(
@@ -59,35 +64,68 @@ async def get_participant_config(participant_id: str, db: Session = Depends(get_
             detail="No active assignment found for this participant"
         )
     
-    # Get experiment prompt details
-    experiment = db.query(models.Agent).filter(
-        models.Agent.id == assignment.agent_id
-    ).first()
-    
-    if not experiment:
+    if assignment["experiment_id"] is None:
         raise HTTPException(status_code=404, detail="Experiment prompt not found")
+
+    await _admit_or_reject(participant["participant_id"], assignment["agent_config"])
     
-    return {
-        "participant_id": participant.participant_id,
+    return records.json_response({
+        "participant_id": participant["participant_id"],
         "is_guest": False,
         "mode": "assigned",
-        "assignment": {
-            "assignment_id": assignment.id,
-            "experiment_id": experiment.id,
-            "agent_config": assignment.agent_config,
-            "agent_name": assignment.agent_name,
-            "experiment_name": experiment.display_name,
-            "system_prompt": experiment.system_prompt,
-            "instructions": experiment.instructions,
-            "temperature": experiment.temperature,
-            "max_tokens": experiment.max_tokens,
-            "voice": experiment.voice,
-            "order": assignment.order
-        }
-    }
+        "assignment": assignment
+    })
 
 from pydantic import BaseModel
 
+class HeartbeatRequest(BaseModel):
+    agent_config: Optional[str] = None
+
+@router.post("/heartbeat/{participant_id}")
+async def heartbeat(participant_id: str, request: HeartbeatRequest, db: Session = Depends(get_db)):
+    """
+    Keep a live session registered. Sessions expire SESSION_TTL_SECONDS after the last
+    heartbeat or participant-config fetch. Passing agent_config (e.g. a guest's chosen
+    agent) moves the session to that config, subject to its cap, and requires the
+    config to have an active agent.
+    """
+    if request.agent_config or not capacity.registry.heartbeat(participant_id):
+        # Expired sessions are re-admitted rather than dropped mid-call. Only
+        # admission touches the database; a live session's heartbeat does not.
+        participant = records.fetch(
+            db, records.PARTICIPANT_BY_PARTICIPANT_ID, {"participant_id": participant_id}
+        ).first()
+        if not participant:
+            raise HTTPException(status_code=404, detail="Participant not found")
+        if request.agent_config and not records.fetch(
+            db, records.ACTIVE_AGENT_CONFIG, {"agent_config": request.agent_config}
+        ).first():
+            raise HTTPException(status_code=404, detail="No active agent in this agent_config")
+        await _admit_or_reject(participant_id, request.agent_config)
+    return {"ttl_seconds": capacity.SESSION_TTL_SECONDS}
+
+@router.post("/end/{participant_id}")
+async def end_session(participant_id: str):
+    """Release a live session slot as soon as the client disconnects"""
+    capacity.registry.release(participant_id)
+    return {"success": True}
+
+@router.get("/capacity")
+async def get_capacity():
+    """Live session counts and caps per agent config (0 means unlimited)"""
+    counts = capacity.registry.snapshot()
+    configs = sorted(set(counts) | set(capacity.SESSION_CAPS))
+    return {
+        "registry": capacity.SESSION_REGISTRY,
+        "ttl_seconds": capacity.SESSION_TTL_SECONDS,
+        "active": sum(counts.values()),
+        "cap": capacity.SESSION_CAP_TOTAL,
+        "by_config": [
+            {"agent_config": config, "active": counts.get(config, 0), "cap": capacity.cap_for(config)}
+            for config in configs
+        ]
+    }
+
 class CompleteAssignmentRequest(BaseModel):
     assignment_id: str
 
@@ -98,48 +136,55 @@ async def complete_assignment(
     db: Session = Depends(get_db)
 ):
     """
-    Mark an assignment as completed for a participant.
-    This moves the participant to the next assignment if available.
+    Mark an assignment as completed for a participant and advance to the next one.
+    The completion and the next-assignment lookup run in a single transaction, and the
+    response carries the fully resolved next agent config so the client doesn't need
+    a follow-up call to /participant-config.
     """
+    Assignment = models.ParticipantAgentAssignment
+
+    # Complete the assignment only if it belongs to this participant (user-facing ID)
+    owner_id = select(models.Participant.id).where(
+        models.Participant.participant_id == participant_id
+    ).scalar_subquery()
 
-    assignment = db.query(models.ParticipantAgentAssignment).filter(
-        models.ParticipantAgentAssignment.id == request.assignment_id
+    completed = db.execute(
+        update(Assignment)
+        .where(Assignment.id == request.assignment_id, Assignment.participant_id == owner_id)
+        .values(completed=True, is_active=False)
+        .returning(Assignment.participant_id)
     ).first()
 
-    if not assignment:
-        raise HTTPException(status_code=404, detail="Assignment not found")
+    if not completed:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Assignment not found for this participant")
+
+    # Next assignment is whatever /participant-config would now serve (same statement),
+    # with its agent and prompt bodies in one round trip
+    next_config = records.fetch(
+        db, records.NEXT_ASSIGNMENT_CONFIG, {"participant_id": completed.participant_id}
+    ).first()
 
-    # Mark as completed
-    assignment.completed = True
-    assignment.is_active = False
     try:
         db.commit()
     except Exception as e:
         db.rollback()
+        if is_query_canceled(e):
+            raise  # 503 from query_timeout_handler
         raise HTTPException(status_code=500, detail=f"Failed to complete assignment: {str(e)}")
 
-    # Check if there's a next assignment
-    participant = db.query(models.Participant).filter(
-        models.Participant.participant_id == participant_id
-    ).first()
-
-    if participant:
-        next_assignment = db.query(models.ParticipantAgentAssignment).filter(
-            models.ParticipantAgentAssignment.participant_id == participant.id,
-            models.ParticipantAgentAssignment.completed == False,
-            models.ParticipantAgentAssignment.order > assignment.order
-        ).order_by(models.ParticipantAgentAssignment.order).first()
-
-        if next_assignment:
-            return {
-                "success": True,
-                "message": "Assignment completed",
-                "has_next": True,
-                "next_assignment_id": next_assignment.id
-            }
+    if next_config:
+        return {
+            "success": True,
+            "message": "Assignment completed",
+            "has_next": True,
+            "next_assignment_id": next_config["assignment_id"],
+            "next_assignment": next_config
+        }
 
     return {
         "success": True,
         "message": "Assignment completed. No more assignments.",
-        "has_next": False
+        "has_next": False,
+        "next_assignment": None
     }
@@ -0,0 +1,121 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from pydantic import ValidationError
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime
+import json
+
+import sys
+sys.path.append('..')
+from database import get_db
+import models
+import schemas
+from telemetry import buffer
+
+try:
+    import msgpack
+except ImportError:  # Optional: JSON is always accepted
+    msgpack = None
+
+router = APIRouter()
+
+GROUP_COLUMNS = ("agent_config", "voice", "hour")
+
+@router.post("/", response_model=schemas.TelemetryAccepted, status_code=202)
+async def ingest_telemetry(request: Request, background_tasks: BackgroundTasks):
+    """
+    Accept a batch of client telemetry samples in columnar form (see schemas.TelemetryBatch),
+    as JSON or, if msgpack is installed, as application/msgpack. Samples are buffered and
+    written in bulk, so they appear in summaries after the next flush.
+    """
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("application/msgpack"):
+            if msgpack is None:
+                raise HTTPException(status_code=415, detail="msgpack is not supported by this server")
+            data = msgpack.unpackb(body)
+        else:
+            data = json.loads(body)
+        batch = schemas.TelemetryBatch.model_validate(data)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False, include_input=False))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed telemetry payload")
+    
+    accepted, should_flush = buffer.add_batch(batch)
+    if should_flush:
+        background_tasks.add_task(buffer.flush)
+    
+    return {"accepted": accepted}
+
+@router.get("/summary", response_model=List[schemas.TelemetrySummaryRow])
+async def get_telemetry_summary(
+    metric: Optional[str] = Query(None),
+    agent_config: Optional[str] = Query(None),
+    group_by: str = Query("agent_config"),  # Comma-separated: agent_config, voice, hour
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """p50/p95 and sample count per metric, grouped by agent_config, voice and/or hour"""
+    groups = [g.strip() for g in group_by.split(",") if g.strip()]
+    unknown = set(groups) - set(GROUP_COLUMNS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Cannot group by: {', '.join(sorted(unknown))}")
+    
+    Event = models.TelemetryEvent
+    is_postgres = db.bind.dialect.name == "postgresql"
+    if is_postgres:
+        hour = func.date_trunc("hour", Event.ts)
+    else:
+        hour = func.strftime("%Y-%m-%d %H:00:00", Event.ts)
+    group_exprs = {"agent_config": Event.agent_config, "voice": Event.voice, "hour": hour}
+    keys = [Event.metric] + [group_exprs[g].label(g) for g in groups]
+    
+    def apply_filters(query):
+        if metric:
+            query = query.filter(Event.metric == metric)
+        if agent_config:
+            query = query.filter(Event.agent_config == agent_config)
+        if since:
+            query = query.filter(Event.ts >= since)
+        if until:
+            query = query.filter(Event.ts < until)
+        return query
+    
+    if is_postgres:
+        rows = apply_filters(db.query(
+            *keys,
+            func.count(),
+            func.percentile_cont(0.5).within_group(Event.value),
+            func.percentile_cont(0.95).within_group(Event.value),
+        )).group_by(*keys).all()
+    else:
+        # No ordered-set aggregates: pull values per group and interpolate like percentile_cont
+        grouped = {}
+        for row in apply_filters(db.query(*keys, Event.value)).all():
+            grouped.setdefault(tuple(row[:-1]), []).append(row[-1])
+        rows = []
+        for key, values in grouped.items():
+            values.sort()
+            rows.append((*key, len(values), _percentile(values, 0.5), _percentile(values, 0.95)))
+    
+    return [
+        {
+            "metric": row[0],
+            **{g: row[1 + i] for i, g in enumerate(groups)},
+            "count": row[-3],
+            "p50": row[-2],
+            "p95": row[-1],
+        }
+        for row in rows
+    ]
+
+def _percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field, model_validator
+from typing import Annotated, Optional, List, Dict, Any, Literal, Union
 from datetime import datetime
 
 # Agent schemas
@@ -34,6 +34,8 @@ class AgentUpdate(BaseModel):
 
 class Agent(AgentBase):
     id: str
+    system_prompt_hash: Optional[str] = None
+    instructions_hash: Optional[str] = None
     success_rate: Optional[float] = None
     avg_duration: Optional[float] = None
     total_runs: int
@@ -43,6 +45,92 @@ class Agent(AgentBase):
     class Config:
         from_attributes = True
 
+class AgentSummary(BaseModel):
+    """Agent without prompt bodies; fetch those once per hash from /api/agents/prompts/{hash}"""
+    id: str
+    agent_name: str
+    display_name: str
+    agent_config: str
+    system_prompt_hash: str
+    instructions_hash: Optional[str] = None
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    voice: Optional[str] = None
+    description: Optional[str] = None
+    tags: List[str] = []
+    is_active: bool = False
+    success_rate: Optional[float] = None
+    avg_duration: Optional[float] = None
+    total_runs: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class AgentFacets(BaseModel):
+    tags: List[FacetCount]
+    agent_config: List[FacetCount]
+    is_active: List[FacetCount]
+
+class AgentSearchResult(BaseModel):
+    total: int
+    items: List[AgentSummary]
+    facets: AgentFacets
+
+class AgentCloneRequest(BaseModel):
+    agent_config: str  # Source config
+    tags: Optional[List[str]] = None  # Only agents with any of these tags
+    new_agent_config: Optional[str] = None  # None clones within the source config
+    is_active: Optional[bool] = False  # Active flag for the clones; None copies each source's
+    display_name_suffix: str = ""
+    include_assignments: bool = False  # Copy the sources' assignments onto the clones (progress reset)
+    dry_run: bool = False
+
+class AgentCloneResult(BaseModel):
+    agent_config: str
+    agents: List[AgentSummary]
+    id_map: Dict[str, str]  # Source agent id -> clone id
+    assignments_created: int
+    dry_run: bool
+
+class PromptContent(BaseModel):
+    hash: str
+    content: str
+
+    class Config:
+        from_attributes = True
+
+class AgentVersion(BaseModel):
+    id: int
+    agent_id: Optional[str] = None
+    version: int
+    agent_config: str
+    agent_name: str
+    display_name: str
+    system_prompt_hash: str
+    instructions_hash: Optional[str] = None
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    voice: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class AgentVersionStats(BaseModel):
+    agent_version_id: Optional[int] = None
+    agent_id: Optional[str] = None
+    version: Optional[int] = None
+    conversation_count: int
+    avg_duration: Optional[float] = None
+    avg_turn_count: Optional[float] = None
+    success_rate: Optional[float] = None
+
 # ConversationLog schemas
 class ConversationLogBase(BaseModel):
     session_id: str
@@ -62,11 +150,65 @@ class ConversationLogCreate(ConversationLogBase):
 
 class ConversationLog(ConversationLogBase):
     id: str
+    agent_version_id: Optional[int] = None
+    message_count: Optional[int] = None
+    transcript_size: Optional[int] = None
     created_at: datetime
+    anonymized_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+class ConversationLogSummary(BaseModel):
+    """Conversation log without its transcript; listing these never loads transcript storage"""
+    id: str
+    session_id: str
+    agent_id: Optional[str] = None
+    agent_config: str
+    agent_name: str
+    duration: float
+    turn_count: int
+    participant_id: Optional[str] = None
+    user_satisfaction: Optional[int] = None
+    task_completed: Optional[bool] = None
+    extra_metadata: Optional[Dict[str, Any]] = None
+    agent_version_id: Optional[int] = None
+    message_count: Optional[int] = None
+    transcript_size: Optional[int] = None
+    created_at: datetime
+    anonymized_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ConversationFeatures(BaseModel):
+    conversation_id: str
+    feature_version: int
+    message_count: int
+    user_turns: int
+    assistant_turns: int
+    user_words: int
+    assistant_words: int
+    mean_user_turn_words: Optional[float] = None
+    mean_assistant_turn_words: Optional[float] = None
+    mean_response_gap: Optional[float] = None
+    median_response_gap: Optional[float] = None
+    max_response_gap: Optional[float] = None
+    interruptions: int
+    tool_call_count: int
+    computed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class NearDuplicate(BaseModel):
+    conversation: ConversationLogSummary
+    similarity: float  # Estimated Jaccard similarity of the transcripts' word 3-grams
+
+class NearDuplicateCluster(BaseModel):
+    conversations: List[ConversationLogSummary]  # Oldest first
+    min_similarity: float  # Weakest of the pairs linking the cluster
+
 # Response models
 class AgentsResponse(BaseModel):
     agents: List[Agent]
@@ -131,6 +273,62 @@ class Assignment(AssignmentBase):
         from_attributes = True
 
 
+class AssignmentGenerateRequest(BaseModel):
+    """Counterbalanced assignments for a cohort; participants come from participant_ids or the filter"""
+    agent_ids: List[str] = Field(..., min_length=1, max_length=12)  # Conditions, in label order
+    design: Literal["latin_square", "permutation", "random"] = "latin_square"
+    seed: Optional[int] = None
+    participant_ids: Optional[List[str]] = Field(None, max_length=100000)
+    is_guest: Optional[bool] = False  # Filter when participant_ids is omitted; None = any
+    skip_assigned: bool = True  # Leave participants that already have assignments untouched
+    dry_run: bool = False
+
+class AssignmentGenerateResult(BaseModel):
+    design: str
+    participants: int
+    assignments_created: int
+    skipped_assigned: int
+    unknown: List[str] = []
+    sequences: List[List[str]]  # Distinct agent orderings used
+    sequence_counts: List[int]  # Participants per sequence
+    dry_run: bool
+
+# --- Transactional batch schemas ---
+class BatchOperation(BaseModel):
+    """
+    One create/update/delete. `data` is the body the matching single-item endpoint takes;
+    "$alias" in `id`, `data.participant_id` or `data.agent_id` refers to an earlier operation's row.
+    """
+    op: Literal["create", "update", "delete"]
+    entity: Literal["agent", "participant", "assignment"]
+    alias: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9_.:-]+$")
+    id: Optional[str] = None  # Target of update/delete (internal id, participant_id or "$alias")
+    data: Dict[str, Any] = {}
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if self.op == "create" and self.id is not None:
+            raise ValueError("create operations take no id")
+        if self.op != "create" and self.id is None:
+            raise ValueError(f"{self.op} operations need an id")
+        return self
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=10000)
+    dry_run: bool = False  # Run everything, report the ids, then roll back
+
+class BatchOperationResult(BaseModel):
+    index: int
+    op: str
+    entity: str
+    alias: Optional[str] = None
+    id: str
+
+class BatchResult(BaseModel):
+    results: List[BatchOperationResult]
+    groups: int  # Consecutive operations of the same entity and op run as one group of bulk statements
+    dry_run: bool
+
 # --- User schemas (experimenters) ---
 class UserBase(BaseModel):
     username: str
@@ -162,5 +360,158 @@ class UsersResponse(BaseModel):
 class UserResponse(BaseModel):
     user: User
 
+class ParticipantProgress(BaseModel):
+    total_assignments: int = 0
+    completed_assignments: int = 0
+    active_assignments: int = 0
+    conversation_count: int = 0
+    last_activity_at: Optional[datetime] = None
+
+class ParticipantWithProgress(Participant):
+    progress: Optional[ParticipantProgress] = None
+
 class ParticipantWithAssignments(Participant):
     assignments: List[Assignment] = []
+
+
+# --- Batch multi-get schemas ---
+class BatchGetRequest(BaseModel):
+    ids: List[str] = Field(..., max_length=1000)
+
+class ParticipantBatchRequest(BatchGetRequest):
+    include_assignments: bool = False
+    include_agents: bool = False  # Only applies when include_assignments is set
+
+class AssignmentBatchRequest(BatchGetRequest):
+    include_agent: bool = False
+
+class AssignmentWithAgent(Assignment):
+    agent: Optional[Agent] = None
+
+class ParticipantWithAssignmentDetails(Participant):
+    assignments: Optional[List[AssignmentWithAgent]] = None
+
+
+# --- Background job schemas ---
+class JobCreate(BaseModel):
+    kind: str
+    params: Optional[Dict[str, Any]] = None
+    max_attempts: int = Field(3, ge=1, le=20)
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    params: Optional[Dict[str, Any]] = None
+    status: str
+    progress: float
+    progress_message: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int
+    max_attempts: int
+    cancel_requested: bool
+    run_after: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+# --- Annotation queue schemas ---
+class AnnotationEnqueueRequest(BaseModel):
+    agent_config: Optional[str] = None
+    agent_ids: Optional[List[str]] = None
+    include_rated: bool = False  # Also queue conversations that already have a satisfaction/completion value
+
+class AnnotationEnqueueResult(BaseModel):
+    queued: int
+
+class AnnotationClaimRequest(BaseModel):
+    rater: str = Field(..., min_length=1)
+    limit: int = Field(10, ge=1, le=200)
+    agent_config: Optional[str] = None
+    stratify_by: Optional[Literal["agent", "agent_config"]] = None  # Split the batch evenly across strata
+    lease_seconds: Optional[int] = Field(None, ge=30, le=86400)
+    include_transcript: bool = True
+
+class AnnotationClaim(BaseModel):
+    item_id: int
+    lease_expires_at: datetime
+    conversation: Union[ConversationLog, ConversationLogSummary]
+
+class AnnotationRating(BaseModel):
+    item_id: int
+    user_satisfaction: Optional[int] = Field(None, ge=1, le=5)
+    task_completed: Optional[bool] = None
+    labels: Optional[List[str]] = None
+
+class AnnotationRatingBatch(BaseModel):
+    rater: str = Field(..., min_length=1)
+    ratings: List[AnnotationRating] = Field(..., min_length=1, max_length=1000)
+
+class AnnotationRatingResult(BaseModel):
+    saved: int
+    rejected: List[int]  # Not leased to this rater (lease taken over after expiry), already rated or unknown
+
+class AnnotationRelease(BaseModel):
+    rater: str = Field(..., min_length=1)
+    item_ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+class AnnotationProgress(BaseModel):
+    agent_config: str
+    agent_id: Optional[str] = None
+    total: int
+    rated: int
+    leased: int  # Unrated with an unexpired lease
+    open: int
+
+
+# --- Telemetry schemas ---
+# Epoch milliseconds between 1970 and the end of year 9999 (the datetime range)
+EpochMillis = Annotated[float, Field(ge=0, le=253402300799999, allow_inf_nan=False)]
+
+class TelemetryColumns(BaseModel):
+    """Columnar samples: the i-th entries of each list form one event"""
+    ts: List[EpochMillis] = Field(..., max_length=5000)
+    metric: List[Annotated[str, Field(min_length=1)]] = Field(..., max_length=5000)
+    value: List[Annotated[float, Field(allow_inf_nan=False)]] = Field(..., max_length=5000)
+
+    @model_validator(mode="after")
+    def check_lengths(self):
+        if not len(self.ts) == len(self.metric) == len(self.value):
+            raise ValueError("ts, metric and value must have the same length")
+        return self
+
+class TelemetryBatch(BaseModel):
+    session_id: str = Field(..., min_length=1)
+    agent_id: Optional[str] = None
+    agent_config: Optional[str] = None
+    voice: Optional[str] = None
+    columns: TelemetryColumns
+
+class TelemetryAccepted(BaseModel):
+    accepted: int
+
+class TelemetrySummaryRow(BaseModel):
+    metric: str
+    agent_config: Optional[str] = None
+    voice: Optional[str] = None
+    hour: Optional[datetime] = None
+    count: int
+    p50: Optional[float] = None
+    p95: Optional[float] = None
+
+class ProfilerStart(BaseModel):
+    mode: Literal["sample", "cprofile"] = "sample"
+    routes: List[str] = []  # Path prefixes, e.g. ["/api/session"]; empty = all routes
+    requests: Optional[int] = Field(None, ge=1, le=100000)  # Stop after this many matching requests
+    duration_seconds: Optional[float] = Field(None, gt=0, le=3600)
+    interval_ms: float = Field(5.0, ge=1, le=1000)  # Sampling interval (sample mode)
+
+    @model_validator(mode="after")
+    def check_limit(self):
+        if self.requests is None and self.duration_seconds is None:
+            raise ValueError("Set requests and/or duration_seconds")
+        return self
@@ -1,8 +1,10 @@
 #!/bin/bash
 set -e
 
-echo "Running database migrations..."
-alembic upgrade head
+if [ "${RUN_MIGRATIONS:-1}" = "1" ]; then
+	echo "Running database migrations..."
+	alembic upgrade head
+fi
 
 echo "Starting application..."
 PORT="${BACKEND_PORT:-8000}"
@@ -10,6 +12,26 @@ PORT="${BACKEND_PORT:-8000}"
 UVICORN_ARGS=(main:app --host 0.0.0.0 --port "$PORT")
 if [ "${UVICORN_RELOAD:-0}" = "1" ]; then
 	UVICORN_ARGS+=(--reload)
+else
+	# Production: one process per core by default. Workers finish in-flight requests
+	# on shutdown and, if BACKEND_MAX_REQUESTS is set, are recycled after that many requests.
+	WORKERS="${BACKEND_WORKERS:-$(nproc)}"
+	UVICORN_ARGS+=(--workers "$WORKERS" --timeout-graceful-shutdown "${BACKEND_GRACEFUL_TIMEOUT:-30}")
+	if [ -n "${BACKEND_MAX_REQUESTS:-}" ]; then
+		UVICORN_ARGS+=(--limit-max-requests "$BACKEND_MAX_REQUESTS")
+	fi
+	if [ "$WORKERS" -gt 1 ]; then
+		# Per-process session counts and rate-limit buckets would let each worker admit its own share
+		export SESSION_REGISTRY="${SESSION_REGISTRY:-database}" RATE_LIMIT_BACKEND="${RATE_LIMIT_BACKEND:-database}"
+		if [ "$SESSION_REGISTRY" = "memory" ] && { [ "${SESSION_CAP_TOTAL:-0}" != "0" ] || [ "${SESSION_CAP_PER_CONFIG:-0}" != "0" ] || [ "${SESSION_CAPS:-{\}}" != "{}" ]; }; then
+			echo "Session caps need SESSION_REGISTRY=database with $WORKERS workers (each would enforce its own cap)" >&2
+			exit 1
+		fi
+		if [ "$RATE_LIMIT_BACKEND" = "memory" ]; then
+			echo "Warning: RATE_LIMIT_BACKEND=memory with $WORKERS workers allows up to $WORKERS times each limit" >&2
+		fi
+	fi
+	echo "Serving with $WORKERS worker(s)"
 fi
 
 exec uvicorn "${UVICORN_ARGS[@]}"
@@ -0,0 +1,214 @@
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from database import SessionLocal, engine
+from rate_limit import path_pattern
+
+# Per-route statement time budgets for API requests, so one runaway query can't
+# hold a pooled connection for long. Each transaction a request's session opens
+# starts with SET LOCAL statement_timeout (Postgres); routes match the method and
+# path patterns in STATEMENT_TIMEOUTS, others get DB_STATEMENT_TIMEOUT_MS.
+#
+# The query a request is running is tracked, and when the client disconnects it
+# is cancelled (a protocol cancel request via psycopg2's cancel(); interrupt()
+# on SQLite). The watcher runs on the event loop, so this reaches routes whose
+# database work runs off it (plain `def` endpoints); `async def` routes that
+# query synchronously only get the timeout. Background jobs are not limited.
+
+logger = logging.getLogger("uvicorn.error")
+
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))  # 0 = no limit
+QUERY_CANCEL_ON_DISCONNECT = os.getenv("QUERY_CANCEL_ON_DISCONNECT", "1") == "1"
+
+DEFAULT_BUDGETS = [
+    {"method": "GET", "path": "/api/session/participant-config/{key}", "timeout_ms": 1000},
+    {"method": "POST", "path": "/api/session/heartbeat/{key}", "timeout_ms": 1000},
+    {"method": "POST", "path": "/api/conversations", "timeout_ms": 3000},
+    {"method": "GET", "path": "/api/participants/{key}/conversations", "timeout_ms": 5000},
+    {"method": "GET", "path": "/api/conversations/near-duplicates", "timeout_ms": 30000},
+    {"method": "POST", "path": "/api/batch", "timeout_ms": 60000},
+]
+STATEMENT_TIMEOUTS: List[dict] = json.loads(os.getenv("STATEMENT_TIMEOUTS", "null")) or DEFAULT_BUDGETS
+
+QUERY_CANCELED = "57014"  # SQLSTATE for both statement_timeout and a cancel request
+DEFAULT_ROUTE = "default"  # Stats label for requests matching no rule
+
+budgets = [
+    (rule["method"], path_pattern(rule["path"]), f"{rule['method']} {rule['path']}", int(rule["timeout_ms"]))
+    for rule in STATEMENT_TIMEOUTS
+]
+
+
+class RequestQueries:
+    """Time budget and in-flight query of one request, shared with the threads running its queries"""
+    __slots__ = ("route", "timeout_ms", "connection", "disconnected", "lock")
+
+    def __init__(self, route: str, timeout_ms: int):
+        self.route = route
+        self.timeout_ms = timeout_ms
+        self.connection = None  # DBAPI connection while a statement is executing
+        self.disconnected = False
+        # Held while cancelling, so the connection can't finish the statement and go back
+        # to the pool (and to another request) before the cancel is sent
+        self.lock = Lock()
+
+    def cancel(self) -> None:
+        with self.lock:
+            if self.connection is None:
+                return
+            if hasattr(self.connection, "cancel"):
+                self.connection.cancel()  # psycopg2: the server cancels the running statement
+            else:
+                self.connection.interrupt()  # sqlite3
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+# Per-process counters by route: statements stopped by their timeout or by a client disconnect
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = Lock()
+
+
+def _count(route: str, outcome: str) -> None:
+    with _stats_lock:
+        counts = _stats.setdefault(route, {"timeouts": 0, "cancelled": 0})
+        counts[outcome] += 1
+
+
+def snapshot() -> Dict[str, Any]:
+    pool = engine.pool
+    routes = [(route, timeout_ms) for _, _, route, timeout_ms in budgets] + [(DEFAULT_ROUTE, DB_STATEMENT_TIMEOUT_MS)]
+    return {
+        "default_timeout_ms": DB_STATEMENT_TIMEOUT_MS,
+        "pool": {
+            "size": pool.size() if hasattr(pool, "size") else None,
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+            "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+        },
+        "routes": [
+            {"route": route, "timeout_ms": timeout_ms, **_stats.get(route, {"timeouts": 0, "cancelled": 0})}
+            for route, timeout_ms in routes
+        ],
+    }
+
+
+def budget_for(method: str, path: str) -> Optional[RequestQueries]:
+    for rule_method, pattern, route, timeout_ms in budgets:
+        if rule_method == method and pattern.match(path):
+            return RequestQueries(route, timeout_ms)
+    if path.startswith("/api/"):
+        return RequestQueries(DEFAULT_ROUTE, DB_STATEMENT_TIMEOUT_MS)
+    return None
+
+
+@event.listens_for(SessionLocal, "after_begin")
+def _set_statement_timeout(session, transaction, connection):
+    queries = _current.get()
+    if queries is not None and queries.timeout_ms and connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(queries.timeout_ms)}")
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _track_query(conn, cursor, statement, parameters, context, executemany):
+    queries = _current.get()
+    if queries is not None:
+        if queries.disconnected:
+            raise ClientDisconnected("Client disconnected; not starting another query")
+        queries.connection = conn.connection.dbapi_connection
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _untrack_query(conn, cursor, statement, parameters, context, executemany):
+    queries = _current.get()
+    if queries is not None:
+        with queries.lock:
+            queries.connection = None
+
+
+@event.listens_for(engine, "handle_error")
+def _count_stopped_query(context):
+    queries = _current.get()
+    if queries is None:
+        return
+    with queries.lock:
+        queries.connection = None
+    error = context.original_exception
+    if queries.disconnected:
+        _count(queries.route, "cancelled")
+    elif getattr(error, "pgcode", None) == QUERY_CANCELED:
+        _count(queries.route, "timeouts")
+        logger.warning("Statement exceeded %d ms budget on %s", queries.timeout_ms, queries.route)
+
+
+def is_query_canceled(exc: BaseException) -> bool:
+    """
+    Whether a database error means the statement was stopped by its time budget or a cancel.
+    Routes that turn failures into a 500 re-raise these so query_timeout_handler answers them.
+    """
+    return isinstance(exc, OperationalError) and getattr(exc.orig, "pgcode", None) == QUERY_CANCELED
+
+
+async def query_timeout_handler(request: Request, exc: OperationalError):
+    """503 instead of a bare 500 when a statement ran out of time; other database errors re-raise"""
+    if not is_query_canceled(exc):
+        raise exc
+    return JSONResponse(status_code=503, content={"detail": "The database query took too long; please retry"})
+
+
+class StatementTimeoutMiddleware:
+    """Pure ASGI: sets the request's budget and, if enabled, watches for the client going away"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        queries = budget_for(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if queries is None:
+            await self.app(scope, receive, send)
+            return
+
+        token = _current.set(queries)
+        try:
+            if not QUERY_CANCEL_ON_DISCONNECT:
+                await self.app(scope, receive, send)
+                return
+
+            # Sole reader of `receive`; the app gets the same messages from the queue
+            messages: asyncio.Queue = asyncio.Queue()
+
+            async def watch():
+                while True:
+                    message = await receive()
+                    messages.put_nowait(message)
+                    if message["type"] == "http.disconnect":
+                        queries.disconnected = True
+                        if queries.connection is not None:
+                            await asyncio.to_thread(queries.cancel)
+                        return
+
+            watcher = asyncio.create_task(watch())
+            try:
+                await self.app(scope, messages.get, send)
+            except Exception:
+                if not queries.disconnected:
+                    raise
+                # Nobody is left to send an error to
+                logger.info("Cancelled %s %s after the client disconnected", scope["method"], scope["path"])
+            finally:
+                watcher.cancel()
+        finally:
+            _current.reset(token)
@@ -0,0 +1,127 @@
+from datetime import datetime, timezone
+from threading import Lock
+from typing import List, Tuple
+import asyncio
+import csv
+import io
+import logging
+import os
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+from database import engine
+import models
+import schemas
+
+# Client telemetry is buffered in memory per process and written in bulk:
+# COPY on Postgres, a multi-row INSERT elsewhere. A crash loses at most one
+# flush interval of samples, which is acceptable for latency statistics.
+
+TELEMETRY_FLUSH_ROWS = int(os.getenv("TELEMETRY_FLUSH_ROWS", "5000"))
+TELEMETRY_FLUSH_INTERVAL = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "2"))
+TELEMETRY_MAX_BUFFERED_ROWS = int(os.getenv("TELEMETRY_MAX_BUFFERED_ROWS", "200000"))
+
+COLUMNS = ("ts", "session_id", "metric", "value", "agent_id", "agent_config", "voice")
+
+logger = logging.getLogger("uvicorn.error")
+
+Row = Tuple[datetime, str, str, float, str, str, str]
+
+
+class TelemetryBuffer:
+    def __init__(self):
+        self._rows: List[Row] = []
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self.dropped = 0
+
+    def add_batch(self, batch: schemas.TelemetryBatch) -> Tuple[int, bool]:
+        """Buffer a batch; returns (rows accepted, whether the buffer should be flushed now)"""
+        columns = batch.columns
+        rows = [
+            (
+                datetime.fromtimestamp(ts / 1000, tz=timezone.utc),
+                batch.session_id,
+                metric,
+                value,
+                batch.agent_id,
+                batch.agent_config,
+                batch.voice,
+            )
+            for ts, metric, value in zip(columns.ts, columns.metric, columns.value)
+        ]
+        with self._lock:
+            room = TELEMETRY_MAX_BUFFERED_ROWS - len(self._rows)
+            if room < len(rows):
+                # DB is falling behind; shed load instead of growing without bound
+                self.dropped += len(rows) - max(room, 0)
+                rows = rows[:max(room, 0)]
+            self._rows.extend(rows)
+            should_flush = len(self._rows) >= TELEMETRY_FLUSH_ROWS
+        return len(rows), should_flush
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                if engine.dialect.name == "postgresql":
+                    _copy_rows(rows)
+                else:
+                    with engine.begin() as conn:
+                        conn.execute(insert(models.TelemetryEvent), [dict(zip(COLUMNS, row)) for row in rows])
+            except Exception as e:
+                if not _is_transient(e):
+                    # Bad data fails the same way on every retry; keeping it would block all later rows
+                    logger.exception("Dropped %d telemetry rows that could not be written", len(rows))
+                    with self._lock:
+                        self.dropped += len(rows)
+                    return 0
+                logger.exception("Failed to flush %d telemetry rows", len(rows))
+                with self._lock:
+                    # Put them back for the next attempt, within the buffer cap
+                    self._rows = rows[:TELEMETRY_MAX_BUFFERED_ROWS] + self._rows
+                return 0
+            return len(rows)
+
+
+def _is_transient(error: Exception) -> bool:
+    """Connection loss, failover, timeouts: worth retrying, unlike data or constraint errors"""
+    # COPY goes through the raw DBAPI connection, so its errors aren't wrapped by SQLAlchemy
+    return isinstance(error, (OperationalError, engine.dialect.dbapi.OperationalError))
+
+
+def _copy_rows(rows: List[Row]) -> None:
+    data = io.StringIO()
+    writer = csv.writer(data)
+    for row in rows:
+        writer.writerow(["" if v is None else (v.isoformat() if isinstance(v, datetime) else v) for v in row])
+    data.seek(0)
+
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY telemetry_events ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                data,
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+buffer = TelemetryBuffer()
+
+
+async def run_flusher(stop: asyncio.Event) -> None:
+    """Flush the buffer every TELEMETRY_FLUSH_INTERVAL seconds, and once more on shutdown"""
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=TELEMETRY_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.to_thread(buffer.flush)
@@ -0,0 +1,70 @@
+import os
+import sys
+from pathlib import Path
+
+# In-memory SQLite mode; set before the app modules read their configuration
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base, get_db
+from main import app
+import participant_resolver
+
+
+@pytest.fixture
+def engine():
+    """A fresh in-memory database per test; StaticPool keeps every session on the same connection"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+    @event.listens_for(engine, "connect")
+    def _enable_foreign_keys(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(engine):
+    TestingSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = TestingSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    participant_resolver.clear_cache()
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    participant_resolver.clear_cache()
+
+
+@pytest.fixture
+def query_counter(engine):
+    """Counts the statements sent to the test database"""
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    yield statements
+    event.remove(engine, "before_cursor_execute", _count)
@@ -0,0 +1,60 @@
+from routers import agents as agents_router
+
+
+def _agent(display_name, **fields):
+    return {
+        "agent_name": "helper",
+        "display_name": display_name,
+        "agent_config": "versioned",
+        "system_prompt": f"You are {display_name}.",
+        **fields,
+    }
+
+
+def test_concurrent_activation_is_409(client, monkeypatch):
+    assert client.post("/api/agents/", json=_agent("First", is_active=True)).status_code == 201
+
+    # As if another request activated an agent after this one deactivated the config
+    monkeypatch.setattr(agents_router, "deactivate_config", lambda *args, **kwargs: None)
+    response = client.post("/api/agents/", json=_agent("Second", is_active=True))
+    assert response.status_code == 409
+
+    agent = client.post("/api/agents/", json=_agent("Third")).json()
+    response = client.patch(f"/api/agents/{agent['id']}", json={"is_active": True})
+    assert response.status_code == 409
+
+
+def test_updates_append_versions(client):
+    agent = client.post("/api/agents/", json=_agent("Helper")).json()
+    for n in range(3):
+        response = client.patch(f"/api/agents/{agent['id']}", json={"system_prompt": f"Revision {n}"})
+        assert response.status_code == 200
+
+    versions = client.get(f"/api/agents/{agent['id']}/versions").json()
+    assert [version["version"] for version in versions] == [4, 3, 2, 1]
+
+
+def _active_in(client, agent_config):
+    return client.get("/api/agents/", params={"agent_config": agent_config, "is_active": True}).json()
+
+
+def test_cloning_several_agents_as_active_is_400(client):
+    for display_name in ["Draft", "Final"]:
+        assert client.post("/api/agents/", json=_agent(display_name)).status_code == 201
+
+    response = client.post("/api/agents/clone", json={"agent_config": "versioned", "new_agent_config": "copy", "is_active": True})
+    assert response.status_code == 400
+    assert _active_in(client, "copy") == []
+
+    response = client.post("/api/agents/clone", json={"agent_config": "versioned", "new_agent_config": "copy"})
+    assert response.status_code == 201
+    assert _active_in(client, "copy") == []
+
+
+def test_cloning_one_agent_as_active_replaces_the_active_agent(client):
+    client.post("/api/agents/", json={**_agent("Current", is_active=True), "agent_config": "copy", "agent_name": "other"})
+    client.post("/api/agents/", json=_agent("Draft"))
+
+    response = client.post("/api/agents/clone", json={"agent_config": "versioned", "new_agent_config": "copy", "is_active": True})
+    assert response.status_code == 201, response.text
+    assert [agent["display_name"] for agent in _active_in(client, "copy")] == ["Draft"]
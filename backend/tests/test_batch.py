@@ -0,0 +1,38 @@
+def _create(name):
+    return {"op": "create", "entity": "agent", "alias": name, "data": {
+        "agent_name": name,
+        "display_name": name.upper(),
+        "agent_config": "study",
+        "system_prompt": f"You are {name}.",
+    }}
+
+
+def _active_names(client):
+    return sorted(agent["agent_name"] for agent in client.get("/api/agents/", params={"agent_config": "study", "is_active": True}).json())
+
+
+def test_activating_two_agents_in_one_config_leaves_the_last_active(client):
+    response = client.post("/api/batch/", json={"operations": [
+        _create("a"),
+        _create("b"),
+        {"op": "update", "entity": "agent", "id": "$a", "data": {"is_active": True}},
+        {"op": "update", "entity": "agent", "id": "$b", "data": {"is_active": True}},
+    ]})
+    assert response.status_code == 200, response.text
+    assert _active_names(client) == ["b"]
+
+    ids = {result["alias"]: result["id"] for result in response.json()["results"] if result["alias"]}
+    response = client.post("/api/batch/", json={"operations": [
+        {"op": "update", "entity": "agent", "id": ids["b"], "data": {"is_active": True}},
+        {"op": "update", "entity": "agent", "id": ids["a"], "data": {"is_active": True}},
+    ]})
+    assert response.status_code == 200, response.text
+    assert _active_names(client) == ["a"]
+
+
+def test_creating_two_active_agents_in_one_config_leaves_the_last_active(client):
+    operations = [_create("a"), _create("b")]
+    for operation in operations:
+        operation["data"]["is_active"] = True
+    assert client.post("/api/batch/", json={"operations": operations}).status_code == 200
+    assert _active_names(client) == ["b"]
@@ -0,0 +1,73 @@
+from sqlalchemy.exc import OperationalError
+
+from routers import conversations as conversations_router
+
+
+class QueryCanceled(Exception):
+    pgcode = "57014"
+
+
+def _conversation(agent_id):
+    return {
+        "session_id": "session-1",
+        "agent_id": agent_id,
+        "agent_config": "smokeTest",
+        "agent_name": "helper",
+        "transcript": {"messages": [{"role": "user", "content": "hello"}]},
+        "duration": 42,
+        "turn_count": 1,
+    }
+
+
+def _agent(client):
+    return client.post("/api/agents/", json={
+        "agent_name": "helper",
+        "display_name": "Helper",
+        "agent_config": "smokeTest",
+        "system_prompt": "You are helpful.",
+    }).json()
+
+
+def test_save_updates_agent_stats(client):
+    agent = _agent(client)
+    assert client.post("/api/conversations/", json=_conversation(agent["id"])).status_code == 201
+    assert client.get(f"/api/agents/{agent['id']}").json()["total_runs"] == 1
+
+
+def test_stats_timeout_after_save_is_still_201(client, monkeypatch):
+    agent = _agent(client)
+
+    def timed_out(db, agent_id):
+        raise OperationalError("SELECT avg(duration) ...", {}, QueryCanceled("canceling statement due to statement timeout"))
+
+    monkeypatch.setattr(conversations_router, "_update_agent_stats", timed_out)
+    response = client.post("/api/conversations/", json=_conversation(agent["id"]))
+    assert response.status_code == 201, response.text
+    assert response.json()["session_id"] == "session-1"
+    assert len(client.get("/api/conversations/").json()) == 1
+
+
+def test_near_duplicate_clusters_only_group_conversations_in_scope(client, query_counter):
+    words = " ".join(f"word{n}" for n in range(40))
+    sessions = {}
+    for session_id, agent_config in [("a1", "a"), ("a2", "a"), ("b1", "b")]:
+        conversation = {
+            **_conversation(None),
+            "session_id": session_id,
+            "agent_config": agent_config,
+            "transcript": {"messages": [{"role": "user", "content": words}]},
+        }
+        sessions[client.post("/api/conversations/", json=conversation).json()["id"]] = session_id
+
+    def clusters(**params):
+        return [
+            sorted(sessions[c["id"]] for c in cluster["conversations"])
+            for cluster in client.get("/api/conversations/near-duplicates", params=params).json()
+        ]
+
+    assert clusters() == [["a1", "a2", "b1"]]
+    query_counter.clear()
+    assert clusters(agent_config="a") == [["a1", "a2"]]
+    assert any("HAVING" in statement for statement in query_counter)
+    assert not any("OVER" in statement for statement in query_counter)
+    assert clusters(agent_config="b") == []
@@ -0,0 +1,66 @@
+import pytest
+
+import models
+import participant_resolver
+from participant_resolver import resolve_participant_id, resolve_participant_ids
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    participant_resolver.clear_cache()
+    yield
+    participant_resolver.clear_cache()
+
+
+def _participants(db, count):
+    participants = [models.Participant(participant_id=f"P-{i:03d}") for i in range(count)]
+    db.add_all(participants)
+    db.commit()
+    return [(p.id, p.participant_id) for p in participants]
+
+
+def test_batch_resolution_query_count(db, query_counter):
+    participants = _participants(db, 20)
+    identifiers = [id for id, _ in participants[:10]] + [pid for _, pid in participants[10:]] + ["P-missing"]
+    query_counter.clear()
+
+    resolved = resolve_participant_ids(db, identifiers)
+    assert len(query_counter) == 2
+    assert resolved == {identifier: id for identifier, (id, _) in zip(identifiers, participants)}
+
+    # Every participant_id is now cached; confirming them takes one query
+    query_counter.clear()
+    resolved = resolve_participant_ids(db, [pid for _, pid in participants])
+    assert len(query_counter) == 1
+    assert resolved == {pid: id for id, pid in participants}
+
+
+def test_cached_id_of_deleted_participant_is_not_returned(db):
+    (participant_id, _), = _participants(db, 1)
+    assert resolve_participant_id(db, "P-000") == participant_id
+
+    # Deleted by another worker, whose forget_participant() doesn't reach this process's cache
+    db.query(models.Participant).filter(models.Participant.id == participant_id).delete()
+    db.commit()
+    assert resolve_participant_id(db, "P-000") is None
+
+    recreated = models.Participant(participant_id="P-000")
+    db.add(recreated)
+    db.commit()
+    assert resolve_participant_id(db, "P-000") == recreated.id
+
+
+def test_assignment_for_stale_cached_participant_is_404(client, db):
+    (participant_id, _), = _participants(db, 1)
+    assert resolve_participant_id(db, "P-000") == participant_id
+    db.query(models.Participant).filter(models.Participant.id == participant_id).delete()
+    db.commit()
+
+    response = client.post("/api/assignments/", json={
+        "participant_id": "P-000",
+        "agent_id": "missing",
+        "agent_config": "cfg",
+        "agent_name": "agent",
+    })
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Participant not found"
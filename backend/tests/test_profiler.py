@@ -0,0 +1,24 @@
+import pytest
+
+import profiler
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILER_TOKEN", "secret")
+    monkeypatch.setattr(profiler, "current", None)
+
+
+def test_cprofile_run_with_no_requests_has_an_empty_report(client, admin):
+    started = client.post("/api/profiler/start", json={"mode": "cprofile", "requests": 1}, headers=ADMIN)
+    assert started.status_code == 201, started.text
+    assert client.post("/api/profiler/stop", headers=ADMIN).json()["requests_profiled"] == 0
+
+    report = client.get("/api/profiler/result", params={"format": "pstats"}, headers=ADMIN)
+    assert report.status_code == 200, report.text
+    assert report.text == "No calls were profiled\n"
+
+    raw = client.get("/api/profiler/result", params={"format": "pstats-raw"}, headers=ADMIN)
+    assert raw.status_code == 200
@@ -0,0 +1,78 @@
+import pytest
+
+import capacity
+
+
+def _setup(client):
+    agents = [
+        client.post("/api/agents/", json={
+            "agent_name": f"agent{n}",
+            "display_name": f"Agent {n}",
+            "agent_config": "study",
+            "system_prompt": f"You are agent {n}.",
+            "instructions": f"Instructions {n}.",
+        }).json()
+        for n in range(2)
+    ]
+    participant = client.post("/api/participants/", json={"participant_id": "P-001"}).json()
+    assignments = [
+        client.post("/api/assignments/", json={
+            "participant_id": participant["id"],
+            "agent_id": agent["id"],
+            "agent_config": "study",
+            "agent_name": agent["agent_name"],
+            "order": n,
+        }).json()
+        for n, agent in enumerate(agents)
+    ]
+    return agents, assignments
+
+
+def test_complete_assignment_returns_next_config_in_two_statements(client, query_counter):
+    agents, assignments = _setup(client)
+    query_counter.clear()
+
+    response = client.post("/api/session/complete-assignment/P-001", json={"assignment_id": assignments[0]["id"]})
+    assert response.status_code == 200, response.text
+    assert len(query_counter) == 2
+
+    body = response.json()
+    assert body["has_next"] and body["next_assignment_id"] == assignments[1]["id"]
+    assert body["next_assignment"]["system_prompt"] == "You are agent 1."
+    assert body["next_assignment"]["instructions"] == "Instructions 1."
+    assert body["next_assignment"] == client.get("/api/session/participant-config/P-001").json()["assignment"]
+
+
+def test_complete_last_assignment(client):
+    _, assignments = _setup(client)
+    for assignment in assignments:
+        response = client.post("/api/session/complete-assignment/P-001", json={"assignment_id": assignment["id"]})
+        assert response.status_code == 200
+    assert response.json()["has_next"] is False
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(capacity, "registry", capacity.MemorySessionRegistry())
+    return capacity.registry
+
+
+def test_heartbeat_for_unknown_participant_is_404(client, registry):
+    response = client.post("/api/session/heartbeat/nobody", json={})
+    assert response.status_code == 404
+    assert registry.snapshot() == {}
+
+
+def test_heartbeat_to_config_without_active_agent_is_404(client, registry):
+    _setup(client)
+    response = client.post("/api/session/heartbeat/P-001", json={"agent_config": "made-up"})
+    assert response.status_code == 404
+    assert registry.snapshot() == {}
+
+
+def test_heartbeat_moves_session_to_active_config(client, registry):
+    agents, _ = _setup(client)
+    client.post(f"/api/agents/{agents[0]['id']}/activate")
+    response = client.post("/api/session/heartbeat/P-001", json={"agent_config": "study"})
+    assert response.status_code == 200, response.text
+    assert registry.snapshot() == {"study": 1}
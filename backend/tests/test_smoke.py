@@ -0,0 +1,45 @@
+def _agent(name, tags, **fields):
+    return {
+        "agent_name": name,
+        "display_name": name.title(),
+        "agent_config": "smokeTest",
+        "system_prompt": f"You are {name}.",
+        "tags": tags,
+        **fields,
+    }
+
+
+def test_health(client):
+    response = client.get("/health")
+    assert response.status_code == 200
+
+
+def test_agent_tag_filter(client):
+    for name, tags in [("friendly", ["warm", "a"]), ("formal", ["cold", "b"]), ("mixed", ["warm", "b"])]:
+        response = client.post("/api/agents/", json=_agent(name, tags))
+        assert response.status_code == 201, response.text
+
+    response = client.get("/api/agents/", params={"tags": "warm"})
+    assert response.status_code == 200
+    assert sorted(agent["agent_name"] for agent in response.json()) == ["friendly", "mixed"]
+
+
+def test_participant_conversation_round_trip(client):
+    agent = client.post("/api/agents/", json=_agent("helper", [], is_active=True)).json()
+    participant = client.post("/api/participants/", json={"participant_id": "P-001"}).json()
+
+    response = client.post("/api/conversations/", json={
+        "session_id": "session-1",
+        "participant_id": participant["id"],
+        "agent_id": agent["id"],
+        "agent_config": "smokeTest",
+        "agent_name": "helper",
+        "transcript": {"messages": [{"role": "user", "content": "hello"}]},
+        "duration": 42,
+        "turn_count": 1,
+    })
+    assert response.status_code == 201, response.text
+
+    response = client.get("/api/participants/P-001/conversations")
+    assert response.status_code == 200
+    assert [c["session_id"] for c in response.json()] == ["session-1"]
@@ -0,0 +1,39 @@
+from sqlalchemy.exc import OperationalError
+
+from routers import annotations as annotations_router
+from statement_timeouts import is_query_canceled
+
+
+class DriverError(Exception):
+    def __init__(self, message, pgcode):
+        super().__init__(message)
+        self.pgcode = pgcode
+
+
+def _error(pgcode):
+    return OperationalError("SELECT ...", {}, DriverError("canceling statement due to statement timeout", pgcode))
+
+
+def test_is_query_canceled():
+    assert is_query_canceled(_error("57014"))
+    assert not is_query_canceled(_error("08006"))
+    assert not is_query_canceled(ValueError("57014"))
+
+
+def test_timeout_inside_500_wrapper_is_503(client, monkeypatch):
+    def timed_out(*args, **kwargs):
+        raise _error("57014")
+
+    monkeypatch.setattr(annotations_router, "claim_items", timed_out)
+    response = client.post("/api/annotations/claim", json={"rater": "r1"})
+    assert response.status_code == 503
+    assert "took too long" in response.json()["detail"]
+
+
+def test_other_database_errors_stay_500(client, monkeypatch):
+    def failed(*args, **kwargs):
+        raise _error("08006")
+
+    monkeypatch.setattr(annotations_router, "claim_items", failed)
+    response = client.post("/api/annotations/claim", json={"rater": "r1"})
+    assert response.status_code == 500
@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+import json
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import telemetry
+
+
+def _post(client, ts, value=120.0):
+    batch = {"session_id": "session-1", "columns": {"ts": [1760000000000, ts], "metric": ["ttfa", "ttfa"], "value": [95.0, value]}}
+    # json.dumps writes NaN/Infinity literals, as a non-strict client might
+    return client.post("/api/telemetry/", content=json.dumps(batch), headers={"content-type": "application/json"})
+
+
+@pytest.mark.parametrize("ts", [1e300, -1e300, -1, float("inf"), float("nan")])
+def test_out_of_range_timestamp_is_422(client, ts):
+    assert _post(client, ts).status_code == 422
+
+
+def test_non_finite_value_is_422(client):
+    assert _post(client, 1760000000001, float("nan")).status_code == 422
+
+
+def test_valid_batch_is_accepted(client):
+    response = _post(client, 1760000000001)
+    assert response.status_code == 202, response.text
+    assert response.json() == {"accepted": 2}
+
+
+def test_empty_session_or_metric_is_422(client):
+    for session_id, metric in [("", "ttfa"), ("session-1", "")]:
+        batch = {"session_id": session_id, "columns": {"ts": [1760000000000], "metric": [metric], "value": [1.0]}}
+        assert client.post("/api/telemetry/", json=batch).status_code == 422
+
+
+def _row(session_id="session-1"):
+    return (datetime(2025, 10, 9, tzinfo=timezone.utc), session_id, "ttfa", 95.0, None, None, None)
+
+
+def test_rows_that_cannot_be_written_are_dropped():
+    buffer = telemetry.TelemetryBuffer()
+    buffer._rows = [_row(session_id=None)]  # NOT NULL violation on every attempt
+    assert buffer.flush() == 0
+    assert buffer._rows == [] and buffer.dropped == 1
+
+    buffer._rows = [_row()]
+    assert buffer.flush() == 1
+
+
+def test_rows_are_kept_after_a_transient_failure(monkeypatch):
+    buffer = telemetry.TelemetryBuffer()
+    buffer._rows = [_row()]
+
+    def connection_lost():
+        raise OperationalError("INSERT INTO telemetry_events ...", {}, Exception("server closed the connection unexpectedly"))
+
+    monkeypatch.setattr(telemetry.engine, "begin", connection_lost)
+    assert buffer.flush() == 0
+    assert buffer._rows == [_row()] and buffer.dropped == 0
@@ -0,0 +1,22 @@
+import models
+import transcript_codec
+import transcripts
+
+
+def test_backfill_fills_missing_summaries_like_the_write_path(db):
+    transcript = {"messages": [{"role": "user", "content": "héllo"}, {"role": "assistant", "content": "hi"}]}
+    logs = [
+        models.ConversationLog(session_id=f"s{n}", agent_config="cfg", agent_name="a", transcript=transcript, duration=1, turn_count=1)
+        for n in range(5)
+    ]
+    db.add_all(logs)
+    db.commit()
+    db.query(models.ConversationLog).update({"message_count": None, "transcript_size": None})
+    db.commit()
+
+    assert transcripts.backfill_summaries(db, batch_size=2) == {"conversations": 5}
+    expected = transcript_codec.summarize(transcript)
+    assert {
+        (log.message_count, log.transcript_size) for log in db.query(models.ConversationLog)
+    } == {expected}
+    assert transcripts.backfill_summaries(db) == {"conversations": 0}
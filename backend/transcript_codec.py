@@ -0,0 +1,79 @@
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+import json
+import os
+import time
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency: pip install zstandard
+    zstandard = None
+
+# Transcript encoding for conversation_logs. With TRANSCRIPT_COMPRESSION=zstd
+# (and the zstandard package installed) new transcripts are stored as a zstd
+# blob compressed with the newest trained dictionary in transcript_dictionaries;
+# otherwise they stay plain JSON. Reading compressed rows always needs zstandard.
+
+TRANSCRIPT_COMPRESSION = os.getenv("TRANSCRIPT_COMPRESSION", "none")  # "none" | "zstd"
+TRANSCRIPT_ZSTD_LEVEL = int(os.getenv("TRANSCRIPT_ZSTD_LEVEL", "9"))
+
+# How long to reuse the "newest dictionary" lookup before checking for a newer one
+ACTIVE_DICTIONARY_TTL = 60.0
+
+# Dictionaries are immutable once stored, so they are cached for the process lifetime
+_dictionaries: Dict[int, Any] = {}
+_active: Tuple[float, Optional[int]] = (0.0, None)
+_lock = Lock()
+
+
+def compression_enabled() -> bool:
+    return TRANSCRIPT_COMPRESSION == "zstd" and zstandard is not None
+
+
+def encode_json(transcript: Dict[str, Any]) -> bytes:
+    return json.dumps(transcript, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def summarize(transcript: Optional[Dict[str, Any]]) -> Tuple[Optional[int], Optional[int]]:
+    """(message_count, uncompressed JSON size in bytes), kept in plain columns for list/analytics queries"""
+    if transcript is None:
+        return None, None
+    messages = transcript.get("messages") if isinstance(transcript, dict) else None
+    return len(messages) if isinstance(messages, list) else 0, len(encode_json(transcript))
+
+
+def _dictionary(dict_id: int, load: Callable[[int], bytes]):
+    with _lock:
+        dictionary = _dictionaries.get(dict_id)
+    if dictionary is None:
+        dictionary = zstandard.ZstdCompressionDict(load(dict_id))
+        with _lock:
+            _dictionaries[dict_id] = dictionary
+    return dictionary
+
+
+def active_dictionary_id(lookup: Callable[[], Optional[int]]) -> Optional[int]:
+    global _active
+    checked_at, dict_id = _active
+    if time.monotonic() - checked_at > ACTIVE_DICTIONARY_TTL:
+        dict_id = lookup()
+        _active = (time.monotonic(), dict_id)
+    return dict_id
+
+
+def forget_active_dictionary() -> None:
+    """Make the next compression pick up a newly trained dictionary immediately"""
+    global _active
+    _active = (0.0, None)
+
+
+def compress(transcript: Dict[str, Any], dict_id: Optional[int], load: Callable[[int], bytes]) -> bytes:
+    dictionary = _dictionary(dict_id, load) if dict_id is not None else None
+    return zstandard.ZstdCompressor(level=TRANSCRIPT_ZSTD_LEVEL, dict_data=dictionary).compress(encode_json(transcript))
+
+
+def decompress(blob: bytes, dict_id: Optional[int], load: Callable[[int], bytes]) -> Dict[str, Any]:
+    if zstandard is None:
+        raise RuntimeError("The zstandard package is required to read compressed transcripts")
+    dictionary = _dictionary(dict_id, load) if dict_id is not None else None
+    return json.loads(zstandard.ZstdDecompressor(dict_data=dictionary).decompress(blob))
@@ -0,0 +1,233 @@
+"""
+Compressed transcript maintenance.
+
+    python -m transcripts train [--samples N] [--dict-size BYTES]
+    python -m transcripts recompress [--batch-size N] [--dry-run]
+    python -m transcripts backfill [--batch-size N]
+
+`train` builds a zstd dictionary from recent transcripts and stores it in
+transcript_dictionaries; new transcripts use the newest dictionary when
+TRANSCRIPT_COMPRESSION=zstd. `recompress` rewrites plain-JSON rows (and rows
+compressed with an older dictionary) in id-ordered batches and reports the
+size reduction. Both need the optional zstandard package. `backfill` fills
+message_count / transcript_size for rows stored before those columns existed.
+"""
+from typing import Any, Callable, Dict, Optional
+import argparse
+import json
+
+from sqlalchemy import Text, cast, func, or_, update
+from sqlalchemy.orm import Session
+
+from jobs import JobContext, job_handler
+import models
+import transcript_codec
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_SAMPLES = 2000
+DEFAULT_DICT_SIZE = 112640  # zstd's default dictionary size (110 KiB)
+
+
+def _require_zstd() -> None:
+    if transcript_codec.zstandard is None:
+        raise RuntimeError("The zstandard package is required (pip install zstandard)")
+
+
+def _dictionary_loader(db: Session) -> Callable[[int], bytes]:
+    return lambda dict_id: db.get(models.TranscriptDictionary, dict_id).data
+
+
+def _load(db: Session, raw: Optional[str], blob: Optional[bytes], dict_id: Optional[int]) -> Any:
+    if blob is not None:
+        return transcript_codec.decompress(blob, dict_id, _dictionary_loader(db))
+    return json.loads(raw) if raw else None
+
+
+def train_dictionary(db: Session, samples: int = DEFAULT_SAMPLES, dict_size: int = DEFAULT_DICT_SIZE) -> Dict[str, int]:
+    """Train a dictionary on the most recent transcripts and make it the active one"""
+    _require_zstd()
+    Log = models.ConversationLog
+    rows = db.query(
+        cast(Log.transcript_json, Text), Log.transcript_blob, Log.transcript_dict_id
+    ).order_by(Log.created_at.desc()).limit(samples).all()
+
+    data = [transcript_codec.encode_json(t) for t in (_load(db, *row) for row in rows) if t is not None]
+    if len(data) < 10:
+        raise ValueError(f"Need at least 10 transcripts to train a dictionary, found {len(data)}")
+
+    dictionary = transcript_codec.zstandard.train_dictionary(dict_size, data)
+    record = models.TranscriptDictionary(data=dictionary.as_bytes(), sample_count=len(data))
+    db.add(record)
+    db.commit()
+    transcript_codec.forget_active_dictionary()
+    return {"dictionary_id": record.id, "dictionary_bytes": len(record.data), "samples": len(data)}
+
+
+def recompress(
+    db: Session,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    dry_run: bool = False,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """Compress every transcript not already using the newest dictionary; returns byte totals"""
+    _require_zstd()
+    Log = models.ConversationLog
+    dict_id = db.query(func.max(models.TranscriptDictionary.id)).scalar()
+    stale = [Log.transcript_blob.is_(None) & Log.transcript_json.isnot(None)]
+    if dict_id is not None:
+        stale.append(Log.transcript_blob.isnot(None) & or_(
+            Log.transcript_dict_id.is_(None), Log.transcript_dict_id != dict_id
+        ))
+    criteria = [or_(*stale)]
+    total = db.query(func.count(Log.id)).filter(*criteria).scalar() or 0
+
+    processed = 0
+    bytes_before = 0
+    bytes_after = 0
+    uncompressed = 0
+    last_id = ""
+    while True:
+        rows = db.query(
+            Log.id, cast(Log.transcript_json, Text), Log.transcript_blob, Log.transcript_dict_id
+        ).filter(*criteria, Log.id > last_id).order_by(Log.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        updates = []
+        for conversation_id, raw, blob, old_dict_id in rows:
+            transcript = _load(db, raw, blob, old_dict_id)
+            if transcript is None:
+                continue
+            compressed = transcript_codec.compress(transcript, dict_id, _dictionary_loader(db))
+            message_count, size = transcript_codec.summarize(transcript)
+            bytes_before += len(blob) if blob is not None else len(raw.encode("utf-8"))
+            bytes_after += len(compressed)
+            uncompressed += size
+            updates.append({
+                "id": conversation_id,
+                "transcript_json": None,
+                "transcript_blob": compressed,
+                "transcript_dict_id": dict_id,
+                "message_count": message_count,
+                "transcript_size": size,
+            })
+
+        if updates and not dry_run:
+            db.execute(update(Log), updates)  # Bulk UPDATE by primary key
+            db.commit()
+        else:
+            db.rollback()
+
+        processed += len(rows)
+        last_id = rows[-1][0]
+        if on_progress:
+            on_progress(processed, total)
+
+    return {
+        "conversations": processed,
+        "dictionary_id": dict_id,
+        "uncompressed_bytes": uncompressed,
+        "stored_bytes_before": bytes_before,
+        "stored_bytes_after": bytes_after,
+        "ratio": round(bytes_before / bytes_after, 2) if bytes_after else None,
+        "dry_run": dry_run,
+    }
+
+
+def backfill_summaries(
+    db: Session,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, int]:
+    """Fill message_count and transcript_size where they are missing, one short transaction per batch"""
+    Log = models.ConversationLog
+    criteria = [Log.transcript_size.is_(None), or_(Log.transcript_json.isnot(None), Log.transcript_blob.isnot(None))]
+    total = db.query(func.count(Log.id)).filter(*criteria).scalar() or 0
+
+    processed = 0
+    last_id = ""
+    while True:
+        rows = db.query(
+            Log.id, cast(Log.transcript_json, Text), Log.transcript_blob, Log.transcript_dict_id
+        ).filter(*criteria, Log.id > last_id).order_by(Log.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        updates = []
+        for conversation_id, raw, blob, dict_id in rows:
+            message_count, size = transcript_codec.summarize(_load(db, raw, blob, dict_id))
+            updates.append({"id": conversation_id, "message_count": message_count, "transcript_size": size})
+        db.execute(update(Log), updates)  # Bulk UPDATE by primary key
+        db.commit()
+
+        processed += len(rows)
+        last_id = rows[-1][0]
+        if on_progress:
+            on_progress(processed, total)
+
+    return {"conversations": processed}
+
+
+@job_handler("backfill_transcript_summaries")
+def backfill_transcript_summaries(db: Session, params: Dict[str, Any], ctx: JobContext):
+    """Fill message_count / transcript_size for conversations stored before those columns existed"""
+    return backfill_summaries(
+        db,
+        int(params.get("batch_size", DEFAULT_BATCH_SIZE)),
+        lambda done, total: ctx.report(done / total if total else 1.0, f"{done}/{total} conversations")
+    )
+
+
+@job_handler("recompress_transcripts")
+def recompress_transcripts(db: Session, params: Dict[str, Any], ctx: JobContext):
+    """Optionally train a new dictionary ({"train": true}), then recompress transcripts in batches"""
+    trained = None
+    if params.get("train"):
+        trained = train_dictionary(
+            db,
+            int(params.get("samples", DEFAULT_SAMPLES)),
+            int(params.get("dict_size", DEFAULT_DICT_SIZE))
+        )
+    result = recompress(
+        db,
+        int(params.get("batch_size", DEFAULT_BATCH_SIZE)),
+        bool(params.get("dry_run", False)),
+        lambda done, total: ctx.report(done / total if total else 1.0, f"{done}/{total} conversations")
+    )
+    return {**result, "trained": trained}
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Train transcript dictionaries and recompress stored transcripts")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="Train a zstd dictionary from recent transcripts")
+    train.add_argument("--samples", type=int, default=DEFAULT_SAMPLES)
+    train.add_argument("--dict-size", type=int, default=DEFAULT_DICT_SIZE)
+    run = commands.add_parser("recompress", help="Compress transcripts with the newest dictionary")
+    run.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    run.add_argument("--dry-run", action="store_true", help="Report sizes without writing")
+    backfill = commands.add_parser("backfill", help="Fill message counts and sizes of older conversations")
+    backfill.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        if args.command == "train":
+            print(train_dictionary(session, args.samples, args.dict_size))
+        elif args.command == "backfill":
+            summary = backfill_summaries(
+                session, args.batch_size, lambda n, total: print(f"\r{n}/{total}", end="", flush=True)
+            )
+            print()
+            print(f"conversations: {summary['conversations']}")
+        else:
+            summary = recompress(
+                session,
+                args.batch_size,
+                args.dry_run,
+                lambda n, total: print(f"\r{n}/{total}", end="", flush=True),
+            )
+            print()
+            for key, value in summary.items():
+                print(f"{key}: {value}")
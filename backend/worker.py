@@ -0,0 +1,29 @@
+"""
+Standalone background job worker.
+
+    python -m worker
+
+Runs JOB_WORKER_CONCURRENCY job slots in this process, separate from the API workers.
+"""
+import asyncio
+import logging
+import signal
+
+from jobs import run_worker
+import maintenance  # noqa: F401  (registers job handlers)
+import retention  # noqa: F401
+import transcripts  # noqa: F401
+import near_duplicates  # noqa: F401
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await run_worker(stop)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())
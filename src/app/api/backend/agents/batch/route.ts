@@ -0,0 +1,21 @@
+import { NextRequest, NextResponse } from 'next/server';
+
+const BACKEND_URL = process.env.BACKEND_URL || 'http://localhost:8000';
+
+// Batch multi-get: { ids: string[] } -> agents in request order
+export async function POST(request: NextRequest) {
+  try {
+    const body = await request.json();
+    const res = await fetch(`${BACKEND_URL}/api/agents/batch`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body),
+      cache: 'no-store',
+    });
+    const data = await res.json().catch(() => ({}));
+    return NextResponse.json(data, { status: res.status });
+  } catch (error) {
+    console.error('Proxy POST /agents/batch error:', error);
+    return NextResponse.json({ detail: 'Failed to fetch agents' }, { status: 500 });
+  }
+}
@@ -0,0 +1,21 @@
+import { NextRequest, NextResponse } from 'next/server';
+
+const BACKEND_URL = process.env.BACKEND_URL || 'http://localhost:8000';
+
+// Server-side clone: { agent_config, tags?, new_agent_config?, is_active?, display_name_suffix?, include_assignments, dry_run }
+export async function POST(request: NextRequest) {
+  try {
+    const body = await request.json();
+    const res = await fetch(`${BACKEND_URL}/api/agents/clone`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body),
+      cache: 'no-store',
+    });
+    const data = await res.json().catch(() => ({}));
+    return NextResponse.json(data, { status: res.status });
+  } catch (error) {
+    console.error('Proxy POST /agents/clone error:', error);
+    return NextResponse.json({ detail: 'Failed to clone agents' }, { status: 500 });
+  }
+}
@@ -0,0 +1,17 @@
+// Agent search proxy: forwards q/tags/agent_config/is_active/limit/offset unchanged
+import { NextRequest, NextResponse } from 'next/server';
+
+const BACKEND_URL = process.env.BACKEND_URL || 'http://localhost:8000';
+
+export async function GET(request: NextRequest) {
+  try {
+    const res = await fetch(`${BACKEND_URL}/api/agents/search?${request.nextUrl.searchParams.toString()}`, {
+      cache: 'no-store',
+    });
+    const data = await res.json().catch(() => ({}));
+    return NextResponse.json(data, { status: res.status });
+  } catch (error) {
+    console.error('Proxy GET /agents/search error:', error);
+    return NextResponse.json({ detail: 'Failed to search agents' }, { status: 500 });
+  }
+}
@@ -0,0 +1,21 @@
+import { NextRequest, NextResponse } from 'next/server';
+
+const BACKEND_URL = process.env.BACKEND_URL || 'http://localhost:8000';
+
+// Lease a batch to a rater: { rater, limit, agent_config?, stratify_by?: "agent" | "agent_config" }
+export async function POST(request: NextRequest) {
+  try {
+    const body = await request.json();
+    const res = await fetch(`${BACKEND_URL}/api/annotations/claim`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body),
+      cache: 'no-store',
+    });
+    const data = await res.json().catch(() => ({}));
+    return NextResponse.json(data, { status: res.status });
+  } catch (error) {
+    console.error('Proxy POST /annotations/claim error:', error);
+    return NextResponse.json({ detail: 'Failed to claim annotation items' }, { status: 500 });
+  }
+}
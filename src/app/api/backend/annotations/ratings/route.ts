@@ -0,0 +1,21 @@
+import { NextRequest, NextResponse } from 'next/server';
+
+const BACKEND_URL = process.env.BACKEND_URL || 'http://localhost:8000';
+
+// Save ratings in batches: { rater, ratings: [{ item_id, user_satisfaction?, task_completed?, labels? }] }
+export async function POST(request: NextRequest) {
+  try {
+    const body = await request.json();
+    const res = await fetch(`${BACKEND_URL}/api/annotations/ratings`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body),
+      cache: 'no-store',
+    });
+    const data = await res.json().catch(() => ({}));
+    return NextResponse.json(data, { status: res.status });
+  } catch (error) {
+    console.error('Proxy POST /annotations/ratings error:', error);
+    return NextResponse.json({ detail: 'Failed to save ratings' }, { status: 500 });
+  }
+}
@@ -0,0 +1,23 @@
+import { NextRequest, NextResponse } from 'next/server';
+
+const BACKEND_URL = process.env.BACKEND_URL || 'http://localhost:8000';
+
+// Transactional batch: { operations: [{ op, entity, alias?, id?, data }], dry_run }
+export async function POST(request: NextRequest) {
+  try {
+    const body = await request.json();
+    const res = await fetch(`${BACKEND_URL}/api/batch/`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body),
+      cache: 'no-store',
+      signal: request.signal,
+    });
+    const data = await res.json().catch(() => ({}));
+    return NextResponse.json(data, { status: res.status });
+  } catch (error) {
+    if (request.signal.aborted) return new NextResponse(null, { status: 499 });
+    console.error('Proxy POST /batch error:', error);
+    return NextResponse.json({ detail: 'Failed to run batch' }, { status: 500 });
+  }
+}
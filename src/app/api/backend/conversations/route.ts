@@ -17,9 +17,9 @@ async function parseResponsePayload(res: Response) {
   }
 }
 
-export async function GET() {
+export async function GET(request: Request) {
   try {
-    const res = await fetch(`${BACKEND_URL}/api/conversations/`, { cache: 'no-store' });
+    const res = await fetch(`${BACKEND_URL}/api/conversations/`, { cache: 'no-store', signal: request.signal });
     const data = await parseResponsePayload(res);
     if (res.ok) {
       const conversations = Array.isArray(data) ? data : [];
@@ -27,6 +27,7 @@ export async function GET() {
     }
     return NextResponse.json(data, { status: res.status });
   } catch (error) {
+    if (request.signal.aborted) return new NextResponse(null, { status: 499 });
     console.error('Proxy GET /conversations error:', error);
     return NextResponse.json({ detail: 'Failed to fetch conversations' }, { status: 500 });
   }
@@ -35,13 +36,20 @@ export async function GET() {
 export async function POST(request: Request) {
   try {
     const body = await request.json();
+    // Identify the client to the backend's rate limiter (every request arrives from this proxy)
+    const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+    if (body?.session_id) headers['X-Session-Id'] = String(body.session_id);
+    if (body?.participant_id) headers['X-Participant-Id'] = String(body.participant_id);
+    const forwardedFor = request.headers.get('x-forwarded-for');
+    if (forwardedFor) headers['X-Forwarded-For'] = forwardedFor;
+
     const res = await fetch(`${BACKEND_URL}/api/conversations/`, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
+      headers,
       body: JSON.stringify(body),
       cache: 'no-store',
+      // Aborts the backend request when the browser goes away, so its queries are cancelled
+      signal: request.signal,
     });
 
     const data = await parseResponsePayload(res);
@@ -52,6 +60,8 @@ export async function POST(request: Request) {
 
     return NextResponse.json(data, { status: res.status });
   } catch (error) {
+    // Client disconnected; nobody is left to answer
+    if (request.signal.aborted) return new NextResponse(null, { status: 499 });
     console.error('Proxy POST /conversations error:', error);
     return NextResponse.json({ detail: 'Failed to save conversation' }, { status: 500 });
   }